@@ -0,0 +1,195 @@
+"""
+Response Cache - Persistent, content-addressed cache for writer and evaluator calls
+
+Entries are keyed by a hash of everything that determines the response
+(namespace, model, temperature, token limit, prompt and request) and stored
+in SQLite (WAL mode), so identical requests and re-evaluations of the same
+story text skip the API across processes and restarts.
+
+- TTL: entries older than STORY_CACHE_TTL seconds are misses and get purged
+- Size bound: beyond STORY_CACHE_MAX_ENTRIES the least recently used rows are evicted
+- Creative mode: with STORY_CACHE_VARIANTS=N > 1, up to N variants are kept per
+  key; until N exist every lookup is a miss (a new variant gets generated),
+  afterwards lookups rotate through the least recently served variant
+"""
+import os
+import time
+import json
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from typing import Optional
+from agents import metrics
+
+
+CACHE_ENABLED = os.getenv("STORY_CACHE_ENABLED", "true").lower() != "false"
+CACHE_PATH = os.getenv("STORY_CACHE_PATH", str(Path(__file__).parent.parent / ".cache" / "responses.sqlite3"))
+CACHE_TTL = float(os.getenv("STORY_CACHE_TTL", str(7 * 24 * 3600)))
+CACHE_MAX_ENTRIES = int(os.getenv("STORY_CACHE_MAX_ENTRIES", "10000"))
+CACHE_VARIANTS = int(os.getenv("STORY_CACHE_VARIANTS", "1"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT NOT NULL,
+    variant INTEGER NOT NULL,
+    namespace TEXT NOT NULL,
+    value TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    PRIMARY KEY (key, variant)
+);
+CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+def make_key(*parts) -> str:
+    """Content address for a call: sha256 over the JSON encoding of its inputs."""
+    return hashlib.sha256(json.dumps(parts, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """SQLite-backed response cache with TTL, LRU size bound and variant rotation."""
+    
+    def __init__(self, path: str = CACHE_PATH, ttl: float = CACHE_TTL,
+                 max_entries: int = CACHE_MAX_ENTRIES, variants: int = CACHE_VARIANTS):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.variants = max(1, variants)
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        # One connection shared by all threads; calls are short and serialized by the lock
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+    
+    def _count(self, name: str) -> None:
+        metrics.increment(f"cache.{name}")
+        self._conn.execute(
+            "INSERT INTO counters (name, value) VALUES (?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (name,)
+        )
+    
+    def get(self, namespace: str, key: str, variants: Optional[int] = None) -> Optional[str]:
+        """
+        Look up a response.
+        
+        Args:
+            namespace: Call family ("writer", "evaluator") for stats
+            key: Content address from `make_key`
+            variants: Override the number of variants to keep (1 = plain cache)
+        
+        Returns:
+            The cached value, or None on a miss (including creative mode keys
+            that have fewer than `variants` stored so far)
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("DELETE FROM responses WHERE key = ? AND created_at < ?", (key, now - self.ttl))
+            rows = self._conn.execute(
+                "SELECT variant, value FROM responses WHERE key = ? ORDER BY accessed_at ASC",
+                (key,)
+            ).fetchall()
+            if len(rows) < (variants or self.variants):
+                self._count(f"{namespace}.misses")
+                return None
+            variant, value = rows[0]  # Least recently served variant
+            self._conn.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ? AND variant = ?",
+                (now, key, variant)
+            )
+            self._count(f"{namespace}.hits")
+            return value
+    
+    def put(self, namespace: str, key: str, value: str, variants: Optional[int] = None) -> None:
+        """Store a response as the next variant of `key`, then enforce the size bound."""
+        now = time.time()
+        with self._lock:
+            count = self._conn.execute("SELECT COUNT(*) FROM responses WHERE key = ?", (key,)).fetchone()[0]
+            if count >= (variants or self.variants):
+                # Replace the least recently served variant
+                variant = self._conn.execute(
+                    "SELECT variant FROM responses WHERE key = ? ORDER BY accessed_at ASC LIMIT 1", (key,)
+                ).fetchone()[0]
+            else:
+                variant = count
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, variant, namespace, value, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, variant, namespace, value, now, now)
+            )
+            excess = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0] - self.max_entries
+            if excess > 0:
+                self._conn.execute(
+                    "DELETE FROM responses WHERE rowid IN "
+                    "(SELECT rowid FROM responses ORDER BY accessed_at ASC LIMIT ?)",
+                    (excess,)
+                )
+                metrics.increment("cache.evictions", excess)
+    
+    def stats(self) -> dict:
+        """Entry counts per namespace and persistent hit/miss totals."""
+        with self._lock:
+            namespaces = dict(self._conn.execute(
+                "SELECT namespace, COUNT(*) FROM responses GROUP BY namespace"
+            ).fetchall())
+            counters = dict(self._conn.execute("SELECT name, value FROM counters").fetchall())
+        stats = {"path": self.path, "entries": namespaces, "variants": self.variants}
+        for namespace in sorted({name.rsplit(".", 1)[0] for name in counters}):
+            hits = counters.get(f"{namespace}.hits", 0)
+            misses = counters.get(f"{namespace}.misses", 0)
+            stats[namespace] = {"hits": hits, "misses": misses, "hit_rate": hits / (hits + misses) if hits + misses else 0.0}
+        return stats
+    
+    def entries(self, limit: int = 20) -> list:
+        """Most recently used entries, with a short preview of each value."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT namespace, key, variant, substr(value, 1, 80), created_at, accessed_at "
+                "FROM responses ORDER BY accessed_at DESC LIMIT ?",
+                (limit,)
+            ).fetchall()
+        return [
+            {"namespace": ns, "key": key[:12], "variant": variant, "preview": preview,
+             "created_at": created_at, "accessed_at": accessed_at}
+            for ns, key, variant, preview, created_at, accessed_at in rows
+        ]
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.execute("DELETE FROM counters")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> Optional[ResponseCache]:
+    """Process-wide cache, or None when STORY_CACHE_ENABLED=false."""
+    global _cache
+    if not CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache()
+    return _cache
+
+
+def cache_get(namespace: str, key: str, variants: Optional[int] = None) -> Optional[str]:
+    cache = get_cache()
+    return cache.get(namespace, key, variants) if cache else None
+
+
+def cache_put(namespace: str, key: str, value: str, variants: Optional[int] = None) -> None:
+    cache = get_cache()
+    if cache:
+        cache.put(namespace, key, value, variants)
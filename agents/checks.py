@@ -0,0 +1,145 @@
+"""
+Local Checks - Deterministic rubric signals computed before the LLM judge
+
+Some rubric dimensions do not need a model: conciseness is a word count,
+repetition and structure leave measurable traces, and a banned-word list
+catches clearly age-inappropriate language. These checks take about a millisecond
+for a 500-word story; the evaluator uses them to score conciseness itself, cap
+age-appropriateness, feed facts to the judge, and skip the judge entirely
+when a story fails clear-cut.
+"""
+import re
+from collections import Counter
+from typing import List, NamedTuple
+
+
+MIN_WORDS = 400
+MAX_WORDS = 500
+# Outside this range a story fails regardless of what a judge would say
+HARD_MIN_WORDS = 200
+HARD_MAX_WORDS = 800
+# Share of repeated word trigrams that indicates looping / degenerate output
+# (refrains like "Run, run, as fast as you can!" stay well below this)
+MAX_REPETITION_RATIO = 0.50
+# Repetition above this starts costing conciseness points
+REPETITION_PENALTY_START = 0.20
+# Age-appropriateness score ceiling when banned words are present
+BANNED_WORD_AGE_CAP = 2.0
+
+# Only words that are inappropriate in any context; ambiguous ones ("kill time",
+# "shot a glance", "naked branches") are left to the judge
+BANNED_WORDS = frozenset("""
+    damn crap shit fuck fucking bitch bastard asshole piss
+    sexy sex nude
+    murder murdered murderer gore gory corpse stabbed
+    gun guns rifle pistol
+    beer vodka whiskey drunk cigarette cigarettes drugs
+    idiot moron suicide
+""".split())
+
+_WORD_RE = re.compile(r"[A-Za-z']+(?:-[A-Za-z']+)?")
+_SENTENCE_RE = re.compile(r"[^.!?]+[.!?]")
+_DIALOGUE_RE = re.compile(r"[\"“”]")
+
+
+class LocalChecks(NamedTuple):
+    """Deterministic facts about one story."""
+    word_count: int
+    paragraph_count: int
+    sentence_count: int
+    has_dialogue: bool
+    ends_cleanly: bool
+    repetition_ratio: float
+    banned_words: List[str]
+    conciseness_score: float
+    failures: List[str]
+    
+    @property
+    def clear_cut_failure(self) -> bool:
+        """True when the story fails no matter what the judge would say."""
+        return bool(self.failures)
+    
+    @property
+    def age_cap(self) -> float:
+        """Upper bound for the age-appropriateness score."""
+        return BANNED_WORD_AGE_CAP if self.banned_words else 10.0
+    
+    def facts(self) -> str:
+        """Render the checks as a compact fact block for the judge prompt."""
+        return "\n".join([
+            f"- Word count: {self.word_count} (target {MIN_WORDS}-{MAX_WORDS}); conciseness is scored locally: {self.conciseness_score:.1f}/10",
+            f"- Paragraphs: {self.paragraph_count}, sentences: {self.sentence_count}, dialogue: {'yes' if self.has_dialogue else 'no'}",
+            f"- Ends with a complete sentence: {'yes' if self.ends_cleanly else 'no'}",
+            f"- Repeated word trigrams: {self.repetition_ratio:.0%}",
+            f"- Flagged words: {', '.join(self.banned_words) if self.banned_words else 'none'}"
+        ])
+
+
+def words_of(text: str) -> List[str]:
+    """Lowercased words, as every check counts them."""
+    return [w.lower() for w in _WORD_RE.findall(text)]
+
+
+def repetition_ratio(words: List[str]) -> float:
+    """Share of word trigrams that occur more than once."""
+    trigrams = [tuple(words[i:i + 3]) for i in range(len(words) - 2)]
+    if not trigrams:
+        return 0.0
+    counts = Counter(trigrams)
+    repeated = sum(count for count in counts.values() if count > 1)
+    return repeated / len(trigrams)
+
+
+def conciseness_score(word_count: int, repetition: float = 0.0) -> float:
+    """
+    Score 0-10: 10 inside 400-500 words, minus 1 point per 20 words outside
+    the range, minus up to 5 points for repetition beyond refrain level.
+    """
+    if word_count < MIN_WORDS:
+        score = 10.0 - (MIN_WORDS - word_count) / 20
+    elif word_count > MAX_WORDS:
+        score = 10.0 - (word_count - MAX_WORDS) / 20
+    else:
+        score = 10.0
+    if repetition > REPETITION_PENALTY_START:
+        overshoot = (repetition - REPETITION_PENALTY_START) / (MAX_REPETITION_RATIO - REPETITION_PENALTY_START)
+        score -= min(overshoot, 1.0) * 5.0
+    return round(max(0.0, min(10.0, score)), 1)
+
+
+def run_local_checks(story_text: str) -> LocalChecks:
+    """
+    Compute every local rubric signal for a story.
+    
+    Args:
+        story_text: The story to check
+        
+    Returns:
+        LocalChecks with counts, flags, a conciseness score and the list of
+        clear-cut failures (empty when the judge is still needed)
+    """
+    word_count = len(story_text.split())
+    words = words_of(story_text)
+    paragraphs = [p for p in re.split(r"\n\s*\n", story_text.strip()) if p.strip()]
+    repetition = repetition_ratio(words)
+    banned = sorted({w for w in words if w in BANNED_WORDS})
+    
+    failures = []
+    if word_count < HARD_MIN_WORDS or word_count > HARD_MAX_WORDS:
+        failures.append(f"length {word_count} words is far outside {MIN_WORDS}-{MAX_WORDS}")
+    if banned:
+        failures.append(f"age-inappropriate words: {', '.join(banned)}")
+    if repetition > MAX_REPETITION_RATIO:
+        failures.append(f"{repetition:.0%} of word trigrams are repeated")
+    
+    return LocalChecks(
+        word_count=word_count,
+        paragraph_count=len(paragraphs),
+        sentence_count=len(_SENTENCE_RE.findall(story_text)),
+        has_dialogue=bool(_DIALOGUE_RE.search(story_text)),
+        ends_cleanly=story_text.rstrip().endswith((".", "!", "?", "\"", "”")),
+        repetition_ratio=repetition,
+        banned_words=banned,
+        conciseness_score=conciseness_score(word_count, repetition),
+        failures=failures
+    )
@@ -0,0 +1,235 @@
+"""
+Request Coalescing - Single-flight sharing of identical in-flight generations
+
+At peak, many users send the same popular request at the same moment, and
+the response cache cannot help until the first of them has finished. A
+`SingleFlight` lets the first caller for a key (the leader) run the work
+while concurrent callers with the same key wait for it and share its
+result, so N identical requests cost one orchestrator / writer / evaluator
+chain instead of N. Errors are shared the same way; callers that arrive
+after the flight has finished start a new one (or hit the cache).
+
+Two flights are used:
+- "pipeline": first-turn `generate_story_pipeline` / `agenerate_story_pipeline`
+  calls, keyed by the normalized request (turns with a conversation history
+  or a session depend on more than the request and are never coalesced)
+- "writer": writer tool calls, keyed by the writer's cache key (rendered
+  prompt + request), which catches identical writer calls from any path
+
+Fan-out: with COALESCE_VARIANTS=N > 1, concurrent identical requests are
+spread over up to N flights, each generating its own variant of the story
+(the variant number goes into the writer cache key); later callers join the
+least shared variant.
+
+Metrics (agents/metrics.py): coalesce.<flight>.leaders, .coalesced and
+.calls_saved (LLM calls the leader made that each coalesced caller did not).
+"""
+import os
+import asyncio
+import threading
+import unicodedata
+import contextvars
+from typing import Any, Awaitable, Callable, Dict, Optional
+from agents import metrics
+from agents.instrumentation import current_trace
+
+
+# Set COALESCE_ENABLED=false to run every request on its own
+COALESCE_ENABLED = os.getenv("COALESCE_ENABLED", "true").lower() != "false"
+# Distinct stories generated for a burst of identical requests (1 = everyone shares one story)
+COALESCE_VARIANTS = max(1, int(os.getenv("COALESCE_VARIANTS", "1")))
+
+# Variant being generated by the current flight (0 = the plain, cacheable one)
+_variant: contextvars.ContextVar = contextvars.ContextVar("coalesce_variant", default=0)
+
+
+def current_variant() -> int:
+    """Variant number of the generation running in this context."""
+    return _variant.get()
+
+
+def normalize_request(text: str) -> str:
+    """Coalescing key of a request: case, Unicode forms, spacing and trailing punctuation do not matter."""
+    return " ".join(unicodedata.normalize("NFKC", text).casefold().split()).strip(" .!?")
+
+
+def _calls_made() -> Optional[int]:
+    """LLM calls recorded so far in the current request trace (None outside a traced request)."""
+    trace = current_trace()
+    return sum(entry["calls"] for entry in trace.record()["stages"].values()) if trace else None
+
+
+def _calls_since(before: Optional[int]) -> int:
+    # Untraced callers (e.g. a writer tool invoked directly) are assumed to have made one call
+    return _calls_made() - before if before is not None else 1
+
+
+class _Flight:
+    __slots__ = ("done", "task", "result", "error", "followers", "calls")
+    
+    def __init__(self):
+        self.done = threading.Event()
+        self.task: Optional[asyncio.Future] = None
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.followers = 0
+        self.calls = 0
+
+
+class SingleFlight:
+    """
+    Run at most one call per key (and variant) at a time; concurrent callers
+    with the same key wait for it and share its result.
+    
+    Usage:
+        flight = SingleFlight("writer")
+        story, shared = flight.do(key, lambda: write(request))
+        story, shared = await flight.ado(key, lambda: awrite(request))
+    """
+    
+    def __init__(self, name: str, variants: int = 1):
+        self.name = name
+        self.variants = max(1, variants)
+        self._lock = threading.Lock()
+        self._flights: Dict[tuple, _Flight] = {}
+    
+    def _join(self, key: Any) -> tuple:
+        """(slot, flight, leader): start a free variant slot, else follow the least shared one."""
+        with self._lock:
+            flights = [self._flights.get((key, slot)) for slot in range(self.variants)]
+            for slot, flight in enumerate(flights):
+                if flight is None:
+                    flight = self._flights[(key, slot)] = _Flight()
+                    metrics.increment(f"coalesce.{self.name}.leaders")
+                    return slot, flight, True
+            slot = min(range(self.variants), key=lambda i: flights[i].followers)
+            flights[slot].followers += 1
+            metrics.increment(f"coalesce.{self.name}.coalesced")
+            return slot, flights[slot], False
+    
+    def _land(self, key: Any, slot: int, flight: _Flight) -> None:
+        with self._lock:
+            del self._flights[(key, slot)]
+        flight.done.set()
+    
+    def _shared(self, flight: _Flight) -> Any:
+        metrics.increment(f"coalesce.{self.name}.calls_saved", flight.calls)
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+    
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._flights)
+    
+    def do(self, key: Any, fn: Callable[[], Any]) -> tuple:
+        """
+        Run `fn` for `key`, or wait for the identical call already running.
+        
+        Returns:
+            (result, shared): shared is True when the result came from another caller's call
+        
+        Raises:
+            Whatever `fn` raised, in the leader and in every caller sharing its flight
+        """
+        slot, flight, leader = self._join(key)
+        if not leader:
+            flight.done.wait()
+            return self._shared(flight), True
+        
+        token = _variant.set(slot) if self.variants > 1 else None
+        before = _calls_made()
+        try:
+            flight.result = fn()
+            return flight.result, False
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        finally:
+            flight.calls = _calls_since(before)
+            if token is not None:
+                _variant.reset(token)
+            self._land(key, slot, flight)
+    
+    async def _run(self, key: Any, slot: int, flight: _Flight, factory: Callable[[], Awaitable]) -> Any:
+        before = _calls_made()
+        try:
+            flight.result = await factory()
+            return flight.result
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        finally:
+            flight.calls = _calls_since(before)
+            self._land(key, slot, flight)
+    
+    async def ado(self, key: Any, factory: Callable[[], Awaitable]) -> tuple:
+        """
+        Async variant of `do`: `factory` returns the awaitable to share.
+        
+        The leader's work runs as its own task, so a caller that is cancelled
+        (or times out) does not cancel the generation the others wait for.
+        """
+        # Flights of different event loops cannot await each other's tasks
+        key = (id(asyncio.get_running_loop()), key)
+        slot, flight, leader = self._join(key)
+        if not leader:
+            try:
+                await asyncio.shield(flight.task)
+            except BaseException:
+                if not flight.task.done():
+                    raise  # This caller was cancelled, not the flight
+            return self._shared(flight), True
+        
+        token = _variant.set(slot) if self.variants > 1 else None
+        try:
+            # The task copies this context: the leader's trace and the variant
+            flight.task = asyncio.ensure_future(self._run(key, slot, flight, factory))
+        finally:
+            if token is not None:
+                _variant.reset(token)
+        return await asyncio.shield(flight.task), False
+
+
+_flights: Dict[str, SingleFlight] = {}
+_flights_lock = threading.Lock()
+
+
+def get_flight(name: str) -> SingleFlight:
+    """Process-wide flight by name ("pipeline" fans out to COALESCE_VARIANTS, others do not)."""
+    flight = _flights.get(name)
+    if flight is None:
+        with _flights_lock:
+            flight = _flights.get(name)
+            if flight is None:
+                flight = _flights[name] = SingleFlight(name, COALESCE_VARIANTS if name == "pipeline" else 1)
+    return flight
+
+
+def coalesce(name: str, key: Any, fn: Callable[[], Any]) -> tuple:
+    """`get_flight(name).do(key, fn)`, or just `fn()` when COALESCE_ENABLED=false."""
+    if not COALESCE_ENABLED:
+        return fn(), False
+    return get_flight(name).do(key, fn)
+
+
+async def acoalesce(name: str, key: Any, factory: Callable[[], Awaitable]) -> tuple:
+    """Async variant of `coalesce`."""
+    if not COALESCE_ENABLED:
+        return await factory(), False
+    return await get_flight(name).ado(key, factory)
+
+
+def coalescing_stats() -> dict:
+    """Per flight: leaders, coalesced callers, share of requests coalesced and LLM calls saved."""
+    stats = {}
+    for name in ("pipeline", "writer"):
+        leaders = metrics.get_counter(f"coalesce.{name}.leaders")
+        coalesced = metrics.get_counter(f"coalesce.{name}.coalesced")
+        stats[name] = {
+            "leaders": int(leaders),
+            "coalesced": int(coalesced),
+            "coalesced_rate": coalesced / (leaders + coalesced) if leaders + coalesced else 0.0,
+            "calls_saved": int(metrics.get_counter(f"coalesce.{name}.calls_saved"))
+        }
+    return stats
@@ -1,12 +1,42 @@
 """
 Evaluator Agent - Story Quality Assessment with Rubric
+
+Two stages:
+1. Scoring - local checks (agents/checks.py) score conciseness and catch
+   clear-cut failures; a short structured judge call scores the remaining
+   dimensions, given the local facts. Clear-cut failures skip the judge.
+2. Fixing  - a separate rewrite call that only runs when a dimension fails,
+   in a bounded fix-and-verify loop: each rewrite is checked locally, and
+   re-judged with a short score-only call only when a judged dimension
+   failed; the loop stops at the first passing rewrite, when rewrites stop
+   improving, or at the iteration / token limits
+
+Each stage has its own token limit, so the common (approved) case never pays
+for a long generation.
+
+`StreamEvaluator` overlaps scoring with generation for the streaming
+pipelines: it consumes the writer's tokens paragraph by paragraph, runs the
+local checks as the story grows, judges finished passages in the background
+and can stop a clearly failing generation early. The final verdict merges the
+passage verdicts (a short unjudged tail is covered by the local checks), so
+it arrives right after the last token instead of one full judge call later.
 """
 import os
+import time
+import asyncio
 import warnings
-from typing import Optional, Dict
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Dict
 from pydantic import BaseModel, Field
-from langchain_openai import ChatOpenAI
 from langchain_core.messages import SystemMessage, HumanMessage
+from agents import metrics
+from agents.cache import cache_get, cache_put, make_key
+from agents.checks import (HARD_MAX_WORDS, MAX_REPETITION_RATIO, BANNED_WORDS, LocalChecks, repetition_ratio,
+                           run_local_checks, words_of)
+from agents.instrumentation import current_trace, detached_trace, stage
+from agents.llm import DEFAULT_MODEL, get_chat_model, get_or_create
+from agents.utils import estimate_tokens
 
 # Suppress LangChain structured output warnings
 warnings.filterwarnings("ignore", message=".*json_schema.*gpt-3.5-turbo.*")
@@ -21,6 +51,37 @@ class EvaluationScores(BaseModel):
     structure: float = Field(description="Score 0-10 for clear beginning, middle, end")
 
 
+class JudgeScores(BaseModel):
+    """Rubric scores the LLM judge is asked for (conciseness is computed locally)"""
+    age_appropriate: float = Field(description="Score 0-10 for age-appropriate content (5-10 years)")
+    grounded: float = Field(description="Score 0-10 for coherent, logical story flow")
+    engagement: float = Field(description="Score 0-10 for how interesting and captivating")
+    structure: float = Field(description="Score 0-10 for clear beginning, middle, end")
+
+
+class JudgeResponse(BaseModel):
+    """Response schema for the LLM judge"""
+    scores: JudgeScores
+    feedback: str = Field(description="Brief explanation of the scores (2-4 sentences)")
+
+
+class ScoringResponse(BaseModel):
+    """Result of the scoring stage (local checks merged with the judge)"""
+    scores: EvaluationScores
+    feedback: str
+    judge_skipped: bool = False
+
+
+class FixReport(BaseModel):
+    """How the fix-and-verify loop for a rejected story ended"""
+    iterations: int = Field(description="Rewrites made")
+    rejudges: int = Field(default=0, description="Score-only judge calls made on rewrites")
+    tokens: int = Field(default=0, description="Estimated tokens spent on rewrites and re-judges")
+    verified: bool = Field(description="True if the returned rewrite passed every dimension")
+    stop_reason: str = Field(description="converged, no_progress, max_iterations or token_budget")
+    scores: Optional[EvaluationScores] = Field(default=None, description="Scores of the returned rewrite, if checked")
+
+
 class EvaluationResponse(BaseModel):
     """Response schema for story evaluation"""
     scores: EvaluationScores
@@ -28,43 +89,36 @@ class EvaluationResponse(BaseModel):
     approved: bool = Field(description="True if overall_score >= 7.0")
     feedback: str = Field(description="Detailed explanation of scores and decision")
     fixed_story: Optional[str] = Field(default=None, description="Improved story if score < 7")
+    fix: Optional[FixReport] = Field(default=None, description="How the fix stage ended, if it ran")
 
 
-def evaluate_story(story_text: str) -> EvaluationResponse:
-    """
-    Evaluate story quality using a comprehensive rubric with structured output.
-    
-    Rubric (each 0-10):
-    1. Follows Guardrails - adheres to age-appropriate guidelines
-    2. Grounded - coherent, logical story flow
-    3. Conciseness - appropriate length (400-500 words)
-    4. Engagement - interesting and captivating
-    5. Structure - clear beginning, middle, end
-    
-    If score < 7: Generate fixes
-    If score >= 7: Approve as-is
-    """
-    # Create LLM with structured output
-    llm = ChatOpenAI(
-        model="gpt-3.5-turbo",
-        temperature=0.1,  # Low temperature for consistent evaluation
-        api_key=os.getenv("OPENAI_API_KEY")
-    )
-    
-    # Bind Pydantic model for structured output
-    structured_llm = llm.with_structured_output(EvaluationResponse)
-    
-    system_prompt = """You are a children's story quality evaluator and fixer using a strict rubric.
+# Any dimension below this fails the story and triggers the fix stage
+APPROVAL_THRESHOLD = 7.0
 
-YOUR TASK:
-1. Evaluate the story using the rubric below
-2. If ANY individual score < 7.0, FIX the story by:
-   - Improving each dimension that scored < 7.0
-   - Maintaining the core narrative and charm
-   - Keeping 400-500 words
-   - Be specific about which areas you improved
+# Per-stage completion limits: scores + short feedback vs. a full 400-500 word rewrite
+SCORING_MAX_TOKENS = int(os.getenv("EVALUATOR_SCORING_MAX_TOKENS", "300"))
+FIX_MAX_TOKENS = int(os.getenv("EVALUATOR_FIX_MAX_TOKENS", "1000"))
+# Score-only re-judge of a rewrite: four numbers, no feedback
+VERIFY_MAX_TOKENS = int(os.getenv("EVALUATOR_VERIFY_MAX_TOKENS", "60"))
+
+# Fix-and-verify loop limits per story. The first rewrite always runs; further rewrites and
+# re-judges only while their worst case (prompt + completion limit) fits the token budget
+FIX_MAX_ITERATIONS = max(1, int(os.getenv("EVALUATOR_FIX_MAX_ITERATIONS", "2")))
+FIX_TOKEN_BUDGET = int(os.getenv("EVALUATOR_FIX_TOKEN_BUDGET", "6000"))
+FIX_STOP_REASONS = ("converged", "no_progress", "max_iterations", "token_budget")
+
+# Streaming pipelines: evaluate while the story is written (false = evaluate the finished story)
+STREAM_EVAL_ENABLED = os.getenv("STREAM_EVAL_ENABLED", "true").lower() != "false"
+# Judge finished passages in the background (false = local checks while streaming, one judge call at the end)
+STREAM_EVAL_JUDGE = os.getenv("STREAM_EVAL_JUDGE", "true").lower() != "false"
+# Paragraphs are grouped into passages of at least this many words per judge call
+STREAM_EVAL_PASSAGE_WORDS = int(os.getenv("STREAM_EVAL_PASSAGE_WORDS", "150"))
+# A passage judged below this age-appropriateness score stops the generation
+STREAM_EVAL_ABORT_AGE_SCORE = 4.0
+# Repetition is only meaningful once there is enough text
+STREAM_EVAL_MIN_REPETITION_WORDS = 120
 
-EVALUATION RUBRIC (score each 0-10):
+RUBRIC = """EVALUATION RUBRIC (score each 0-10):
 
 1. AGE APPROPRIATE (0-10)
    - Content suitable for 5-10 years
@@ -96,31 +150,894 @@ EVALUATION RUBRIC (score each 0-10):
    - Good pacing and flow
    - Satisfying resolution
    - 10 = excellent structure, 0 = poor structure
+"""
+
+SCORING_SYSTEM_PROMPT = f"""You are a strict children's story quality judge.
+
+YOUR TASK:
+Score the story using the rubric below and explain the scores briefly.
+DO NOT rewrite or fix the story - scoring only.
+CONCISENESS is already scored locally from the exact word count - do not score it.
+PRECOMPUTED FACTS about the story are provided; trust them instead of counting yourself.
+
+{RUBRIC}
+GUARDRAILS FOR YOUR RESPONSE:
+1. You MUST provide age_appropriate, grounded, engagement and structure scores (0-10)
+2. Keep feedback to 2-4 sentences, naming the weakest dimensions and why
+3. Do not include any story text in your response"""
+
+REVISION_SCORING_SYSTEM_PROMPT = f"""You are a strict children's story quality judge.
 
-DECISION LOGIC:
-- Calculate overall_score = average of 5 scores
-- If ALL scores >= 7.0: approved=true, fixed_story=null
-- If ANY score < 7.0: approved=false, provide complete fixed_story
+YOUR TASK:
+An approved story was revised. Score ONLY the CHANGED PASSAGES below, judging how well they
+read on their own and how they fit a complete bedtime story; the rest of the story is unchanged
+and already passed.
+DO NOT rewrite or fix anything - scoring only.
+CONCISENESS is already scored locally from the exact word count - do not score it.
+PRECOMPUTED FACTS are about the whole revised story; trust them instead of counting yourself.
 
+{RUBRIC}
 GUARDRAILS FOR YOUR RESPONSE:
-1. You MUST provide age_appropriate score (0-10)
-2. You MUST provide grounded score (0-10)
-3. You MUST provide conciseness score (0-10)
-4. You MUST provide engagement score (0-10)
-5. You MUST provide structure score (0-10)
-6. You MUST calculate overall_score (average of 5 scores)
-7. You MUST set approved (true/false based on all scores >= 7)
-8. You MUST provide feedback explaining the scores
-9. If approved=false, you MUST provide the complete fixed_story (400-500 words)
-
-Do not skip any fields. Every field is required."""
-    
-    messages = [
-        SystemMessage(content=system_prompt),
-        HumanMessage(content=f"Evaluate this story and fix if ANY score < 7:\n\n{story_text}")
+1. You MUST provide age_appropriate, grounded, engagement and structure scores (0-10)
+2. Keep feedback to 1-3 sentences about the changed passages
+3. Do not include any story text in your response"""
+
+FIX_SYSTEM_PROMPT = f"""You are an expert children's story editor (ages 5-10).
+
+YOUR TASK:
+Rewrite the story so it passes the rubric, improving ONLY the failing dimensions listed by the judge.
+- Maintain the core narrative, characters and charm
+- Keep 400-500 words
+- Do not touch what already works
+
+{RUBRIC}
+Output ONLY the complete improved story text - no titles, notes or explanations."""
+
+
+VERIFY_SYSTEM_PROMPT = """You are a strict children's story quality judge (ages 5-10).
+
+YOUR TASK:
+Re-check a rewritten story. Score each dimension 0-10:
+- age_appropriate: suitable for 5-10 years, kind characters, positive tone
+- grounded: coherent, logical flow, consistent characters
+- engagement: interesting and captivating for kids
+- structure: clear beginning, middle and end with a satisfying resolution
+PRECOMPUTED FACTS are exact; length is scored locally.
+Respond with the four scores only - no feedback, no story text."""
+
+
+PASSAGE_SCORING_SYSTEM_PROMPT = f"""You are a strict children's story quality judge.
+
+YOUR TASK:
+A bedtime story is being written. Score ONLY the PASSAGE below, given its position in the story
+(the opening should introduce characters and setting, middle passages develop the problem,
+the ending resolves it warmly). The other passages are judged separately.
+DO NOT rewrite or fix anything - scoring only.
+CONCISENESS is scored locally for the whole story - do not score it.
+
+{RUBRIC}
+GUARDRAILS FOR YOUR RESPONSE:
+1. You MUST provide age_appropriate, grounded, engagement and structure scores (0-10)
+2. Keep feedback to 1-2 sentences about this passage
+3. Do not include any story text in your response"""
+
+
+def _build_scorer():
+    """Create the judge LLM bound to the JudgeResponse schema."""
+    llm = get_chat_model(temperature=0.1, max_tokens=SCORING_MAX_TOKENS)  # Low temperature for consistent evaluation
+    
+    # Bind Pydantic model for structured output
+    return llm.with_structured_output(JudgeResponse)
+
+
+def _fixer():
+    return get_chat_model(temperature=0.1, max_tokens=FIX_MAX_TOKENS)
+
+
+def _build_verifier():
+    """Create the score-only judge for rewrites, bound to the bare JudgeScores schema."""
+    return get_chat_model(temperature=0.1, max_tokens=VERIFY_MAX_TOKENS).with_structured_output(JudgeScores)
+
+
+def _scoring_messages(story_text: str, checks: LocalChecks) -> list:
+    return [
+        SystemMessage(content=SCORING_SYSTEM_PROMPT),
+        HumanMessage(content=f"PRECOMPUTED FACTS:\n{checks.facts()}\n\nScore this story:\n\n{story_text}")
+    ]
+
+
+def _merge_scores(judge: JudgeResponse, checks: LocalChecks) -> ScoringResponse:
+    """Combine the judge's scores with the locally computed ones."""
+    return ScoringResponse(
+        scores=EvaluationScores(
+            age_appropriate=min(judge.scores.age_appropriate, checks.age_cap),
+            grounded=judge.scores.grounded,
+            conciseness=checks.conciseness_score,
+            engagement=judge.scores.engagement,
+            structure=judge.scores.structure
+        ),
+        feedback=judge.feedback
+    )
+
+
+def _local_scoring(checks: LocalChecks) -> ScoringResponse:
+    """
+    Scores for a clear-cut local failure, without a judge call.
+    
+    Dimensions only the judge can assess are reported at the threshold; the
+    story is rejected by the local failures anyway and goes to the fix stage.
+    """
+    return ScoringResponse(
+        scores=EvaluationScores(
+            age_appropriate=min(APPROVAL_THRESHOLD, checks.age_cap),
+            grounded=APPROVAL_THRESHOLD,
+            conciseness=checks.conciseness_score,
+            engagement=APPROVAL_THRESHOLD,
+            structure=APPROVAL_THRESHOLD
+        ),
+        feedback=f"Judge skipped - clear-cut local failures: {'; '.join(checks.failures)}.",
+        judge_skipped=True
+    )
+
+
+def failing_dimensions(scores: EvaluationScores) -> list:
+    """Rubric dimensions scoring below the approval threshold."""
+    return [dim for dim, score in scores.model_dump().items() if score < APPROVAL_THRESHOLD]
+
+
+def _fix_messages(story_text: str, scoring: ScoringResponse) -> list:
+    failing = ", ".join(
+        f"{dim} ({getattr(scoring.scores, dim):.1f}/10)" for dim in failing_dimensions(scoring.scores)
+    )
+    return [
+        SystemMessage(content=FIX_SYSTEM_PROMPT),
+        HumanMessage(content=f"Failing dimensions: {failing}\nJudge feedback: {scoring.feedback}\n\nStory:\n\n{story_text}")
     ]
+
+
+def _verify_messages(story_text: str, checks: LocalChecks) -> list:
+    return [
+        SystemMessage(content=VERIFY_SYSTEM_PROMPT),
+        HumanMessage(content=f"PRECOMPUTED FACTS:\n{checks.facts()}\n\nScore this rewrite:\n\n{story_text}")
+    ]
+
+
+def _revision_messages(changed_paragraphs: list, checks: LocalChecks) -> list:
+    passages = "\n\n".join(changed_paragraphs)
+    return [
+        SystemMessage(content=REVISION_SCORING_SYSTEM_PROMPT),
+        HumanMessage(content=f"PRECOMPUTED FACTS:\n{checks.facts()}\n\nScore these changed passages:\n\n{passages}")
+    ]
+
+
+def _passage_messages(passage: str, index: int, final: bool) -> list:
+    position = "the ending" if final else ("the opening" if index == 0 else "a middle passage")
+    return [
+        SystemMessage(content=PASSAGE_SCORING_SYSTEM_PROMPT),
+        HumanMessage(content=f"Passage {index + 1} ({position}):\n\n{passage}")
+    ]
+
+
+def _changed_fraction(story_text: str, changed_paragraphs: list) -> float:
+    total = len(story_text.split())
+    changed = sum(len(paragraph.split()) for paragraph in changed_paragraphs)
+    return min(1.0, changed / total) if total else 1.0
+
+
+def _merge_revision(judge: JudgeResponse, checks: LocalChecks, previous: EvaluationScores,
+                    changed_fraction: float) -> ScoringResponse:
+    """
+    Update the previous scores with the judge's verdict on the changed spans.
+    
+    Whole-story dimensions move in proportion to how much of the story
+    changed; age-appropriateness is a hard floor, so one bad passage can
+    fail the story on its own.
+    """
+    def blend(old: float, new: float) -> float:
+        return old * (1 - changed_fraction) + new * changed_fraction
+    
+    return ScoringResponse(
+        scores=EvaluationScores(
+            age_appropriate=min(previous.age_appropriate, judge.scores.age_appropriate, checks.age_cap),
+            grounded=blend(previous.grounded, judge.scores.grounded),
+            conciseness=checks.conciseness_score,
+            engagement=blend(previous.engagement, judge.scores.engagement),
+            structure=blend(previous.structure, judge.scores.structure)
+        ),
+        feedback=judge.feedback
+    )
+
+
+def _cache_key(story_text: str) -> str:
+    """Content address of an evaluation: the stage prompts, limits and the story text."""
+    return make_key("evaluator", DEFAULT_MODEL, 0.1, SCORING_MAX_TOKENS, FIX_MAX_TOKENS, VERIFY_MAX_TOKENS,
+                    FIX_MAX_ITERATIONS, FIX_TOKEN_BUDGET, SCORING_SYSTEM_PROMPT, FIX_SYSTEM_PROMPT,
+                    VERIFY_SYSTEM_PROMPT, story_text)
+
+
+def _revision_cache_key(story_text: str, changed_paragraphs: list, previous: EvaluationResponse) -> str:
+    """
+    Content address of a span-only revision verdict. It is blended with the
+    previous scores, so it never shares a key with a full evaluation of the
+    same text.
+    """
+    return make_key("evaluator_revision", _cache_key(story_text), changed_paragraphs, previous.scores.model_dump())
+
+
+def _stream_cache_key(story_text: str, judge: bool) -> str:
+    """
+    Content address of a streaming verdict. Passage verdicts come from another
+    prompt than a full evaluation, so they never share a key with one.
+    """
+    return make_key("evaluator_stream", _cache_key(story_text), judge, PASSAGE_SCORING_SYSTEM_PROMPT,
+                    STREAM_EVAL_PASSAGE_WORDS)
+
+
+def _cached_evaluation(key: str) -> Optional[EvaluationResponse]:
+    # Judging is (near-)deterministic, so evaluations never keep creative variants
+    cached = cache_get("evaluator", key, variants=1)
+    return EvaluationResponse.model_validate_json(cached) if cached is not None else None
+
+
+def _combine(scoring: ScoringResponse, fixed_story: Optional[str], fix: Optional[FixReport] = None) -> EvaluationResponse:
+    """Build the final verdict; overall score and approval are computed, not generated."""
+    scores = scoring.scores.model_dump()
+    return EvaluationResponse(
+        scores=scoring.scores,
+        overall_score=sum(scores.values()) / len(scores),
+        approved=not failing_dimensions(scoring.scores),
+        feedback=scoring.feedback,
+        fixed_story=fixed_story,
+        fix=fix
+    )
+
+
+def score_story(story_text: str, checks: Optional[LocalChecks] = None) -> ScoringResponse:
+    """
+    Stage 1: rubric scores and brief feedback, no rewrite.
+    
+    Local checks run first; the judge is skipped for clear-cut failures and
+    otherwise only scores the dimensions that need judgment.
+    """
+    with stage("evaluator"):
+        checks = checks or run_local_checks(story_text)
+        metrics.increment("evaluator.scored")
+        if checks.clear_cut_failure:
+            metrics.increment("evaluator.judge_skipped")
+            return _local_scoring(checks)
+        
+        start = time.perf_counter()
+        judge = get_or_create("evaluator_scorer", _build_scorer).invoke(_scoring_messages(story_text, checks))
+        metrics.observe("evaluator.score_seconds", time.perf_counter() - start)
+        return _merge_scores(judge, checks)
+
+
+def _rewrite(messages: list) -> str:
+    with stage("evaluator"):
+        start = time.perf_counter()
+        response = _fixer().invoke(messages)
+        metrics.observe("evaluator.fix_seconds", time.perf_counter() - start)
+        metrics.increment("evaluator.fixes")
+        return response.content
+
+
+def _rejudge(messages: list) -> JudgeScores:
+    with stage("evaluator"):
+        start = time.perf_counter()
+        judge = get_or_create("evaluator_verifier", _build_verifier).invoke(messages)
+        metrics.observe("evaluator.verify_seconds", time.perf_counter() - start)
+        return judge
+
+
+async def ascore_story(story_text: str, checks: Optional[LocalChecks] = None) -> ScoringResponse:
+    """Async variant of `score_story`."""
+    with stage("evaluator"):
+        checks = checks or run_local_checks(story_text)
+        metrics.increment("evaluator.scored")
+        if checks.clear_cut_failure:
+            metrics.increment("evaluator.judge_skipped")
+            return _local_scoring(checks)
+        
+        start = time.perf_counter()
+        judge = await get_or_create("evaluator_scorer", _build_scorer).ainvoke(_scoring_messages(story_text, checks))
+        metrics.observe("evaluator.score_seconds", time.perf_counter() - start)
+        return _merge_scores(judge, checks)
+
+
+async def _arewrite(messages: list) -> str:
+    with stage("evaluator"):
+        start = time.perf_counter()
+        response = await _fixer().ainvoke(messages)
+        metrics.observe("evaluator.fix_seconds", time.perf_counter() - start)
+        metrics.increment("evaluator.fixes")
+        return response.content
+
+
+async def _arejudge(messages: list) -> JudgeScores:
+    with stage("evaluator"):
+        start = time.perf_counter()
+        judge = await get_or_create("evaluator_verifier", _build_verifier).ainvoke(messages)
+        metrics.observe("evaluator.verify_seconds", time.perf_counter() - start)
+        return judge
+
+
+def _prompt_tokens(messages: list) -> int:
+    return sum(estimate_tokens(message.content) for message in messages)
+
+
+def _needs_rejudge(scoring: ScoringResponse) -> bool:
+    """
+    A rewrite only goes back to the judge when a judged dimension failed or
+    was never judged; a story that only failed on length (conciseness) is
+    verified by the local checks alone.
+    """
+    return scoring.judge_skipped or any(dim != "conciseness" for dim in failing_dimensions(scoring.scores))
+
+
+def _carry_scores(previous: ScoringResponse, checks: LocalChecks) -> ScoringResponse:
+    """Scores of a rewrite that only needed local checks: judged dimensions carry over."""
+    return ScoringResponse(
+        scores=previous.scores.model_copy(update={
+            "conciseness": checks.conciseness_score,
+            "age_appropriate": min(previous.scores.age_appropriate, checks.age_cap)
+        }),
+        feedback=previous.feedback
+    )
+
+
+def _merge_verify(judge: JudgeScores, checks: LocalChecks) -> ScoringResponse:
+    still_failing = ", ".join(dim for dim, score in judge.model_dump().items() if score < APPROVAL_THRESHOLD)
+    return _merge_scores(JudgeResponse(
+        scores=judge,
+        feedback=f"Re-check of the previous rewrite: still weak on {still_failing}." if still_failing else "Re-check passed."
+    ), checks)
+
+
+def _rank(scoring: ScoringResponse) -> tuple:
+    """Order rewrites: fewer failing dimensions first, then the higher total score."""
+    return -len(failing_dimensions(scoring.scores)), sum(scoring.scores.model_dump().values())
+
+
+class _FixLoop:
+    """
+    State of one bounded fix-and-verify loop.
+    
+    Decides what happens next and keeps the best rewrite; `fix_and_verify`
+    and `afix_and_verify` make the LLM calls it asks for.
+    """
+    
+    def __init__(self, story_text: str, scoring: ScoringResponse):
+        self.story = story_text
+        self.scoring = scoring
+        self.best: Optional[tuple] = None  # (rewrite, its scoring or None if never checked)
+        self.iterations = 0
+        self.rejudges = 0
+        self.tokens = 0
+        self.stop_reason: Optional[str] = None
+        self._start = time.perf_counter()
+    
+    def _affordable(self, messages: list, max_tokens: int) -> bool:
+        return self.tokens + _prompt_tokens(messages) + max_tokens <= FIX_TOKEN_BUDGET
+    
+    def next_fix(self) -> Optional[list]:
+        """Messages for the next rewrite, or None once the loop has stopped."""
+        if self.stop_reason is None and self.iterations >= FIX_MAX_ITERATIONS:
+            self.stop_reason = "max_iterations"
+        if self.stop_reason is not None:
+            return None
+        messages = _fix_messages(self.story, self.scoring)
+        if self.iterations and not self._affordable(messages, FIX_MAX_TOKENS):
+            self.stop_reason = "token_budget"
+            return None
+        return messages
+    
+    def on_fix(self, messages: list, rewrite: str) -> Optional[tuple]:
+        """
+        Check a rewrite locally.
+        
+        Returns:
+            (re-judge messages, checks) when the judge is needed, None when the
+            local checks settled the rewrite (or the budget ran out)
+        """
+        self.iterations += 1
+        self.tokens += _prompt_tokens(messages) + estimate_tokens(rewrite)
+        checks = run_local_checks(rewrite)
+        if checks.clear_cut_failure:
+            self._settle(rewrite, _local_scoring(checks))
+            return None
+        if not _needs_rejudge(self.scoring):
+            metrics.increment("evaluator.fix_rejudges_skipped")
+            self._settle(rewrite, _carry_scores(self.scoring, checks))
+            return None
+        verify = _verify_messages(rewrite, checks)
+        if not self._affordable(verify, VERIFY_MAX_TOKENS):
+            # An unchecked rewrite is still the best answer when nothing was checked yet
+            if self.best is None:
+                self.best = (rewrite, None)
+            self.stop_reason = "token_budget"
+            return None
+        return verify, checks
+    
+    def on_verify(self, rewrite: str, messages: list, checks: LocalChecks, judge: JudgeScores) -> None:
+        self.rejudges += 1
+        self.tokens += _prompt_tokens(messages) + estimate_tokens(judge.model_dump_json())
+        self._settle(rewrite, _merge_verify(judge, checks))
     
-    # Get structured response
-    evaluation = structured_llm.invoke(messages)
+    def _settle(self, rewrite: str, scoring: ScoringResponse) -> None:
+        if not failing_dimensions(scoring.scores):
+            self.stop_reason = "converged"
+        elif _rank(scoring) <= _rank(self.scoring):
+            self.stop_reason = "no_progress"
+        if self.best is None or _rank(scoring) > _rank(self.best[1]):
+            self.best = (rewrite, scoring)
+        # The next rewrite starts from this one and its remaining failures
+        self.story, self.scoring = rewrite, scoring
+    
+    def finish(self) -> tuple:
+        rewrite, scoring = self.best
+        report = FixReport(
+            iterations=self.iterations,
+            rejudges=self.rejudges,
+            tokens=self.tokens,
+            verified=scoring is not None and not failing_dimensions(scoring.scores),
+            stop_reason=self.stop_reason,
+            scores=scoring.scores if scoring is not None else None
+        )
+        metrics.increment("evaluator.fix_loops")
+        metrics.increment(f"evaluator.fix_stop.{report.stop_reason}")
+        metrics.increment("evaluator.fix_rejudges", report.rejudges)
+        if report.verified:
+            metrics.increment("evaluator.fix_verified")
+        metrics.observe("evaluator.fix_iterations", report.iterations)
+        metrics.observe("evaluator.fix_loop_tokens", report.tokens)
+        metrics.observe("evaluator.fix_loop_seconds", time.perf_counter() - self._start)
+        return rewrite, report
+
+
+def fix_and_verify(story_text: str, scoring: ScoringResponse) -> tuple:
+    """
+    Stage 2 with verification: rewrite the story, check the rewrite, and
+    rewrite again while it still fails.
+    
+    Each rewrite is checked locally first (length, banned words, repetition);
+    the short score-only re-judge runs only when a judged dimension was
+    failing. Stops at the first passing rewrite, when a rewrite is no better
+    than the one before, after FIX_MAX_ITERATIONS rewrites, or when the next
+    call could exceed FIX_TOKEN_BUDGET.
+    
+    Args:
+        story_text: The rejected story
+        scoring: Its stage 1 scores
+        
+    Returns:
+        (best rewrite, FixReport)
+    """
+    loop = _FixLoop(story_text, scoring)
+    while (messages := loop.next_fix()) is not None:
+        rewrite = _rewrite(messages)
+        verify = loop.on_fix(messages, rewrite)
+        if verify is not None:
+            verify_messages, checks = verify
+            loop.on_verify(rewrite, verify_messages, checks, _rejudge(verify_messages))
+    return loop.finish()
+
+
+async def afix_and_verify(story_text: str, scoring: ScoringResponse) -> tuple:
+    """Async variant of `fix_and_verify`."""
+    loop = _FixLoop(story_text, scoring)
+    while (messages := loop.next_fix()) is not None:
+        rewrite = await _arewrite(messages)
+        verify = loop.on_fix(messages, rewrite)
+        if verify is not None:
+            verify_messages, checks = verify
+            loop.on_verify(rewrite, verify_messages, checks, await _arejudge(verify_messages))
+    return loop.finish()
+
+
+def evaluate_story(story_text: str) -> EvaluationResponse:
+    """
+    Evaluate story quality using a comprehensive rubric with structured output.
     
-    return evaluation
+    Rubric (each 0-10):
+    1. Follows Guardrails - adheres to age-appropriate guidelines
+    2. Grounded - coherent, logical story flow
+    3. Conciseness - appropriate length (400-500 words)
+    4. Engagement - interesting and captivating
+    5. Structure - clear beginning, middle, end
+    
+    If any score < 7: run the fix stage for the failing dimensions
+    If all scores >= 7: Approve as-is (no rewrite call)
+    
+    Evaluations of identical story text are served from the response cache.
+    """
+    with stage("evaluator"):
+        key = _cache_key(story_text)
+        cached = _cached_evaluation(key)
+        if cached is not None:
+            return cached
+        
+        scoring = score_story(story_text)
+        fixed_story, fix = fix_and_verify(story_text, scoring) if failing_dimensions(scoring.scores) else (None, None)
+        evaluation = _combine(scoring, fixed_story, fix)
+        cache_put("evaluator", key, evaluation.model_dump_json(), variants=1)
+        return evaluation
+
+
+async def aevaluate_story(story_text: str) -> EvaluationResponse:
+    """Async variant of `evaluate_story`."""
+    with stage("evaluator"):
+        key = _cache_key(story_text)
+        cached = _cached_evaluation(key)
+        if cached is not None:
+            return cached
+        
+        scoring = await ascore_story(story_text)
+        fixed_story, fix = await afix_and_verify(story_text, scoring) if failing_dimensions(scoring.scores) else (None, None)
+        evaluation = _combine(scoring, fixed_story, fix)
+        cache_put("evaluator", key, evaluation.model_dump_json(), variants=1)
+        return evaluation
+
+
+def _revision_needs_full_pass(changed_paragraphs: list, previous: EvaluationResponse) -> bool:
+    # Span scores are only meaningful relative to an approved baseline
+    return not changed_paragraphs or previous.fixed_story is not None or not previous.approved
+
+
+def evaluate_revision(story_text: str, changed_paragraphs: list, previous: EvaluationResponse) -> EvaluationResponse:
+    """
+    Re-evaluate a revised story by judging only the changed paragraphs.
+    
+    Global metrics (length, repetition, banned words, ending) are recomputed
+    locally over the whole story; the judge only reads the changed spans, so
+    a small edit costs a small judge prompt. Falls back to `evaluate_story`
+    when the previous verdict cannot serve as a baseline.
+    
+    Args:
+        story_text: The full revised story
+        changed_paragraphs: Paragraphs the revision replaced or inserted
+        previous: Evaluation of the story before the revision
+        
+    Returns:
+        EvaluationResponse: Same shape as `evaluate_story`
+    """
+    with stage("evaluator"):
+        if _revision_needs_full_pass(changed_paragraphs, previous):
+            return evaluate_story(story_text)
+        key = _revision_cache_key(story_text, changed_paragraphs, previous)
+        cached = _cached_evaluation(key)
+        if cached is not None:
+            return cached
+        
+        checks = run_local_checks(story_text)
+        if checks.clear_cut_failure:
+            scoring = score_story(story_text, checks)
+        else:
+            metrics.increment("evaluator.scored")
+            metrics.increment("evaluator.revisions")
+            start = time.perf_counter()
+            judge = get_or_create("evaluator_scorer", _build_scorer).invoke(_revision_messages(changed_paragraphs, checks))
+            metrics.observe("evaluator.score_seconds", time.perf_counter() - start)
+            scoring = _merge_revision(judge, checks, previous.scores, _changed_fraction(story_text, changed_paragraphs))
+        
+        fixed_story, fix = fix_and_verify(story_text, scoring) if failing_dimensions(scoring.scores) else (None, None)
+        evaluation = _combine(scoring, fixed_story, fix)
+        cache_put("evaluator", key, evaluation.model_dump_json(), variants=1)
+        return evaluation
+
+
+async def aevaluate_revision(story_text: str, changed_paragraphs: list, previous: EvaluationResponse) -> EvaluationResponse:
+    """Async variant of `evaluate_revision`."""
+    with stage("evaluator"):
+        if _revision_needs_full_pass(changed_paragraphs, previous):
+            return await aevaluate_story(story_text)
+        key = _revision_cache_key(story_text, changed_paragraphs, previous)
+        cached = _cached_evaluation(key)
+        if cached is not None:
+            return cached
+        
+        checks = run_local_checks(story_text)
+        if checks.clear_cut_failure:
+            scoring = await ascore_story(story_text, checks)
+        else:
+            metrics.increment("evaluator.scored")
+            metrics.increment("evaluator.revisions")
+            start = time.perf_counter()
+            judge = await get_or_create("evaluator_scorer", _build_scorer).ainvoke(_revision_messages(changed_paragraphs, checks))
+            metrics.observe("evaluator.score_seconds", time.perf_counter() - start)
+            scoring = _merge_revision(judge, checks, previous.scores, _changed_fraction(story_text, changed_paragraphs))
+        
+        fixed_story, fix = await afix_and_verify(story_text, scoring) if failing_dimensions(scoring.scores) else (None, None)
+        evaluation = _combine(scoring, fixed_story, fix)
+        cache_put("evaluator", key, evaluation.model_dump_json(), variants=1)
+        return evaluation
+
+
+def _merge_passages(judgements: list, checks: LocalChecks) -> ScoringResponse:
+    """
+    Combine per-passage verdicts into whole-story scores: age-appropriateness
+    is the worst passage (one bad passage fails the story), the others are
+    averaged by passage length.
+    """
+    total = sum(words for words, _ in judgements) or 1
+    
+    def weighted(dim: str) -> float:
+        return sum(words * getattr(judge.scores, dim) for words, judge in judgements) / total
+    
+    # The weakest passages explain the scores
+    ranked = sorted(enumerate(judgements), key=lambda item: min(item[1][1].scores.model_dump().values()))
+    return ScoringResponse(
+        scores=EvaluationScores(
+            age_appropriate=min(min(judge.scores.age_appropriate for _, judge in judgements), checks.age_cap),
+            grounded=weighted("grounded"),
+            conciseness=checks.conciseness_score,
+            engagement=weighted("engagement"),
+            structure=weighted("structure")
+        ),
+        feedback=" ".join(f"Passage {i + 1}: {judge.feedback}" for i, (_, judge) in ranked[:2])
+    )
+
+
+def _judge_pool() -> ThreadPoolExecutor:
+    """Background threads for passage judges in the sync streaming pipeline."""
+    return get_or_create("stream_eval_pool", lambda: ThreadPoolExecutor(max_workers=16, thread_name_prefix="stream-eval"))
+
+
+class StreamEvaluator:
+    """
+    Evaluate a story while it streams in.
+    
+    Usage (sync; use `asynchronous=True` and `afinish` on an event loop):
+        evaluator = StreamEvaluator()
+        for text in writer_tokens:
+            evaluator.feed(text)
+            if evaluator.should_stop():
+                break
+        evaluation = evaluator.finish(story_text)
+    
+    While streaming, every finished paragraph updates the running local checks
+    (length, repetition, banned words); a clear-cut failure sets `aborted` so
+    the caller can stop the writer. With `judge=True`, paragraphs are grouped
+    into passages of STREAM_EVAL_PASSAGE_WORDS words and each is judged in the
+    background; a passage that is clearly not age-appropriate also aborts.
+    Only a tail of at least a full passage is judged after the last token.
+    """
+    
+    def __init__(self, judge: bool = STREAM_EVAL_JUDGE, asynchronous: bool = False):
+        self.judge = judge
+        self.asynchronous = asynchronous
+        self.aborted: Optional[str] = None  # Reason the generation should stop, once known
+        self._buffer = ""
+        self._words: List[str] = []
+        self._passage: List[str] = []
+        self._pending: list = []  # (words, future or task) per judged passage, in story order
+        self._failed_passage: Optional[JudgeResponse] = None  # Passage verdict that aborted the generation
+        self._finishing = False
+        self._context = contextvars.copy_context() if not asynchronous else None
+    
+    def should_stop(self) -> bool:
+        if self.aborted is None and self.judge:
+            self._check_judged()
+        return self.aborted is not None
+    
+    def feed(self, text: str) -> None:
+        """Add streamed text; completed paragraphs are checked immediately."""
+        self._buffer += text
+        *paragraphs, self._buffer = self._buffer.split("\n\n")
+        for paragraph in paragraphs:
+            if paragraph.strip():
+                self._on_paragraph(paragraph.strip())
+    
+    def _abort(self, reason: str) -> None:
+        if self.aborted is None:
+            self.aborted = reason
+            metrics.increment("evaluator.stream_aborts")
+    
+    def _on_paragraph(self, paragraph: str) -> None:
+        words = words_of(paragraph)
+        self._words.extend(words)
+        banned = sorted({w for w in words if w in BANNED_WORDS})
+        if banned:
+            self._abort(f"age-inappropriate words: {', '.join(banned)}")
+        if len(self._words) > HARD_MAX_WORDS:
+            self._abort(f"story already exceeds {HARD_MAX_WORDS} words")
+        if len(self._words) >= STREAM_EVAL_MIN_REPETITION_WORDS and repetition_ratio(self._words) > MAX_REPETITION_RATIO:
+            self._abort("the story is looping (repeated word trigrams)")
+        
+        self._passage.append(paragraph)
+        if (self.judge and self.aborted is None and not self._finishing
+                and len(" ".join(self._passage).split()) >= STREAM_EVAL_PASSAGE_WORDS):
+            self._submit("\n\n".join(self._passage), final=False)
+            self._passage = []
+    
+    def _judge_passage(self, passage: str, index: int, final: bool) -> tuple:
+        """One passage judge call, recorded apart from the request trace (it overlaps the writer)."""
+        with detached_trace() as trace, stage("evaluator"):
+            judge = get_or_create("evaluator_scorer", _build_scorer).invoke(_passage_messages(passage, index, final))
+        return judge, trace
+    
+    async def _ajudge_passage(self, passage: str, index: int, final: bool) -> tuple:
+        with detached_trace() as trace, stage("evaluator"):
+            judge = await get_or_create("evaluator_scorer", _build_scorer).ainvoke(_passage_messages(passage, index, final))
+        return judge, trace
+    
+    def _submit(self, passage: str, final: bool) -> None:
+        index = len(self._pending)
+        metrics.increment("evaluator.passage_judges")
+        if self.asynchronous:
+            job = asyncio.ensure_future(self._ajudge_passage(passage, index, final))
+        else:
+            # Copy of the request's context: keeps the scheduler priority for the call
+            job = _judge_pool().submit(self._context.copy().run, self._judge_passage, passage, index, final)
+        self._pending.append((len(passage.split()), job))
+    
+    def _check_judged(self) -> None:
+        """Abort on a finished passage verdict that already fails age-appropriateness."""
+        for _, job in self._pending:
+            if job.done() and not job.cancelled() and job.exception() is None:
+                judge, _ = job.result()
+                if judge.scores.age_appropriate < STREAM_EVAL_ABORT_AGE_SCORE:
+                    self._failed_passage = judge
+                    self._abort(f"a passage scored {judge.scores.age_appropriate:.0f}/10 for age-appropriateness")
+                    return
+    
+    def _cancel_pending(self) -> None:
+        for _, job in self._pending:
+            job.cancel()
+    
+    def _start_finish(self, story_text: str) -> Optional[LocalChecks]:
+        """
+        Flush the tail of the story. Returns the whole-story checks when the
+        passage verdicts can be used, None when a plain scoring pass is needed.
+        """
+        self._finishing = True  # The rest of the story is the ending
+        self.feed("\n\n")
+        checks = run_local_checks(story_text)
+        if self.aborted is not None or checks.clear_cut_failure or not self.judge:
+            self._cancel_pending()
+            return None
+        # A tail shorter than a passage is covered by the local checks (length, banned
+        # words, clean ending), so the verdict does not wait for another judge call
+        tail, self._passage = "\n\n".join(self._passage), []
+        if len(tail.split()) >= STREAM_EVAL_PASSAGE_WORDS:
+            self._submit(tail, final=True)
+        if not self._pending:
+            return None
+        return checks
+    
+    def _passage_scoring(self, results: list, checks: LocalChecks) -> ScoringResponse:
+        failed = next((result for result in results if isinstance(result, BaseException)), None)
+        if failed is not None:
+            raise failed
+        trace = current_trace()
+        judgements = []
+        for (words, _), (judge, judge_trace) in zip(self._pending, results):
+            if trace:
+                trace.merge(judge_trace, stage_name="evaluator")
+            judgements.append((words, judge))
+        metrics.increment("evaluator.scored")
+        metrics.increment("evaluator.stream_verdicts")
+        return _merge_passages(judgements, checks)
+    
+    def _local_failure(self, story_text: str) -> ScoringResponse:
+        checks = run_local_checks(story_text)
+        metrics.increment("evaluator.scored")
+        metrics.increment("evaluator.judge_skipped")
+        if self.aborted and not checks.clear_cut_failure:
+            checks = checks._replace(failures=[*checks.failures, f"generation stopped early: {self.aborted}"])
+        scoring = _local_scoring(checks)
+        judge = self._failed_passage
+        if judge is None:
+            return scoring
+        # The passage that stopped the writer is what the fix stage has to rewrite for
+        scores = scoring.scores.model_copy(update={
+            "age_appropriate": min(scoring.scores.age_appropriate, judge.scores.age_appropriate)
+        })
+        return scoring.model_copy(update={"scores": scores, "feedback": f"{scoring.feedback} Passage judge: {judge.feedback}"})
+    
+    def finish(self, story_text: str) -> EvaluationResponse:
+        """
+        The final verdict for the (possibly partial, if aborted) story.
+        
+        Returns:
+            EvaluationResponse: Same shape as `evaluate_story`; an aborted story is
+            rejected and goes straight to the fix stage
+        """
+        with stage("evaluator"):
+            start = time.perf_counter()
+            key = _stream_cache_key(story_text, self.judge)
+            # An aborted (partial) story is never served from or stored in the cache
+            cached = _cached_evaluation(key) if self.aborted is None else None
+            if cached is not None:
+                self._cancel_pending()
+                return cached
+            
+            checks = self._start_finish(story_text)
+            scoring = None
+            if self.aborted is not None:
+                scoring = self._local_failure(story_text)
+            elif checks is not None:
+                try:
+                    scoring = self._passage_scoring([job.exception() or job.result() for _, job in self._pending], checks)
+                except Exception:  # A passage judge failed: score the whole story instead
+                    metrics.increment("evaluator.stream_fallbacks")
+            if scoring is None:
+                scoring = score_story(story_text)
+            metrics.observe("evaluator.stream_verdict_seconds", time.perf_counter() - start)
+            
+            fixed_story, fix = fix_and_verify(story_text, scoring) if failing_dimensions(scoring.scores) else (None, None)
+            evaluation = _combine(scoring, fixed_story, fix)
+            if self.aborted is None:
+                cache_put("evaluator", key, evaluation.model_dump_json(), variants=1)
+            return evaluation
+    
+    async def afinish(self, story_text: str) -> EvaluationResponse:
+        """Async variant of `finish` (for `asynchronous=True`)."""
+        with stage("evaluator"):
+            start = time.perf_counter()
+            key = _stream_cache_key(story_text, self.judge)
+            # An aborted (partial) story is never served from or stored in the cache
+            cached = _cached_evaluation(key) if self.aborted is None else None
+            if cached is not None:
+                self._cancel_pending()
+                return cached
+            
+            checks = self._start_finish(story_text)
+            scoring = None
+            if self.aborted is not None:
+                scoring = self._local_failure(story_text)
+            elif checks is not None:
+                try:
+                    results = await asyncio.gather(*(job for _, job in self._pending), return_exceptions=True)
+                    scoring = self._passage_scoring(results, checks)
+                except Exception:
+                    metrics.increment("evaluator.stream_fallbacks")
+            if scoring is None:
+                scoring = await ascore_story(story_text)
+            metrics.observe("evaluator.stream_verdict_seconds", time.perf_counter() - start)
+            
+            fixed_story, fix = await afix_and_verify(story_text, scoring) if failing_dimensions(scoring.scores) else (None, None)
+            evaluation = _combine(scoring, fixed_story, fix)
+            if self.aborted is None:
+                cache_put("evaluator", key, evaluation.model_dump_json(), variants=1)
+            return evaluation
+
+
+def fix_loop_stats() -> dict:
+    """Convergence of the fix-and-verify loop: how often rewrites pass, and what it took."""
+    loops = metrics.get_counter("evaluator.fix_loops")
+    iterations = metrics.get_summary("evaluator.fix_iterations")
+    tokens = metrics.get_summary("evaluator.fix_loop_tokens")
+    return {
+        "loops": int(loops),
+        "converged_rate": metrics.get_counter("evaluator.fix_verified") / loops if loops else 0.0,
+        "mean_iterations": iterations["mean"],
+        "max_iterations": iterations["max"],
+        "rejudges": int(metrics.get_counter("evaluator.fix_rejudges")),
+        "rejudges_skipped": int(metrics.get_counter("evaluator.fix_rejudges_skipped")),
+        "mean_tokens": tokens["mean"],
+        "stops": {reason: int(metrics.get_counter(f"evaluator.fix_stop.{reason}")) for reason in FIX_STOP_REASONS},
+        "seconds": metrics.get_summary("evaluator.fix_loop_seconds")
+    }
+
+
+def evaluator_stats() -> dict:
+    """How often the judge is skipped and stories are fixed (and rewritten), and the latency of each stage."""
+    scored = metrics.get_counter("evaluator.scored")
+    # Stories sent to the fix stage; each fix loop may rewrite its story several times
+    fixes = metrics.get_counter("evaluator.fix_loops")
+    return {
+        "evaluations": int(scored),
+        "judge_skipped": int(metrics.get_counter("evaluator.judge_skipped")),
+        "revisions": int(metrics.get_counter("evaluator.revisions")),
+        "fixes": int(fixes),
+        "fix_rate": fixes / scored if scored else 0.0,
+        "rewrites": int(metrics.get_counter("evaluator.fixes")),
+        "stream_verdicts": int(metrics.get_counter("evaluator.stream_verdicts")),
+        "stream_aborts": int(metrics.get_counter("evaluator.stream_aborts")),
+        "passage_judges": int(metrics.get_counter("evaluator.passage_judges")),
+        "score_seconds": metrics.get_summary("evaluator.score_seconds"),
+        "stream_verdict_seconds": metrics.get_summary("evaluator.stream_verdict_seconds"),
+        "fix_seconds": metrics.get_summary("evaluator.fix_seconds"),
+        "verify_seconds": metrics.get_summary("evaluator.verify_seconds"),
+        "fix_loop": fix_loop_stats()
+    }
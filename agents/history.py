@@ -0,0 +1,124 @@
+"""
+Conversation History - Compact multi-turn state for the orchestrator
+
+Resending the raw agent transcript (every user turn, tool call, full tool
+output story) makes each modification turn bigger than the last. The
+history manager keeps only what the orchestrator needs to apply the next
+change: the original request, a short list of the changes applied so far and
+the latest story. The rendered history stays under a token cap no matter how
+many turns the session has.
+
+It also remembers which writer produced the latest story and how it was
+evaluated, so a modification can be applied as an incremental revision
+(agents/writers/base.py `revise_writer`) instead of a full regeneration.
+The state round-trips through `to_dict` / `from_dict`, so it can live in a
+session store instead of the process that served the last turn.
+"""
+import os
+from typing import List, Optional
+from langchain_core.messages import AIMessage, HumanMessage
+from agents.utils import estimate_tokens
+
+
+HISTORY_TOKEN_CAP = int(os.getenv("HISTORY_TOKEN_CAP", "1500"))
+MODIFY_PREFIX = "Modify the story: "
+
+# Set REVISION_ENABLED=false to regenerate the whole story on every modification
+REVISION_ENABLED = os.getenv("REVISION_ENABLED", "true").lower() != "false"
+
+
+class ConversationHistory:
+    """Original request + change log + latest story, rendered as two messages."""
+    
+    def __init__(self, token_cap: int = HISTORY_TOKEN_CAP):
+        self.token_cap = token_cap
+        self.original_request: Optional[str] = None
+        self.changes: List[str] = []
+        self.latest_story: Optional[str] = None
+        self.tool_name: Optional[str] = None
+        self.evaluation = None
+    
+    def __bool__(self) -> bool:
+        return self.latest_story is not None
+    
+    @property
+    def can_revise(self) -> bool:
+        """Whether the next modification can edit the latest story in place."""
+        return REVISION_ENABLED and bool(self) and self.tool_name is not None
+    
+    def record_turn(self, user_request: str, story_text: str, tool_name: Optional[str] = None,
+                    evaluation=None) -> None:
+        """
+        Record a completed turn.
+        
+        Args:
+            user_request: The request as sent to the pipeline (first request or "Modify the story: ...")
+            story_text: The story the user ended up with (the evaluator's fix, if any)
+            tool_name: The writer tool that produced the story, if known
+            evaluation: The story's EvaluationResponse, the baseline for the next revision
+        """
+        if self.original_request is None:
+            self.original_request = user_request
+        else:
+            change = user_request[len(MODIFY_PREFIX):] if user_request.startswith(MODIFY_PREFIX) else user_request
+            self.changes.append(change)
+        # Only the latest story is kept; older versions are superseded by it
+        self.latest_story = story_text
+        self.tool_name = tool_name or self.tool_name
+        self.evaluation = evaluation
+    
+    def _summary(self, changes: List[str], omitted: int) -> str:
+        summary = f"Generate a bedtime story: {self.original_request}"
+        if changes or omitted:
+            lines = [f"- {change}" for change in changes]
+            if omitted:
+                lines.insert(0, f"- ({omitted} earlier changes, already reflected in the story)")
+            summary += "\n\nChanges already applied to the story:\n" + "\n".join(lines)
+        return summary
+    
+    def messages(self) -> list:
+        """
+        Render the compact history for the orchestrator.
+        
+        Oldest changes are folded into a count until the history fits the
+        token cap; the latest story is always kept because the next
+        modification has to build on it.
+        """
+        if not self:
+            return []
+        story_tokens = estimate_tokens(self.latest_story)
+        changes = list(self.changes)
+        omitted = 0
+        summary = self._summary(changes, omitted)
+        while changes and estimate_tokens(summary) + story_tokens > self.token_cap:
+            changes.pop(0)
+            omitted += 1
+            summary = self._summary(changes, omitted)
+        return [HumanMessage(content=summary), AIMessage(content=self.latest_story)]
+    
+    def token_count(self) -> int:
+        """Tokens the rendered history adds to the next orchestrator prompt."""
+        return sum(estimate_tokens(message.content) for message in self.messages())
+    
+    def to_dict(self) -> dict:
+        """JSON-serializable state (agents/sessions.py stores it between turns)."""
+        return {
+            "original_request": self.original_request,
+            "changes": list(self.changes),
+            "latest_story": self.latest_story,
+            "tool_name": self.tool_name,
+            "evaluation": self.evaluation.model_dump() if self.evaluation is not None else None
+        }
+    
+    @classmethod
+    def from_dict(cls, state: dict, token_cap: int = HISTORY_TOKEN_CAP) -> "ConversationHistory":
+        """Rebuild a history saved with `to_dict`."""
+        history = cls(token_cap)
+        history.original_request = state["original_request"]
+        history.changes = list(state["changes"])
+        history.latest_story = state["latest_story"]
+        history.tool_name = state["tool_name"]
+        if state["evaluation"] is not None:
+            from agents.evaluator import EvaluationResponse
+            history.evaluation = EvaluationResponse.model_validate(state["evaluation"])
+        return history
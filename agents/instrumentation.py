@@ -0,0 +1,274 @@
+"""
+Instrumentation - Offline per-stage latency, token and retry accounting
+
+Every pipeline request runs inside `trace_request()`, which collects a
+timing record per stage:
+
+- orchestrator: the agent's reasoning / tool-selection completion
+- tool:         time inside a writer tool that is not the writer's own LLM
+                call (prompt rendering, few-shot selection, cache lookups)
+- writer:       writer (and reviser) completions
+- evaluator:    scoring and fix completions
+- speculative:  discarded speculative writers (tokens and cost only; they run
+                in parallel with the winner, so no wall time is charged)
+
+Code stages (tool, writer, evaluator) are timed with nested `stage()` frames,
+which record exclusive time. Agent completions happen inside LangGraph, so
+`StageCallback` (agents/llm.py, attached to every chat client) times them
+as the orchestrator stage (writer tools are `return_direct`, so there is no
+agent turn after the tool), and records prompt/completion tokens for every call.
+Retries are reported by the scheduler's transport. This module does not
+import LangChain, so the CLI can load it at startup. Finished requests also update the histograms and
+counters in agents/metrics.py, exportable as Prometheus text or JSON.
+"""
+import contextlib
+import contextvars
+import functools
+import inspect
+import os
+import threading
+import time
+from typing import Optional
+from agents import metrics
+
+
+STAGES = ("orchestrator", "tool", "writer", "evaluator", "speculative")
+
+# USD per 1K tokens for the default model (override for other models / price changes)
+PROMPT_PRICE_PER_1K = float(os.getenv("PROMPT_PRICE_PER_1K", "0.0005"))
+COMPLETION_PRICE_PER_1K = float(os.getenv("COMPLETION_PRICE_PER_1K", "0.0015"))
+
+
+class RequestTrace:
+    """Per-request accumulator; shared by every task and thread working on the request."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.total_seconds: Optional[float] = None
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage_name: str, seconds: float = 0.0, calls: int = 0, prompt_tokens: int = 0,
+            completion_tokens: int = 0, retries: int = 0) -> None:
+        with self._lock:
+            entry = self.stages.setdefault(stage_name, {
+                "calls": 0, "seconds": 0.0, "prompt_tokens": 0, "completion_tokens": 0, "retries": 0
+            })
+            entry["calls"] += calls
+            entry["seconds"] += max(0.0, seconds)
+            entry["prompt_tokens"] += prompt_tokens
+            entry["completion_tokens"] += completion_tokens
+            entry["retries"] += retries
+    
+    def merge(self, other: "RequestTrace", stage_name: Optional[str] = None) -> None:
+        """Fold another trace's stages into this one (all under `stage_name`, if given)."""
+        with other._lock:
+            entries = [(name, dict(entry)) for name, entry in other.stages.items()]
+        for name, entry in entries:
+            seconds = entry.pop("seconds")
+            self.add(stage_name or name, seconds=0.0 if stage_name else seconds, **entry)
+
+    def record(self) -> dict:
+        """The structured timing record attached to pipeline results."""
+        total = self.total_seconds if self.total_seconds is not None else time.perf_counter() - self.start
+        with self._lock:
+            stages = {name: dict(entry, seconds=round(entry["seconds"], 4),
+                                 cost_usd=round(_cost(entry), 6))
+                      for name, entry in self.stages.items()}
+        attributed = sum(entry["seconds"] for entry in stages.values())
+        return {
+            "total_seconds": round(total, 4),
+            "unattributed_seconds": round(max(0.0, total - attributed), 4),
+            "prompt_tokens": sum(entry["prompt_tokens"] for entry in stages.values()),
+            "completion_tokens": sum(entry["completion_tokens"] for entry in stages.values()),
+            "cost_usd": round(sum(entry["cost_usd"] for entry in stages.values()), 6),
+            "stages": stages
+        }
+
+
+class _Frame:
+    __slots__ = ("name", "parent", "child_seconds")
+
+    def __init__(self, name: str, parent: Optional["_Frame"]):
+        self.name = name
+        self.parent = parent
+        self.child_seconds = 0.0
+
+
+_trace: contextvars.ContextVar = contextvars.ContextVar("request_trace", default=None)
+_frame: contextvars.ContextVar = contextvars.ContextVar("stage_frame", default=None)
+
+
+def token_cost(prompt_tokens: int, completion_tokens: int) -> float:
+    """Estimated USD cost of a completion."""
+    return (prompt_tokens * PROMPT_PRICE_PER_1K + completion_tokens * COMPLETION_PRICE_PER_1K) / 1000
+
+
+def _cost(entry: dict) -> float:
+    return token_cost(entry["prompt_tokens"], entry["completion_tokens"])
+
+
+def _reset(var: contextvars.ContextVar, token: contextvars.Token) -> None:
+    try:
+        var.reset(token)
+    except ValueError:  # A generator finalized from another context; that context never saw the value
+        pass
+
+
+def current_trace() -> Optional[RequestTrace]:
+    return _trace.get()
+
+
+def current_stage() -> Optional[str]:
+    frame = _frame.get()
+    return frame.name if frame else None
+
+
+@contextlib.contextmanager
+def trace_request():
+    """
+    Collect stage timings for one pipeline request.
+
+    Yields:
+        The RequestTrace; call `.record()` for the timing record
+    """
+    trace = RequestTrace()
+    token = _trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _reset(_trace, token)
+        trace.total_seconds = time.perf_counter() - trace.start
+        _aggregate(trace)
+
+
+@contextlib.contextmanager
+def detached_trace():
+    """
+    Record the block into a separate RequestTrace, outside any enclosing stage,
+    for work that may be thrown away (merge it into the request's trace if kept).
+    
+    Yields:
+        The separate RequestTrace
+    """
+    trace = RequestTrace()
+    trace_token = _trace.set(trace)
+    frame_token = _frame.set(None)
+    try:
+        yield trace
+    finally:
+        _reset(_frame, frame_token)
+        _reset(_trace, trace_token)
+        trace.total_seconds = time.perf_counter() - trace.start
+
+
+@contextlib.contextmanager
+def stage(name: str):
+    """
+    Attribute the block's wall time to `name`, excluding nested stages
+    (a writer call inside a tool counts as writer, not tool).
+    """
+    frame = _Frame(name, _frame.get())
+    token = _frame.set(frame)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        _reset(_frame, token)
+        if frame.parent:
+            frame.parent.child_seconds += elapsed
+        trace = _trace.get()
+        if trace:
+            trace.add(name, seconds=elapsed - frame.child_seconds)
+
+
+def traced(pipeline):
+    """
+    Run a pipeline function inside `trace_request()` and attach the timing
+    record as "timings" to its result dict (or to the final "result" event
+    of a streaming pipeline). Works for sync / async functions and generators.
+    """
+    def attach(result, trace: RequestTrace):
+        if isinstance(result, dict) and result.get("type", "result") == "result":
+            result["timings"] = trace.record()
+        return result
+    
+    if inspect.isasyncgenfunction(pipeline):
+        @functools.wraps(pipeline)
+        async def wrapper(*args, **kwargs):
+            with trace_request() as trace:
+                async for event in pipeline(*args, **kwargs):
+                    yield attach(event, trace)
+    elif inspect.isgeneratorfunction(pipeline):
+        @functools.wraps(pipeline)
+        def wrapper(*args, **kwargs):
+            with trace_request() as trace:
+                for event in pipeline(*args, **kwargs):
+                    yield attach(event, trace)
+    elif inspect.iscoroutinefunction(pipeline):
+        @functools.wraps(pipeline)
+        async def wrapper(*args, **kwargs):
+            with trace_request() as trace:
+                return attach(await pipeline(*args, **kwargs), trace)
+    else:
+        @functools.wraps(pipeline)
+        def wrapper(*args, **kwargs):
+            with trace_request() as trace:
+                return attach(pipeline(*args, **kwargs), trace)
+    return wrapper
+
+
+def record_retry() -> None:
+    """Count a retried API call against the current stage (agent completions count as orchestrator)."""
+    trace = _trace.get()
+    if trace:
+        trace.add(current_stage() or "orchestrator", retries=1)
+
+
+def token_usage(response) -> Optional[tuple]:
+    """(prompt_tokens, completion_tokens) reported for an LLMResult, or None if unknown."""
+    usage = (response.llm_output or {}).get("token_usage") or {}
+    if usage.get("prompt_tokens") is not None:
+        return usage["prompt_tokens"], usage.get("completion_tokens", 0)
+    # Streaming calls (stream_usage=True) report usage on the aggregated message
+    for generations in response.generations:
+        for generation in generations:
+            usage_metadata = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage_metadata:
+                return usage_metadata["input_tokens"], usage_metadata["output_tokens"]
+    return None
+
+
+def _aggregate(trace: RequestTrace) -> None:
+    """Fold a finished request into the process-wide histograms and counters."""
+    record = trace.record()
+    metrics.observe("request_seconds", record["total_seconds"])
+    metrics.increment("requests")
+    for name, entry in record["stages"].items():
+        labels = f'{{stage="{name}"}}'
+        metrics.observe(f"stage_seconds{labels}", entry["seconds"])
+        metrics.increment(f"stage_calls{labels}", entry["calls"])
+        metrics.increment(f"stage_prompt_tokens{labels}", entry["prompt_tokens"])
+        metrics.increment(f"stage_completion_tokens{labels}", entry["completion_tokens"])
+        metrics.increment(f"stage_retries{labels}", entry["retries"])
+        metrics.increment(f"stage_cost_usd{labels}", entry["cost_usd"])
+
+
+def stage_summary() -> dict:
+    """Aggregated per-stage latency histograms, tokens, retries and cost since start (or reset)."""
+    summary = {}
+    for name in STAGES:
+        labels = f'{{stage="{name}"}}'
+        seconds = metrics.get_summary(f"stage_seconds{labels}")
+        if not seconds["count"]:
+            continue
+        summary[name] = {
+            "seconds": seconds,
+            "calls": int(metrics.get_counter(f"stage_calls{labels}")),
+            "prompt_tokens": int(metrics.get_counter(f"stage_prompt_tokens{labels}")),
+            "completion_tokens": int(metrics.get_counter(f"stage_completion_tokens{labels}")),
+            "retries": int(metrics.get_counter(f"stage_retries{labels}")),
+            "cost_usd": round(metrics.get_counter(f"stage_cost_usd{labels}"), 6)
+        }
+    return summary
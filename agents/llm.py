@@ -0,0 +1,211 @@
+"""
+LLM Registry - Process-wide cache of chat clients and compiled agents
+
+Building a ChatOpenAI client, compiling a LangGraph agent or binding a
+structured output schema is pure setup work that does not depend on the
+request. The registry builds each of them once per configuration and hands
+the same instance to every thread and task. All clients share one pooled
+HTTP connection pool (sync and async), so keep-alive connections to the API
+are reused across requests instead of re-negotiating TLS each time.
+
+Every client also goes through the shared request scheduler
+(agents/scheduler.py): token-bucket admission, priorities and rate-limit
+retries at the transport, and reports every completion to the per-stage
+instrumentation through `StageCallback`.
+
+The chat model class is pluggable: `set_backend()` / `use_backend()` swap
+ChatOpenAI for any factory accepting the same keyword arguments (the offline
+benchmarks use a synthetic or replaying model, see benchmarks/fake_llm.py and
+benchmarks/replay_llm.py).
+"""
+import os
+import time
+import threading
+import contextlib
+from typing import Any, Callable, Hashable, Optional
+import httpx
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_openai import ChatOpenAI
+from agents import scheduler
+from agents.instrumentation import current_stage, current_trace, token_usage
+
+
+DEFAULT_MODEL = "gpt-3.5-turbo"
+
+# Connection pool size shared by all clients (override for large server deployments)
+MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "20"))
+
+_registry: dict = {}
+# Chat model factory; None means ChatOpenAI
+_backend: Optional[Callable[..., Any]] = None
+# Re-entrant: building an agent looks up its chat model from inside the factory
+_lock = threading.RLock()
+
+
+def get_or_create(key: Hashable, factory: Callable[[], Any]) -> Any:
+    """
+    Return the cached object for `key`, building it with `factory` on first use.
+    
+    Lookups are lock-free; only the first build of a key takes the lock, so
+    concurrent first requests still build each object exactly once.
+    """
+    try:
+        return _registry[key]
+    except KeyError:
+        pass
+    with _lock:
+        if key not in _registry:
+            _registry[key] = factory()
+        return _registry[key]
+
+
+def clear_cache() -> None:
+    """Drop every cached client and agent (e.g. after swapping the backend or API key)."""
+    with _lock:
+        _registry.clear()
+
+
+def set_backend(factory: Optional[Callable[..., Any]]) -> None:
+    """
+    Build chat models with `factory` instead of ChatOpenAI (None restores ChatOpenAI).
+    
+    The factory receives ChatOpenAI's keyword arguments (model, temperature,
+    max_tokens, callbacks, ...). Cached clients and agents are dropped so the
+    next request is built on the new backend.
+    """
+    global _backend
+    with _lock:
+        _backend = factory
+        _registry.clear()
+
+
+@contextlib.contextmanager
+def use_backend(factory: Optional[Callable[..., Any]]):
+    """Use `factory` as the chat model backend for the duration of the block."""
+    previous = _backend
+    set_backend(factory)
+    try:
+        yield
+    finally:
+        set_backend(previous)
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=MAX_CONNECTIONS,
+        max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS
+    )
+
+
+def get_scheduler() -> Optional[scheduler.RequestScheduler]:
+    """The process-wide request scheduler (None when SCHEDULER_ENABLED=false)."""
+    if not scheduler.SCHEDULER_ENABLED:
+        return None
+    return get_or_create("scheduler", scheduler.RequestScheduler)
+
+
+def _build_http_client() -> httpx.Client:
+    transport = httpx.HTTPTransport(limits=_limits())
+    if get_scheduler():
+        transport = scheduler.RetryTransport(get_scheduler(), transport)
+    return httpx.Client(transport=transport)
+
+
+def _build_async_http_client() -> httpx.AsyncClient:
+    transport = httpx.AsyncHTTPTransport(limits=_limits())
+    if get_scheduler():
+        transport = scheduler.AsyncRetryTransport(get_scheduler(), transport)
+    return httpx.AsyncClient(transport=transport)
+
+
+def get_http_client() -> httpx.Client:
+    """Shared, thread-safe sync connection pool."""
+    return get_or_create("http_client", _build_http_client)
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Shared async connection pool (reused by all tasks on the serving event loop)."""
+    return get_or_create("http_async_client", _build_async_http_client)
+
+
+class StageCallback(BaseCallbackHandler):
+    """
+    Attributes each completion's tokens to the current stage, and times the
+    agent's own completions (which run outside any code stage).
+    """
+
+    run_inline = True
+
+    def __init__(self):
+        self._calls = {}  # run_id -> (trace, stage, timed_here, start)
+        self._lock = threading.Lock()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs) -> None:
+        trace = current_trace()
+        if trace is None:
+            return
+        name = current_stage()
+        # Inside the agent graph: writer tools are return_direct, so the
+        # orchestrator's tool-selection turn is the only agent completion
+        timed_here = name is None
+        if timed_here:
+            name = "orchestrator"
+        with self._lock:
+            self._calls[run_id] = (trace, name, timed_here, time.perf_counter())
+
+    def _finish(self, run_id, response=None) -> None:
+        with self._lock:
+            call = self._calls.pop(run_id, None)
+        if call is None:
+            return
+        trace, name, timed_here, start = call
+        prompt_tokens, completion_tokens = (token_usage(response) if response else None) or (0, 0)
+        trace.add(name, seconds=time.perf_counter() - start if timed_here else 0.0, calls=1,
+                  prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+
+    def on_llm_end(self, response, *, run_id, **kwargs) -> None:
+        self._finish(run_id, response)
+
+    def on_llm_error(self, error, *, run_id, **kwargs) -> None:
+        self._finish(run_id)
+
+
+def _build_chat_model(model: str, temperature: float, max_tokens: Optional[int]) -> ChatOpenAI:
+    request_scheduler = get_scheduler()
+    # Per-stage latency / token accounting (agents/instrumentation.py)
+    callbacks = [get_or_create("stage_callback", StageCallback)]
+    options = {}
+    if request_scheduler:
+        # The transport retries (through the scheduler), so the SDK must not retry on its own
+        callbacks.append(scheduler.UsageCallback(request_scheduler))
+        options = {"rate_limiter": request_scheduler, "max_retries": 0}
+    return (_backend or ChatOpenAI)(
+        model=model,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        api_key=os.getenv("OPENAI_API_KEY"),
+        http_client=get_http_client(),
+        http_async_client=get_async_http_client(),
+        stream_usage=True,  # Streamed calls report usage too, for the TPM bucket and stage records
+        callbacks=callbacks,
+        **options
+    )
+
+
+def get_chat_model(model: str = DEFAULT_MODEL, temperature: float = 0.1, max_tokens: Optional[int] = None) -> ChatOpenAI:
+    """
+    Get the shared chat client for a (model, temperature, max_tokens) configuration.
+    
+    Args:
+        model: OpenAI model name
+        temperature: Sampling temperature
+        max_tokens: Completion token limit (None = model default)
+        
+    Returns:
+        A ChatOpenAI instance, built once per configuration
+    """
+    return get_or_create(
+        ("chat", model, temperature, max_tokens),
+        lambda: _build_chat_model(model, temperature, max_tokens)
+    )
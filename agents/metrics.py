@@ -0,0 +1,134 @@
+"""
+Metrics - In-process counters and latency summaries
+
+Thread-safe and dependency-free, so any agent can record what it did without
+a network service. Read with `snapshot()`, export with `to_prometheus()` or
+`export(path)`. Names may carry Prometheus labels, e.g.
+`stage_seconds{stage="writer"}`.
+"""
+import json
+import re
+import threading
+import time
+from collections import defaultdict
+
+
+# Histogram upper bounds (seconds) for latency observations; the last bucket is +Inf
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_lock = threading.Lock()
+_counters: dict = defaultdict(float)
+_summaries: dict = {}
+
+
+def increment(name: str, value: float = 1.0) -> None:
+    """Add `value` to a counter."""
+    with _lock:
+        _counters[name] += value
+
+
+def _bucket(value: float) -> int:
+    for i, bound in enumerate(LATENCY_BUCKETS):
+        if value <= bound:
+            return i
+    return len(LATENCY_BUCKETS)
+
+
+def observe(name: str, value: float) -> None:
+    """Record one observation (e.g. a latency in seconds) in a summary and its histogram."""
+    with _lock:
+        summary = _summaries.get(name)
+        if summary is None:
+            summary = _summaries[name] = {
+                "count": 0, "sum": 0.0, "min": value, "max": value,
+                "buckets": [0] * (len(LATENCY_BUCKETS) + 1)
+            }
+        summary["count"] += 1
+        summary["sum"] += value
+        summary["min"] = min(summary["min"], value)
+        summary["max"] = max(summary["max"], value)
+        summary["buckets"][_bucket(value)] += 1
+
+
+def get_counter(name: str) -> float:
+    with _lock:
+        return _counters.get(name, 0.0)
+
+
+def get_summary(name: str) -> dict:
+    """
+    Summary with count, sum, min, max, mean and per-bucket counts
+    (`buckets[i]` counts values <= LATENCY_BUCKETS[i], the last entry is +Inf).
+    """
+    with _lock:
+        summary = _summaries.get(name)
+        if summary is None:
+            summary = {"count": 0, "sum": 0.0, "min": 0.0, "max": 0.0, "buckets": [0] * (len(LATENCY_BUCKETS) + 1)}
+        summary = dict(summary, buckets=list(summary["buckets"]))
+    summary["mean"] = summary["sum"] / summary["count"] if summary["count"] else 0.0
+    return summary
+
+
+def snapshot() -> dict:
+    """All counters and summaries recorded so far."""
+    with _lock:
+        names = list(_summaries)
+        counters = dict(_counters)
+    return {"counters": counters, "summaries": {name: get_summary(name) for name in names}}
+
+
+def reset() -> None:
+    with _lock:
+        _counters.clear()
+        _summaries.clear()
+
+
+def _split_name(name: str) -> tuple:
+    """("base", 'key="value",...') for a metric name with optional {labels}."""
+    base, _, labels = name.partition("{")
+    return re.sub(r"[^a-zA-Z0-9_:]", "_", base), labels.rstrip("}")
+
+
+def _labels(*parts: str) -> str:
+    parts = [part for part in parts if part]
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _le(bound) -> str:
+    return 'le="%s"' % (bound if isinstance(bound, str) else f"{bound:g}")
+
+
+def to_prometheus(prefix: str = "storyteller") -> str:
+    """Render every counter and histogram in the Prometheus text exposition format."""
+    data = snapshot()
+    lines, typed = [], set()
+    for name, value in sorted(data["counters"].items()):
+        base, labels = _split_name(name)
+        metric = f"{prefix}_{base}" if base.endswith("_total") else f"{prefix}_{base}_total"
+        if metric not in typed:
+            lines.append(f"# TYPE {metric} counter")
+            typed.add(metric)
+        lines.append(f"{metric}{_labels(labels)} {value:g}")
+    for name, summary in sorted(data["summaries"].items()):
+        base, labels = _split_name(name)
+        metric = f"{prefix}_{base}"
+        if metric not in typed:
+            lines.append(f"# TYPE {metric} histogram")
+            typed.add(metric)
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, summary["buckets"]):
+            cumulative += count
+            lines.append(f"{metric}_bucket{_labels(labels, _le(bound))} {cumulative}")
+        lines.append(f"{metric}_bucket{_labels(labels, _le('+Inf'))} {summary['count']}")
+        lines.append(f"{metric}_sum{_labels(labels)} {summary['sum']:g}")
+        lines.append(f"{metric}_count{_labels(labels)} {summary['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def export(path: str) -> None:
+    """Write all metrics to `path`: JSON for *.json, Prometheus text otherwise."""
+    with open(path, "w", encoding="utf-8") as f:
+        if path.endswith(".json"):
+            json.dump(dict(snapshot(), exported_at=time.time()), f, indent=2)
+        else:
+            f.write(to_prometheus())
@@ -2,23 +2,191 @@
 Orchestrator Agent - Modern LangChain Agent with Writer Tools
 """
 import os
-from langchain_openai import ChatOpenAI
+import time
+import uuid
+import contextlib
+from typing import AsyncIterator, Callable, Iterator, Optional
 from langchain.agents import create_agent
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, SystemMessage, ToolMessage
+from agents import metrics
+from agents.llm import get_chat_model, get_or_create
+from agents.router import StoryRouter, RouteDecision, record_route
+from agents.speculation import Speculation, speculation_candidates
+from agents.writers.base import stream_writer, astream_writer
+from agents.writers.registry import get_registry
 
-# Import writer tools
-from agents.writers.princess import generate_princess_story
-from agents.writers.christmas import generate_christmas_story
-from agents.writers.animal import generate_animal_story
+# Set ROUTER_ENABLED=false to always let the ReAct agent pick the writer
+ROUTER_ENABLED = os.getenv("ROUTER_ENABLED", "true").lower() != "false"
+# Writer tools offered to the orchestrator per request: the router's top genres, not all of them
+ORCHESTRATOR_MAX_TOOLS = max(2, int(os.getenv("ORCHESTRATOR_MAX_TOOLS", "3")))
+
+ORCHESTRATOR_SYSTEM_PROMPT = """You are a story orchestrator for children's bedtime stories (ages 5-10).
+
+You have access to these specialized story writer tools:
+{tool_list}
+
+MULTI-TURN CONVERSATION SUPPORT:
+- For NEW story requests: Call the appropriate writer tool based on the request
+- For MODIFICATIONS: Review the previous story from conversation history, understand the change request,
+  then call the writer tool with a modified prompt that incorporates both the original intent AND the changes
+
+CRITICAL GUARDRAILS FOR YOUR RESPONSE:
+1. Call the MOST APPROPRIATE writer tool based on the user's request
+2. Call exactly ONE writer tool per request - never answer without calling a tool
+3. The tool's story is returned to the user directly, so do not write a Final Answer yourself
+"""
+
+
+def _system_prompt(tool_names: tuple) -> str:
+    """Orchestrator prompt listing the offered writers with their genre hints."""
+    tool_list = "\n".join(f"- {spec.name}: Use for {spec.use_for}" for spec in get_registry().specs(tool_names))
+    return ORCHESTRATOR_SYSTEM_PROMPT.format(tool_list=tool_list)
+
+
+def _writer_choices(user_request: str, conversation_history: list = None) -> tuple:
+    """
+    Writer tools to offer the orchestrator for this request.
+    
+    With up to ORCHESTRATOR_MAX_TOOLS genres every writer is offered. Beyond
+    that the router ranks the genres (on the whole conversation for a
+    modification, always keeping the writer of the latest story) and only
+    the top ones are bound, so the tool schema stays the same size however
+    many genres are registered.
+    """
+    names = get_registry().names()
+    if len(names) <= ORCHESTRATOR_MAX_TOOLS:
+        return tuple(names)
+    history = conversation_history or []
+    text = " ".join([m.content for m in history if isinstance(m, HumanMessage)] + [user_request])
+    previous = writer_tool_name(history)
+    chosen = [previous] if previous else []
+    chosen += [name for name in get_router().rank(text) if name not in chosen]
+    # Registry order keeps one cached agent per tool set
+    return tuple(sorted(chosen[:ORCHESTRATOR_MAX_TOOLS], key=names.index))
+
+
+def _build_agent(tool_names: tuple):
+    """Create the ReAct agent wired to the given writer tools."""
+    # Initialize model
+    model = get_chat_model(temperature=0.1)  # Low temperature for consistent tool selection
+    
+    # Create agent with tools and system prompt
+    return create_agent(
+        model=model,
+        tools=get_registry().tools(list(tool_names)),
+        system_prompt=_system_prompt(tool_names)
+    )
+
+
+def _get_agent(tool_names: tuple):
+    """Shared agent per offered tool set."""
+    return get_or_create(("orchestrator_agent", tool_names), lambda: _build_agent(tool_names))
+
+
+def _build_selector(tool_names: tuple):
+    """The orchestrator model forced to pick a writer, without running it (speculative mode)."""
+    return get_chat_model(temperature=0.1).bind_tools(get_registry().tools(list(tool_names)), tool_choice="any")
+
+
+async def _achoose_writer(user_request: str) -> str:
+    """Ask the orchestrator which writer fits a first-turn request; returns the tool name."""
+    tool_names = _writer_choices(user_request)
+    selector = get_or_create(("orchestrator_selector", tool_names), lambda: _build_selector(tool_names))
+    response = await selector.ainvoke([
+        SystemMessage(content=_system_prompt(tool_names)),
+        HumanMessage(content=_first_turn_content(user_request))
+    ])
+    names = [call["name"] for call in response.tool_calls if call["name"] in tool_names]
+    if not names:
+        raise ValueError("orchestrator did not pick a writer tool")
+    return names[0]
+
+
+def _first_turn_content(user_request: str) -> str:
+    return f"Generate a bedtime story: {user_request}"
+
+
+def _build_messages(user_request: str, conversation_history: list = None) -> list:
+    """Build the agent input from the current request and prior turns."""
+    if conversation_history:
+        messages = conversation_history.copy()
+        messages.append({"role": "user", "content": user_request})
+    else:
+        messages = [{"role": "user", "content": _first_turn_content(user_request)}]
+    return messages
+
+
+def get_router() -> StoryRouter:
+    """Shared router, trained once from every genre's examples and writer tool description."""
+    return get_or_create("story_router", lambda: StoryRouter(get_registry().specs()))
+
+
+def _route(user_request: str, conversation_history: list = None) -> Optional[RouteDecision]:
+    """Route first-turn requests locally; modifications always need the agent's context."""
+    if not ROUTER_ENABLED or conversation_history:
+        return None
+    return get_router().route(user_request)
+
+
+def _direct_messages(user_request: str, tool_name: str, story_text: str) -> list:
+    """
+    Message history for a routed request, shaped like the agent's own output
+    (ending in the writer's ToolMessage) so a follow-up modification turn
+    through the agent sees the same context.
+    """
+    call_id = f"call_router_{uuid.uuid4().hex[:12]}"
+    return [
+        HumanMessage(content=_first_turn_content(user_request)),
+        AIMessage(content="", tool_calls=[{"name": tool_name, "args": {"user_request": user_request}, "id": call_id}]),
+        ToolMessage(content=story_text, tool_call_id=call_id, name=tool_name)
+    ]
+
+
+def _story_from_messages(messages: list) -> str:
+    """
+    Take the story straight from the writer's ToolMessage.
+    
+    Writer tools are `return_direct`, so the agent graph ends right after the
+    tool runs and there is no echo turn; the final AI message is only used
+    as a fallback if the model answered without calling a tool.
+    """
+    for message in reversed(messages):
+        if isinstance(message, ToolMessage):
+            return message.content
+        if isinstance(message, HumanMessage):
+            break
+    return messages[-1].content
+
+
+def _stopped_messages(messages: list, story_text: str) -> list:
+    """
+    Close an agent transcript whose writer stream was stopped early: answer the
+    pending writer tool call with the partial story, as the tool would have.
+    """
+    for message in reversed(messages):
+        if isinstance(message, AIMessage) and message.tool_calls:
+            call = message.tool_calls[0]
+            return [*messages, ToolMessage(content=story_text, tool_call_id=call["id"], name=call["name"])]
+    return messages
+
+
+def writer_tool_name(messages: list) -> Optional[str]:
+    """Name of the writer tool that produced the latest story, if any."""
+    for message in reversed(messages):
+        if isinstance(message, ToolMessage):
+            return message.name
+    return None
 
 
 def generate_story(user_request: str, conversation_history: list = None) -> tuple:
     """
     Generate a story using modern LangChain agent with specialized writer tools.
     
-    The agent will:
+    Confident first-turn requests are routed locally and the writer is called
+    directly. Otherwise the agent will:
     1. Reason about which genre fits the request (or modification)
     2. Call the appropriate writer tool
-    3. Return the generated story
+    3. Return the tool's story directly (no echo turn)
     
     Args:
         user_request: Current user request (new story or modification)
@@ -27,63 +195,225 @@ def generate_story(user_request: str, conversation_history: list = None) -> tupl
     Returns:
         tuple: (story_text, updated_messages) for state management
     """
-    # Initialize model
-    model = ChatOpenAI(
-        model="gpt-3.5-turbo",
-        temperature=0.1,  # Low temperature for consistent tool selection
-        api_key=os.getenv("OPENAI_API_KEY")
-    )
+    start = time.perf_counter()
+    decision = _route(user_request, conversation_history)
     
-    # Define available tools
-    tools = [
-        generate_princess_story,
-        generate_christmas_story,
-        generate_animal_story
-    ]
+    # Confident first-turn request: call the writer directly, no ReAct round trip
+    if decision and decision.confident:
+        story_text = get_registry().tool(decision.tool_name).invoke({"user_request": user_request})
+        record_route(True, time.perf_counter() - start)
+        return story_text, _direct_messages(user_request, decision.tool_name, story_text)
     
-    # Create agent with tools and system prompt
-    agent = create_agent(
-        model=model,
-        tools=tools,
-        system_prompt="""You are a story orchestrator for children's bedtime stories (ages 5-10).
+    agent = _get_agent(_writer_choices(user_request, conversation_history))
+    
+    # Invoke agent with full conversation context
+    result = agent.invoke({"messages": _build_messages(user_request, conversation_history)})
+    if decision:
+        record_route(False, time.perf_counter() - start)
+    
+    # Extract the story from the tool output and return with full message history
+    return _story_from_messages(result["messages"]), result["messages"]
 
-You have access to three specialized story writer tools:
-- generate_princess_story: Use for princess, royal, castle, magic, fairy tale themes
-- generate_christmas_story: Use for Christmas, holiday, Santa, winter, giving themes  
-- generate_animal_story: Use for animal characters, nature, wildlife, animal wisdom themes
 
-MULTI-TURN CONVERSATION SUPPORT:
-- For NEW story requests: Call the appropriate writer tool based on the request
-- For MODIFICATIONS: Review the previous story from conversation history, understand the change request,
-  then call the writer tool with a modified prompt that incorporates both the original intent AND the changes
+async def agenerate_story(user_request: str, conversation_history: list = None) -> tuple:
+    """
+    Async variant of `generate_story`.
+    
+    Uses `agent.ainvoke`, so both the orchestrator model and the writer tool
+    run natively on the event loop and many sessions can share one process.
+    
+    Args:
+        user_request: Current user request (new story or modification)
+        conversation_history: List of previous messages for multi-turn context
+    
+    Returns:
+        tuple: (story_text, updated_messages) for state management
+    """
+    start = time.perf_counter()
+    decision = _route(user_request, conversation_history)
+    
+    if decision and decision.confident:
+        story_text = await get_registry().tool(decision.tool_name).ainvoke({"user_request": user_request})
+        record_route(True, time.perf_counter() - start)
+        return story_text, _direct_messages(user_request, decision.tool_name, story_text)
+    
+    # Ambiguous request: candidate writers start while the orchestrator decides
+    candidates = speculation_candidates(decision)
+    if candidates:
+        speculation = Speculation(user_request, candidates)
+        story_text = "".join([text async for text in speculation.stream(_achoose_writer(user_request))])
+        record_route(False, time.perf_counter() - start)
+        return story_text, _direct_messages(user_request, speculation.winner, story_text)
+    
+    agent = _get_agent(_writer_choices(user_request, conversation_history))
+    
+    result = await agent.ainvoke({"messages": _build_messages(user_request, conversation_history)})
+    if decision:
+        record_route(False, time.perf_counter() - start)
+    
+    return _story_from_messages(result["messages"]), result["messages"]
 
-CRITICAL GUARDRAILS FOR YOUR RESPONSE:
-1. Call the MOST APPROPRIATE writer tool based on the user's request
-2. After the tool returns the story, your Final Answer MUST be EXACTLY the story text from the tool
-3. DO NOT add "Here is...", "Once upon a time I'll tell you...", titles, or any wrapper text
-4. DO NOT summarize, shorten, or paraphrase the story
-5. DO NOT add your own sentences before or after the story
-6. Your entire response should be ONLY the story text - nothing else
-7. Copy the tool output word-for-word as your Final Answer
-
-Example:
-Tool returns: "Princess Luna was brave..."
-Your Final Answer: "Princess Luna was brave..." (exact same text, nothing added)
-
-NOT: "Here is the story: Princess Luna was brave..."
-NOT: "Let me tell you about Princess Luna..."
-"""
-    )
+
+def _writer_token(mode: str, payload) -> Optional[str]:
+    """
+    Pick writer tokens out of the agent's ("messages" | "values") stream.
     
-    # Build messages list with conversation history
-    if conversation_history:
-        messages = conversation_history.copy()
-        messages.append({"role": "user", "content": user_request})
-    else:
-        messages = [{"role": "user", "content": f"Generate a bedtime story: {user_request}"}]
+    Writer LLM calls run inside the "tools" node; the orchestrator's own
+    tool-call chunks come from the model node and are skipped.
+    """
+    if mode != "messages":
+        return None
+    chunk, metadata = payload
+    if metadata.get("langgraph_node") == "tools" and isinstance(chunk, AIMessageChunk) and chunk.content:
+        return chunk.content
+    return None
+
+
+def _whole_story_token(story_text: str, start: float) -> dict:
+    """The complete story as a single token event, for a writer that produced no stream."""
+    metrics.observe("stream.first_token_seconds", time.perf_counter() - start)
+    return {"type": "token", "text": story_text}
+
+
+def stream_story(user_request: str, conversation_history: list = None,
+                 stop: Optional[Callable[[], bool]] = None) -> Iterator[dict]:
+    """
+    Streaming variant of `generate_story`.
     
-    # Invoke agent with full conversation context
-    result = agent.invoke({"messages": messages})
+    Args:
+        user_request: Current user request (new story or modification)
+        conversation_history: List of previous messages for multi-turn context
+        stop: Checked after every token; returning True stops the writer early
+            (e.g. the streaming evaluator found a clear-cut failure) and the
+            partial story is returned
+    
+    Yields:
+        {"type": "token", "text": ...} for each writer chunk as it arrives (the
+        whole story as one token when the writer tool did not stream, e.g. a
+        response cache hit), then one final
+        {"type": "story", "story": ..., "messages": ...} event
+    """
+    start = time.perf_counter()
+    first_token = True
+    decision = _route(user_request, conversation_history)
+    
+    if decision and decision.confident:
+        parts = []
+        with contextlib.closing(stream_writer(decision.tool_name, user_request)) as tokens:
+            for text in tokens:
+                if first_token:
+                    metrics.observe("stream.first_token_seconds", time.perf_counter() - start)
+                    first_token = False
+                parts.append(text)
+                yield {"type": "token", "text": text}
+                if stop and stop():
+                    break
+        story_text = "".join(parts)
+        record_route(True, time.perf_counter() - start)
+        yield {"type": "story", "story": story_text, "messages": _direct_messages(user_request, decision.tool_name, story_text)}
+        return
+    
+    agent = _get_agent(_writer_choices(user_request, conversation_history))
+    
+    messages, parts, stopped = [], [], False
+    with contextlib.closing(agent.stream({"messages": _build_messages(user_request, conversation_history)},
+                                         stream_mode=["messages", "values"])) as events:
+        for mode, payload in events:
+            text = _writer_token(mode, payload)
+            if text:
+                if first_token:
+                    metrics.observe("stream.first_token_seconds", time.perf_counter() - start)
+                    first_token = False
+                parts.append(text)
+                yield {"type": "token", "text": text}
+                if stop and stop():
+                    stopped = True
+                    break
+            elif mode == "values":
+                messages = payload["messages"]
+    if decision:
+        record_route(False, time.perf_counter() - start)
+    
+    if stopped:
+        story_text = "".join(parts)
+        yield {"type": "story", "story": story_text, "messages": _stopped_messages(messages, story_text)}
+        return
+    story_text = _story_from_messages(messages)
+    if not parts and story_text:
+        # The writer tool returned without streaming (cache hit or a coalesced call)
+        yield _whole_story_token(story_text, start)
+    yield {"type": "story", "story": story_text, "messages": messages}
+
+
+async def astream_story(user_request: str, conversation_history: list = None,
+                        stop: Optional[Callable[[], bool]] = None) -> AsyncIterator[dict]:
+    """Async variant of `stream_story` (same event protocol and `stop` callback)."""
+    start = time.perf_counter()
+    first_token = True
+    decision = _route(user_request, conversation_history)
+    
+    if decision and decision.confident:
+        parts = []
+        async with contextlib.aclosing(astream_writer(decision.tool_name, user_request)) as tokens:
+            async for text in tokens:
+                if first_token:
+                    metrics.observe("stream.first_token_seconds", time.perf_counter() - start)
+                    first_token = False
+                parts.append(text)
+                yield {"type": "token", "text": text}
+                if stop and stop():
+                    break
+        story_text = "".join(parts)
+        record_route(True, time.perf_counter() - start)
+        yield {"type": "story", "story": story_text, "messages": _direct_messages(user_request, decision.tool_name, story_text)}
+        return
+    
+    # Ambiguous request: candidate writers start while the orchestrator decides
+    candidates = speculation_candidates(decision)
+    if candidates:
+        speculation = Speculation(user_request, candidates)
+        parts = []
+        async with contextlib.aclosing(speculation.stream(_achoose_writer(user_request))) as tokens:
+            async for text in tokens:
+                if first_token:
+                    metrics.observe("stream.first_token_seconds", time.perf_counter() - start)
+                    first_token = False
+                parts.append(text)
+                yield {"type": "token", "text": text}
+                if stop and stop():
+                    break
+        story_text = "".join(parts)
+        record_route(False, time.perf_counter() - start)
+        yield {"type": "story", "story": story_text, "messages": _direct_messages(user_request, speculation.winner, story_text)}
+        return
+    
+    agent = _get_agent(_writer_choices(user_request, conversation_history))
+    
+    messages, parts, stopped = [], [], False
+    async with contextlib.aclosing(agent.astream({"messages": _build_messages(user_request, conversation_history)},
+                                                 stream_mode=["messages", "values"])) as events:
+        async for mode, payload in events:
+            text = _writer_token(mode, payload)
+            if text:
+                if first_token:
+                    metrics.observe("stream.first_token_seconds", time.perf_counter() - start)
+                    first_token = False
+                parts.append(text)
+                yield {"type": "token", "text": text}
+                if stop and stop():
+                    stopped = True
+                    break
+            elif mode == "values":
+                messages = payload["messages"]
+    if decision:
+        record_route(False, time.perf_counter() - start)
     
-    # Extract the final message content and return with full message history
-    return result["messages"][-1].content, result["messages"]
+    if stopped:
+        story_text = "".join(parts)
+        yield {"type": "story", "story": story_text, "messages": _stopped_messages(messages, story_text)}
+        return
+    story_text = _story_from_messages(messages)
+    if not parts and story_text:
+        # The writer tool returned without streaming (cache hit or a coalesced call)
+        yield _whole_story_token(story_text, start)
+    yield {"type": "story", "story": story_text, "messages": messages}
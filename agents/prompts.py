@@ -0,0 +1,110 @@
+"""
+Prompt Templates - Precompiled, cached genre system prompts
+
+Each writer's system prompt is a large static block of instructions, a
+few-shot examples section and the user request. The static parts and every
+example block are rendered once and kept in memory; per call only the
+selected examples (see `ExampleSelector`) and the user request are spliced
+in. The cached render is invalidated when any example file under `examples/<genre>/`
+is added, removed or modified (checked via mtime/size at most once per
+RELOAD_CHECK_INTERVAL seconds, no file reads).
+
+Once the genre's story index (agents/retrieval.py) holds approved stories
+similar to the request, up to STORY_INDEX_EXAMPLES of the examples come
+from it and the curated examples fill the remaining slots and budget.
+"""
+import time
+import threading
+from agents import metrics
+from agents.retrieval import retrieve_examples
+from agents.utils import (
+    EXAMPLES_DIR, FEW_SHOT_TOKEN_BUDGET, FEW_SHOT_TOP_K, ExampleSelector, FewShotSelection, load_examples
+)
+
+
+EXAMPLES_PLACEHOLDER = "{examples}"
+REQUEST_PLACEHOLDER = "{user_request}"
+
+# Minimum seconds between mtime checks, so hot paths do not stat() on every call
+RELOAD_CHECK_INTERVAL = 1.0
+
+_templates: dict = {}
+
+
+def _examples_signature(genre: str) -> tuple:
+    """Cheap fingerprint of a genre's example files: (name, mtime_ns, size) per file."""
+    signature = []
+    for file in sorted((EXAMPLES_DIR / genre).glob("*.md")):
+        stat = file.stat()
+        signature.append((file.name, stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+class GenrePrompt:
+    """
+    A genre system prompt with `{examples}` and `{user_request}` placeholders.
+    
+    The text around the placeholders and the BM25 example index are built
+    once and reused until the example files change on disk.
+    """
+    
+    def __init__(self, genre: str, template: str):
+        self.genre = genre
+        self.template = template
+        self._signature = None
+        # (head, middle, tail, selector) around {examples} and {user_request}, swapped atomically
+        self._parts = ("", "", "", None)
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        _templates[genre] = self
+    
+    def compile(self) -> None:
+        """(Re)load the examples and render the static parts of the prompt."""
+        with self._lock:
+            signature = _examples_signature(self.genre)
+            if signature == self._signature:
+                return
+            head, _, rest = self.template.partition(EXAMPLES_PLACEHOLDER)
+            middle, _, tail = rest.partition(REQUEST_PLACEHOLDER)
+            selector = ExampleSelector(load_examples(self.genre))
+            self._parts, self._signature = (head, middle, tail, selector), signature
+            self._checked_at = time.monotonic()
+    
+    def select(self, user_request: str) -> tuple:
+        """
+        Render the prompt and report which examples were used.
+        
+        Returns:
+            tuple: (system_prompt, FewShotSelection)
+        """
+        now = time.monotonic()
+        if self._signature is None or now - self._checked_at > RELOAD_CHECK_INTERVAL:
+            self._checked_at = now
+            if _examples_signature(self.genre) != self._signature:
+                self.compile()
+        head, middle, tail, selector = self._parts
+        retrieved = retrieve_examples(self.genre, user_request, token_budget=FEW_SHOT_TOKEN_BUDGET)
+        if retrieved is None:
+            selection = selector.select(user_request)
+        else:
+            curated = selector.select(user_request, top_k=max(FEW_SHOT_TOP_K - len(retrieved.names), 0),
+                                      token_budget=FEW_SHOT_TOKEN_BUDGET - retrieved.prompt_tokens)
+            selection = FewShotSelection(
+                text="\n".join(block for block in (retrieved.text, curated.text) if block),
+                names=retrieved.names + curated.names,
+                prompt_tokens=retrieved.prompt_tokens + curated.prompt_tokens,
+                tokens_saved=max(curated.tokens_saved - retrieved.prompt_tokens, 0)
+            )
+        return f"{head}{selection.text}{middle}{user_request}{tail}", selection
+    
+    def render(self, user_request: str) -> str:
+        """Splice the selected examples and the user request into the cached prompt."""
+        prompt, selection = self.select(user_request)
+        metrics.observe("prompt.tokens_saved", selection.tokens_saved)
+        return prompt
+
+
+def preload_prompts() -> None:
+    """Compile every registered genre prompt (call once at startup)."""
+    for prompt in list(_templates.values()):
+        prompt.compile()
@@ -0,0 +1,527 @@
+"""
+Story Index - Incremental offline retrieval over approved stories
+
+The curated few-shot set is three hand-picked stories per genre. Every story
+the evaluator approves is also added to a per-genre index, and the writers
+pull their most relevant examples from it (agents/prompts.py), so the
+examples grow with the corpus instead of staying fixed.
+
+- Embeddings: hashed n-grams. The request and the story's most frequent
+  words and word pairs are feature-hashed (signed) into STORY_INDEX_DIM
+  dimensions; request and story get equal weight. No model, no network
+- Storage: memory-mapped NumPy arrays under `.cache/story_index/<genre>/`.
+  Each story keeps its STORY_NONZERO largest dimensions (index + float16
+  weight), plus its content hash and the offset of its text in a JSON lines
+  file. `meta.json` holds the committed row count, so a crash mid-append
+  loses at most the rows being added
+- Search: requests are short, so a query has only a few non-zero
+  dimensions. For every dimension the index keeps the POSTINGS stories with
+  the largest positive and negative weight ("impact-ordered" postings). A
+  query gathers the leading postings of its dimensions plus the rows added
+  since the postings were last merged, then scores those candidates exactly.
+  The work per query depends on the request length, not on the index size.
+  Query terms are weighted by inverse document frequency over the hashed
+  dimensions
+- Incremental: embeddings are never recomputed. New rows land in an unmerged
+  tail that every query scans, and are merged into the postings once the
+  tail reaches STORY_INDEX_TAIL rows
+- Off the request path: `index_story` only puts the story on a bounded
+  queue; a background writer thread embeds and appends queued stories in
+  batches per genre (at most STORY_INDEX_BATCH_SIZE stories or
+  STORY_INDEX_FLUSH_SECONDS of waiting), so hashing, appends and merges never
+  block a request or the `serve` event loop. A full queue drops the story
+  (counted in `story_index.dropped`), like the story store (agents/store.py)
+
+One process writes an index at a time (the CLI, `serve` or `batch`); other
+processes see new rows when they next open it.
+"""
+import os
+import json
+import math
+import time
+import zlib
+import queue
+import atexit
+import threading
+from collections import Counter
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from agents import metrics
+from agents.utils import FewShotSelection, estimate_tokens, format_example, tokenize, truncate_example
+
+
+STORY_INDEX_ENABLED = os.getenv("STORY_INDEX_ENABLED", "true").lower() != "false"
+STORY_INDEX_PATH = os.getenv("STORY_INDEX_PATH", str(Path(__file__).parent.parent / ".cache" / "story_index"))
+STORY_INDEX_DIM = int(os.getenv("STORY_INDEX_DIM", "1024"))
+# Few-shot examples taken from the index per writer call (the curated examples fill the rest)
+STORY_INDEX_EXAMPLES = int(os.getenv("STORY_INDEX_EXAMPLES", "1"))
+# Minimum cosine similarity for a retrieved story to be used as an example
+STORY_INDEX_MIN_SCORE = float(os.getenv("STORY_INDEX_MIN_SCORE", "0.12"))
+# Unmerged rows (scanned by every query) before they are merged into the postings
+STORY_INDEX_TAIL = int(os.getenv("STORY_INDEX_TAIL", "512"))
+STORY_INDEX_BATCH_SIZE = int(os.getenv("STORY_INDEX_BATCH_SIZE", "64"))
+STORY_INDEX_FLUSH_SECONDS = float(os.getenv("STORY_INDEX_FLUSH_SECONDS", "1.0"))
+# Stories waiting for the writer thread; beyond this they are dropped, never blocking a request
+STORY_INDEX_QUEUE_SIZE = int(os.getenv("STORY_INDEX_QUEUE_SIZE", "10000"))
+
+# Most frequent words / word pairs of a story that go into its embedding
+STORY_FEATURES = 48
+# Weight of the request part of a story's embedding relative to the story text
+REQUEST_WEIGHT = 1.0
+# Non-zero dimensions kept per stored story
+STORY_NONZERO = 64
+# Stories kept per dimension and sign
+POSTINGS = 512
+# Posting entries a query reads, spread over its dimensions
+QUERY_CANDIDATES = 8192
+_INITIAL_CAPACITY = 1024
+_SCORE_CHUNK = 65536
+
+
+@lru_cache(maxsize=65536)
+def _stem(word: str) -> str:
+    """Crude suffix stripping so "dragons" / "sharing" match "dragon" / "share"."""
+    for suffix in ("ing", "ed", "es", "s"):
+        if len(word) > len(suffix) + 3 and word.endswith(suffix):
+            return word[:-len(suffix)]
+    return word
+
+
+def _features(text: str, limit: Optional[int] = None) -> Dict[str, float]:
+    """Word and word-pair counts (the `limit` most frequent), sublinearly scaled."""
+    words = [_stem(word) for word in tokenize(text)]
+    counts = Counter(words)
+    counts.update(f"{a} {b}" for a, b in zip(words, words[1:]))
+    return {feature: 1.0 + math.log(count) for feature, count in counts.most_common(limit)}
+
+
+def _hashed(features: Dict[str, float], dim: int) -> np.ndarray:
+    """Signed feature hashing into `dim` dimensions, unit length (collisions cancel out on average)."""
+    vector = np.zeros(dim, dtype=np.float32)
+    if not features:
+        return vector
+    hashes = np.fromiter((zlib.crc32(feature.encode("utf-8")) for feature in features), dtype=np.uint32,
+                         count=len(features))
+    signs = np.where(hashes & 0x80000000, 1.0, -1.0).astype(np.float32)
+    np.add.at(vector, hashes % dim, signs * np.fromiter(features.values(), dtype=np.float32, count=len(features)))
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def embed(story: str, request: str = "", dim: int = STORY_INDEX_DIM) -> np.ndarray:
+    """
+    Hashed n-gram embedding (float32, unit length) of a story and the request
+    it was written for. Both parts are normalized separately, so a short
+    request keeps its REQUEST_WEIGHT share next to a long story.
+    """
+    vector = _hashed(_features(story, STORY_FEATURES), dim) + REQUEST_WEIGHT * _hashed(_features(request), dim)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def _content_hash(story: str) -> int:
+    data = story.encode("utf-8")
+    return zlib.crc32(data) << 32 | zlib.adler32(data)
+
+
+class StoryIndex:
+    """Append-only, memory-mapped hashed n-gram index of one genre's stories."""
+    
+    def __init__(self, root: str, dim: int = STORY_INDEX_DIM, tail: int = STORY_INDEX_TAIL):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        meta_path = self.root / "meta.json"
+        meta = json.loads(meta_path.read_text()) if meta_path.exists() else {"dim": dim, "count": 0, "merged": 0}
+        self.dim = meta["dim"]
+        self.count = meta["count"]
+        self.tail = tail
+        self._lock = threading.Lock()
+        self._text = open(self.root / "stories.jsonl", "ab+")
+        # Reads have their own handle, so a lookup never waits for an append or a merge
+        self._reader = open(self.root / "stories.jsonl", "rb")
+        self._read_lock = threading.Lock()
+        self._open_arrays(max(_INITIAL_CAPACITY, self.count))
+        self._load_postings(meta["merged"])
+    
+    # --- storage ---------------------------------------------------------------------------
+    
+    def _array(self, name: str, dtype, shape: tuple) -> np.memmap:
+        path = self.root / name
+        size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        with open(path, "ab") as f:
+            if f.tell() < size:
+                f.truncate(size)
+        return np.memmap(path, dtype=dtype, mode="r+", shape=shape)
+    
+    def _open_arrays(self, capacity: int) -> None:
+        self.capacity = capacity
+        self._dims = self._array("dims.u16", np.uint16, (capacity, STORY_NONZERO))
+        self._weights = self._array("weights.f16", np.float16, (capacity, STORY_NONZERO))
+        self._hashes = self._array("hashes.u64", np.uint64, (capacity,))
+        self._offsets = self._array("offsets.i64", np.int64, (capacity,))
+    
+    def _load_postings(self, merged: int) -> None:
+        path = self.root / "postings.npz"
+        if path.exists():
+            with np.load(path) as saved:
+                rows, weights, doc_freq = saved["rows"], saved["weights"], saved["doc_freq"]
+        else:
+            # Per dimension: [positive side, negative side] x POSTINGS, strongest first; row -1 = empty
+            rows = np.full((self.dim, 2, POSTINGS), -1, dtype=np.int32)
+            weights = np.zeros((self.dim, 2, POSTINGS), dtype=np.float16)
+            doc_freq = np.zeros(self.dim, dtype=np.int64)
+        # Swapped as one tuple: concurrent searches see the old or the new postings, never a mix
+        self._postings = (rows, weights, merged)
+        self._doc_freq = doc_freq
+        self._idf = self._inverse_doc_freq(doc_freq, merged)
+        self._sorted_hashes = np.sort(self._hashes[:merged])
+    
+    @staticmethod
+    def _inverse_doc_freq(doc_freq: np.ndarray, rows: int) -> np.ndarray:
+        """Query weight per dimension: rare hashed dimensions say more about a story than common ones."""
+        return (np.log((rows + 1) / (doc_freq + 1)) + 1.0).astype(np.float32)
+    
+    def _commit(self) -> None:
+        tmp = self.root / "meta.json.tmp"
+        tmp.write_text(json.dumps({"dim": self.dim, "count": self.count, "merged": self._postings[2]}))
+        os.replace(tmp, self.root / "meta.json")
+    
+    def nbytes(self) -> dict:
+        """Bytes on disk (memory-mapped, paged in on demand) and held in process memory."""
+        disk = sum(path.stat().st_size for path in self.root.iterdir() if path.is_file())
+        rows, weights, _ = self._postings
+        memory = rows.nbytes + weights.nbytes + self._sorted_hashes.nbytes + self._doc_freq.nbytes
+        return {"disk": disk, "memory": memory}
+    
+    # --- writes ----------------------------------------------------------------------------
+    
+    def _contains(self, content_hash: int) -> bool:
+        position = np.searchsorted(self._sorted_hashes, content_hash)
+        if position < len(self._sorted_hashes) and self._sorted_hashes[position] == content_hash:
+            return True
+        return bool((self._hashes[len(self._sorted_hashes):self.count] == content_hash).any())
+    
+    def add_many(self, items: List[Tuple[str, str, float]]) -> int:
+        """
+        Append stories (one commit for the batch).
+        
+        Args:
+            items: (story, request, overall_score) tuples; stories already
+                in the index are skipped
+        
+        Returns:
+            Number of stories added
+        """
+        with self._lock:
+            rows = []
+            seen = set()
+            for story, request, score in items:
+                content_hash = _content_hash(story)
+                if content_hash in seen or self._contains(content_hash):
+                    continue
+                seen.add(content_hash)
+                rows.append((story, request, score, content_hash))
+            if not rows:
+                return 0
+            if self.count + len(rows) > self.capacity:
+                self._open_arrays(max(self.capacity * 2, self.count + len(rows)))
+            
+            start = self.count
+            for row, (story, request, score, content_hash) in enumerate(rows, start):
+                vector = embed(story, request, self.dim)
+                # Keep the strongest dimensions (all of them for typical stories)
+                dims = np.argpartition(-np.abs(vector), STORY_NONZERO - 1)[:STORY_NONZERO]
+                self._dims[row] = dims
+                self._weights[row] = vector[dims]
+                self._hashes[row] = content_hash
+            self._text.seek(0, os.SEEK_END)
+            for row, (story, request, score, _) in enumerate(rows, start):
+                self._offsets[row] = self._text.tell()
+                self._text.write(json.dumps({"story": story, "request": request, "score": score}).encode("utf-8") + b"\n")
+            self._text.flush()
+            self.count = start + len(rows)
+            if self.count - self._postings[2] >= self.tail:
+                self._merge()
+            self._commit()
+        metrics.increment("story_index.added", len(rows))
+        return len(rows)
+    
+    def add(self, story: str, request: str = "", score: float = 0.0) -> bool:
+        """Append one story; False if it was already indexed."""
+        return self.add_many([(story, request, score)]) == 1
+    
+    def _merge(self) -> None:
+        """Merge the tail rows into the postings (keeping the POSTINGS strongest per dimension and sign)."""
+        old_rows, old_weights, merged = self._postings
+        count = self.count
+        tail_dims = self._dims[merged:count].astype(np.int64)
+        tail_weights = self._weights[merged:count]
+        nonzero = tail_weights != 0
+        doc_freq = self._doc_freq.copy()
+        np.add.at(doc_freq, tail_dims[nonzero], 1)
+        
+        # Every (dimension, side, row, weight) entry, old postings and new rows together
+        tail_rows = np.broadcast_to(np.arange(merged, count, dtype=np.int32)[:, None], tail_dims.shape)[nonzero]
+        tail_dims, tail_weights = tail_dims[nonzero], tail_weights[nonzero]
+        old_dims, old_sides, _ = np.nonzero(old_rows >= 0)
+        entry_dims = np.concatenate([old_dims, tail_dims])
+        entry_sides = np.concatenate([old_sides, (tail_weights < 0).astype(np.int64)])
+        entry_rows = np.concatenate([old_rows[old_rows >= 0], tail_rows])
+        entry_weights = np.concatenate([old_weights[old_rows >= 0], tail_weights])
+        
+        # Strongest first within each (dimension, side), then keep the first POSTINGS of each group
+        group = entry_dims * 2 + entry_sides
+        order = np.lexsort((-np.abs(entry_weights.astype(np.float32)), group))
+        group = group[order]
+        starts = np.searchsorted(group, group, side="left")
+        rank = np.arange(len(group)) - starts
+        keep = order[rank < POSTINGS]
+        rows = np.full_like(old_rows, -1)
+        weights = np.zeros_like(old_weights)
+        kept_rank = rank[rank < POSTINGS]
+        rows[entry_dims[keep], entry_sides[keep], kept_rank] = entry_rows[keep]
+        weights[entry_dims[keep], entry_sides[keep], kept_rank] = entry_weights[keep]
+        
+        np.savez(self.root / "postings.tmp.npz", rows=rows, weights=weights, doc_freq=doc_freq)
+        os.replace(self.root / "postings.tmp.npz", self.root / "postings.npz")
+        self._doc_freq = doc_freq
+        self._idf = self._inverse_doc_freq(doc_freq, count)
+        self._sorted_hashes = np.sort(self._hashes[:count])
+        self._postings = (rows, weights, count)
+        metrics.increment("story_index.merges")
+    
+    # --- reads -----------------------------------------------------------------------------
+    
+    def _score(self, rows: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Exact cosine of stored rows against a (dense, unit) query."""
+        return (query[self._dims[rows]] * self._weights[rows]).sum(axis=1)
+    
+    def search(self, request: str, k: int = 3, exact: bool = False) -> List[Tuple[int, float]]:
+        """
+        Top-k stories for a request.
+        
+        Args:
+            request: The user request
+            k: Number of results
+            exact: Score every row instead of the postings candidates (for recall checks)
+        
+        Returns:
+            (row, cosine similarity) pairs, best first
+        """
+        posting_rows, _, merged = self._postings
+        count = self.count
+        if not count:
+            return []
+        query = embed("", request, self.dim) * self._idf
+        norm = np.linalg.norm(query)
+        if not norm:
+            return []
+        query /= norm
+        if exact:
+            rows = np.arange(count)
+            scores = np.concatenate([self._score(rows[i:i + _SCORE_CHUNK], query)
+                                     for i in range(0, count, _SCORE_CHUNK)])
+        else:
+            dims = np.flatnonzero(query)
+            depth = min(POSTINGS, max(1, QUERY_CANDIDATES // len(dims)))
+            # Stories strong on the same side of each query dimension, plus the unmerged tail
+            candidates = posting_rows[dims, (query[dims] < 0).astype(np.int64), :depth].ravel()
+            rows = np.unique(np.concatenate([candidates[candidates >= 0], np.arange(merged, count, dtype=np.int32)]))
+            scores = self._score(rows, query)
+        if len(scores) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top])]
+        return [(int(rows[i]), float(scores[i])) for i in top]
+    
+    def record(self, row: int) -> dict:
+        """The stored story, request and score of a row."""
+        with self._read_lock:
+            self._reader.seek(int(self._offsets[row]))
+            return json.loads(self._reader.readline())
+    
+    def close(self) -> None:
+        with self._lock:
+            self._dims.flush()
+            self._weights.flush()
+            self._text.close()
+        with self._read_lock:
+            self._reader.close()
+
+
+_indexes: Dict[str, StoryIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index(genre: str) -> StoryIndex:
+    """Process-wide index of one genre."""
+    index = _indexes.get(genre)
+    if index is None:
+        with _indexes_lock:
+            index = _indexes.get(genre)
+            if index is None:
+                index = _indexes[genre] = StoryIndex(str(Path(STORY_INDEX_PATH) / genre))
+    return index
+
+
+_STOP = object()
+
+
+class IndexWriter:
+    """Background thread adding queued stories to their genre's index in batches."""
+    
+    def __init__(self, batch_size: int = STORY_INDEX_BATCH_SIZE, flush_seconds: float = STORY_INDEX_FLUSH_SECONDS,
+                 queue_size: int = STORY_INDEX_QUEUE_SIZE):
+        self.batch_size = max(1, batch_size)
+        self.flush_seconds = flush_seconds
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+        atexit.register(self.close)
+    
+    def submit(self, genre: str, story: str, request: str, score: float) -> bool:
+        """
+        Queue one story for its genre's index (never blocks).
+        
+        Returns:
+            False when the queue was full and the story was dropped
+        """
+        if self._writer is None:
+            self._start_writer()
+        try:
+            self._queue.put_nowait((genre, story, request, score))
+            return True
+        except queue.Full:
+            metrics.increment("story_index.dropped")
+            return False
+    
+    def _start_writer(self) -> None:
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._run, name="story-index-writer", daemon=True)
+                self._writer.start()
+    
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            batch = [item]
+            # Collect more stories until the batch is full or the flush interval passes
+            deadline = time.monotonic() + self.flush_seconds
+            while item is not _STOP and len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                batch.append(item)
+            items = [item for item in batch if item is not _STOP]
+            if items:
+                self._write(items)
+            for _ in batch:
+                self._queue.task_done()
+            if len(items) < len(batch):
+                return
+    
+    def _write(self, items: list) -> None:
+        by_genre: Dict[str, list] = {}
+        for genre, story, request, score in items:
+            by_genre.setdefault(genre, []).append((story, request, score))
+        for genre, stories in by_genre.items():
+            try:
+                get_index(genre).add_many(stories)
+            except Exception:  # One bad batch must not stop the writer thread
+                metrics.increment("story_index.errors")
+    
+    def flush(self) -> None:
+        """Block until every queued story is indexed."""
+        if self._writer is not None:
+            self._queue.join()
+    
+    def close(self) -> None:
+        """Index what is queued and stop the writer thread (also runs at exit)."""
+        with self._writer_lock:
+            writer, self._writer = self._writer, None
+        if writer is not None and writer.is_alive():
+            self._queue.put(_STOP)
+            writer.join()
+
+
+_index_writer: Optional[IndexWriter] = None
+
+
+def get_index_writer() -> IndexWriter:
+    """Process-wide background index writer."""
+    global _index_writer
+    if _index_writer is None:
+        with _indexes_lock:
+            if _index_writer is None:
+                _index_writer = IndexWriter()
+    return _index_writer
+
+
+def index_story(tool_name: Optional[str], request: str, story: str, evaluation) -> bool:
+    """
+    Queue an approved story, or a rewrite the evaluator verified, for its
+    genre's index (no-op for rejected stories, unknown writers or
+    STORY_INDEX_ENABLED=false). Returns immediately; the story becomes
+    searchable once the background writer has added it.
+    
+    Returns:
+        True if the story was queued
+    """
+    fix = getattr(evaluation, "fix", None)
+    verified = fix is not None and fix.verified and fix.scores is not None
+    if not STORY_INDEX_ENABLED or tool_name is None or not (evaluation.approved or verified):
+        return False
+    from agents.writers.registry import get_registry
+    try:
+        genre = get_registry().genre_of(tool_name)
+    except KeyError:
+        return False
+    scores = fix.scores.model_dump() if verified else None
+    score = sum(scores.values()) / len(scores) if scores else evaluation.overall_score
+    return get_index_writer().submit(genre, story, request, score)
+
+
+def retrieve_examples(genre: str, request: str, top_k: int = STORY_INDEX_EXAMPLES,
+                      token_budget: Optional[int] = None) -> Optional[FewShotSelection]:
+    """
+    Few-shot examples for a writer prompt from the genre's story index.
+    
+    Args:
+        genre: Examples folder of the writer
+        request: The user request
+        top_k: Maximum number of retrieved examples
+        token_budget: Maximum tokens for them (an example over budget is truncated)
+    
+    Returns:
+        FewShotSelection of the retrieved stories, or None when nothing in the
+        index is similar enough (or the index is disabled or empty)
+    """
+    if not STORY_INDEX_ENABLED or top_k <= 0:
+        return None
+    index = get_index(genre)
+    if not index.count:
+        return None
+    blocks, names, used = [], [], 0
+    for row, score in index.search(request, top_k):
+        if score < STORY_INDEX_MIN_SCORE:
+            break
+        record = index.record(row)
+        name = f"approved story #{row} ({record['request']})"
+        block = format_example(name, record["story"])
+        tokens = estimate_tokens(block)
+        if token_budget is not None and used + tokens > token_budget:
+            block = format_example(f"{name} (truncated)", truncate_example(record["story"]))
+            tokens = estimate_tokens(block)
+            if used + tokens > token_budget:
+                continue
+        blocks.append(block)
+        names.append(name)
+        used += tokens
+    if not blocks:
+        return None
+    metrics.increment("story_index.retrieved", len(blocks))
+    return FewShotSelection(text="\n".join(blocks), names=names, prompt_tokens=used, tokens_saved=0)
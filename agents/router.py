@@ -0,0 +1,140 @@
+"""
+Story Router - Deterministic TF-IDF genre classifier for first-turn requests
+
+Picking a writer does not need a ReAct round trip. The router scores the
+request against a TF-IDF profile of each genre, built offline from the
+genre's `examples/` stories and its writer tool description. When
+the best genre wins by a clear margin the writer is called directly; low
+confidence requests still go through the orchestrator agent.
+"""
+import os
+import math
+from collections import Counter
+from typing import List, NamedTuple
+from agents.utils import load_examples, tokenize
+from agents import metrics
+
+
+# Minimum relative margin between the best and second-best genre to skip the agent
+ROUTER_CONFIDENCE_THRESHOLD = float(os.getenv("ROUTER_CONFIDENCE_THRESHOLD", "0.35"))
+# Minimum cosine similarity for the best genre (rejects requests with no known keywords)
+ROUTER_MIN_SCORE = 0.05
+# Tool descriptions are short but precise, so they outweigh the long example stories
+DESCRIPTION_WEIGHT = 2.0
+
+
+def _stem(word: str) -> str:
+    """Very light plural folding so 'princesses' matches 'princess'."""
+    if len(word) > 4 and word.endswith("es") and word[-3] in "sxz":
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def _terms(text: str) -> List[str]:
+    return [_stem(word) for word in tokenize(text)]
+
+
+def _normalize(vector: dict) -> dict:
+    norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+    return {term: weight / norm for term, weight in vector.items()} if norm else {}
+
+
+class RouteDecision(NamedTuple):
+    """Router verdict for one request."""
+    tool_name: str
+    confidence: float
+    scores: dict
+    confident: bool
+
+
+class StoryRouter:
+    """TF-IDF nearest-centroid classifier over the writer genres."""
+    
+    def __init__(self, genres: list, threshold: float = ROUTER_CONFIDENCE_THRESHOLD):
+        """
+        Args:
+            genres: Genre definitions (`GenreSpec`): writer tool `name`, examples folder
+                `genre` and tool `description`
+            threshold: Minimum relative margin to route without the agent
+        """
+        self.threshold = threshold
+        self.names = [spec.name for spec in genres]
+        
+        examples_tf = {spec.name: Counter(_terms(" ".join(c for _, c in load_examples(spec.genre))))
+                       for spec in genres}
+        description_tf = {spec.name: Counter(_terms(spec.description)) for spec in genres}
+        
+        # IDF over genres: terms shared by every genre carry no routing signal
+        n = len(genres)
+        doc_freq = Counter()
+        for name in self.names:
+            doc_freq.update(set(examples_tf[name]) | set(description_tf[name]))
+        self.idf = {term: math.log(n / df) for term, df in doc_freq.items()}
+        
+        self.centroids = {}
+        for name in self.names:
+            examples_vec = _normalize({t: (1 + math.log(f)) * self.idf[t] for t, f in examples_tf[name].items()})
+            description_vec = _normalize({t: (1 + math.log(f)) * self.idf[t] for t, f in description_tf[name].items()})
+            combined = dict(examples_vec)
+            for term, weight in description_vec.items():
+                combined[term] = combined.get(term, 0.0) + DESCRIPTION_WEIGHT * weight
+            self.centroids[name] = _normalize(combined)
+    
+    def scores(self, text: str) -> dict:
+        """Cosine similarity of the text to every genre centroid."""
+        query = _normalize({
+            term: (1 + math.log(freq)) * self.idf.get(term, 0.0)
+            for term, freq in Counter(_terms(text)).items()
+        })
+        return {
+            name: sum(weight * centroid.get(term, 0.0) for term, weight in query.items())
+            for name, centroid in self.centroids.items()
+        }
+    
+    def rank(self, text: str) -> List[str]:
+        """Writer tool names, best match first."""
+        scores = self.scores(text)
+        return sorted(scores, key=scores.get, reverse=True)
+    
+    def route(self, user_request: str) -> RouteDecision:
+        """Score the request against every genre and decide whether to bypass the agent."""
+        scores = self.scores(user_request)
+        ranked = sorted(scores, key=scores.get, reverse=True)
+        best = scores[ranked[0]]
+        runner_up = scores[ranked[1]] if len(ranked) > 1 else 0.0
+        confidence = (best - runner_up) / best if best > 0 else 0.0
+        confident = best >= ROUTER_MIN_SCORE and confidence >= self.threshold
+        return RouteDecision(ranked[0], confidence, scores, confident)
+
+
+def record_route(routed: bool, elapsed: float) -> None:
+    """Record one first-turn request and how long it took on its path."""
+    if routed:
+        metrics.increment("router.hits")
+        metrics.observe("router.direct_seconds", elapsed)
+    else:
+        metrics.increment("router.fallbacks")
+        metrics.observe("router.agent_seconds", elapsed)
+
+
+def router_stats() -> dict:
+    """
+    Router hit rate and estimated latency saved.
+    
+    Latency saved is the mean agent-path latency minus the mean direct-path
+    latency, times the number of hits (0 until both paths have been seen).
+    """
+    hits = metrics.get_counter("router.hits")
+    fallbacks = metrics.get_counter("router.fallbacks")
+    total = hits + fallbacks
+    direct = metrics.get_summary("router.direct_seconds")
+    agent = metrics.get_summary("router.agent_seconds")
+    saved_per_hit = agent["mean"] - direct["mean"] if direct["count"] and agent["count"] else 0.0
+    return {
+        "hits": int(hits),
+        "fallbacks": int(fallbacks),
+        "hit_rate": hits / total if total else 0.0,
+        "latency_saved_seconds": max(saved_per_hit, 0.0) * hits
+    }
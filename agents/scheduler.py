@@ -0,0 +1,400 @@
+"""
+Request Scheduler - Token-bucket admission control for every OpenAI call
+
+One story costs several sequential completions (orchestrator, writer,
+evaluator), and concurrent sessions fire them without coordination, so bursts
+hit 429s and retries pile up on top of each other. The scheduler sits in
+front of every chat client built by agents/llm.py:
+
+- Admission: requests-per-minute and tokens-per-minute token buckets. A call
+  reserves an estimate of its tokens up front; `UsageCallback` reconciles the
+  estimate with the usage the API reports.
+- Priority: waiting calls are admitted in priority order, then FIFO.
+  Interactive turns (the default) go ahead of batch work; mark batch work
+  with `with priority(Priority.BATCH):`.
+- Retries: `RetryTransport` / `AsyncRetryTransport` retry 429 and 5xx
+  responses with full-jitter exponential backoff (honoring Retry-After) and
+  re-admit every retry through the buckets. A 429 also pauses admissions
+  for everyone until the server's Retry-After has passed.
+- Metrics: queue depth on arrival, admission wait time (overall and per
+  priority), rate-limited responses and retries, via agents/metrics.py.
+"""
+import asyncio
+import contextlib
+import contextvars
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+from enum import IntEnum
+from typing import Optional
+import httpx
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.rate_limiters import BaseRateLimiter
+from agents import metrics
+from agents.instrumentation import record_retry, token_usage
+
+
+# Set SCHEDULER_ENABLED=false to call the API without admission control
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "true").lower() != "false"
+
+# Account limits for the model (see the OpenAI dashboard for your tier)
+RPM_LIMIT = int(os.getenv("OPENAI_RPM_LIMIT", "3500"))
+TPM_LIMIT = int(os.getenv("OPENAI_TPM_LIMIT", "160000"))
+
+# Burst allowance: each bucket holds at most this many seconds' worth of budget
+BURST_SECONDS = float(os.getenv("SCHEDULER_BURST_SECONDS", "10"))
+
+# Tokens reserved per call before the real usage is known (adapts to observed usage)
+ESTIMATED_TOKENS_PER_CALL = int(os.getenv("SCHEDULER_ESTIMATED_TOKENS", "1500"))
+ESTIMATE_SMOOTHING = 0.2
+
+# Retries of rate-limited / overloaded responses
+MAX_RETRIES = int(os.getenv("SCHEDULER_MAX_RETRIES", "6"))
+RETRY_BASE_DELAY = float(os.getenv("SCHEDULER_RETRY_BASE_DELAY", "1.0"))
+RETRY_MAX_DELAY = float(os.getenv("SCHEDULER_RETRY_MAX_DELAY", "30.0"))
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+class Priority(IntEnum):
+    """Admission priority; lower values are admitted first."""
+    INTERACTIVE = 0
+    BATCH = 1
+
+
+_priority: contextvars.ContextVar = contextvars.ContextVar("scheduler_priority", default=Priority.INTERACTIVE)
+
+
+@contextlib.contextmanager
+def priority(level: Priority):
+    """Run the block (and the tasks / threads it starts) at the given admission priority."""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def backoff(attempt: int, retry_after: float = 0.0) -> float:
+    """Full-jitter exponential backoff, never shorter than the server's Retry-After."""
+    return max(retry_after, random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt)))
+
+
+class TokenBucket:
+    """Per-minute budget refilled continuously; not thread-safe (the scheduler holds the lock)."""
+    
+    def __init__(self, per_minute: float, burst_seconds: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * (burst_seconds or BURST_SECONDS))
+        self.level = self.capacity
+        self.updated = time.monotonic()
+    
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` is available (0 if it is available now)."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+    
+    def take(self, amount: float) -> None:
+        """Spend `amount` (negative refunds); usage above the estimate leaves the bucket in debt."""
+        self._refill()
+        self.level = min(self.capacity, self.level - amount)
+    
+    def available(self) -> float:
+        self._refill()
+        return self.level
+
+
+class RequestScheduler(BaseRateLimiter):
+    """
+    Priority admission queue over RPM / TPM token buckets.
+    
+    Used as the `rate_limiter` of every chat client, so LangChain calls
+    `acquire` / `aacquire` before each completion (sync and async, invoke and
+    stream). Only the head of the queue may take from the buckets; everyone
+    else waits to be woken, so a burst of batch calls cannot starve an
+    interactive turn that arrives later.
+    """
+    
+    def __init__(self, rpm_limit: Optional[int] = None, tpm_limit: Optional[int] = None,
+                 estimated_tokens: Optional[int] = None, burst_seconds: Optional[float] = None):
+        self.requests = TokenBucket(rpm_limit or RPM_LIMIT, burst_seconds)
+        self.tokens = TokenBucket(tpm_limit or TPM_LIMIT, burst_seconds)
+        self.estimate = float(estimated_tokens or ESTIMATED_TOKENS_PER_CALL)
+        self._paused_until = 0.0
+        # Reservations of calls in flight; LangChain gives the rate limiter no
+        # handle on the call, so each completion settles the mean reservation
+        self._reserved_tokens = 0.0
+        self._reserved_calls = 0
+        self._queue: list = []  # heap of [priority, seq, wake]
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+    
+    # --- queue (call with the lock held) -------------------------------------------------
+    
+    def _enqueue(self, wake) -> list:
+        level = _priority.get()
+        entry = [level, next(self._seq), wake]
+        heapq.heappush(self._queue, entry)
+        metrics.observe("scheduler.queue_depth", len(self._queue))
+        return entry
+    
+    def _remove(self, entry: list) -> None:
+        if entry in self._queue:
+            self._queue.remove(entry)
+            heapq.heapify(self._queue)
+            self._wake_head()
+    
+    def _wake_head(self) -> None:
+        if self._queue:
+            self._queue[0][2]()
+    
+    def _try_admit(self, entry: list, tokens: float) -> Optional[float]:
+        """
+        Admit `entry` if it is at the head and the budgets allow.
+        
+        Returns:
+            0.0 when admitted, seconds to wait when at the head but over budget,
+            None when another call is ahead (wait to be woken)
+        """
+        if self._queue[0] is not entry:
+            return None
+        wait = max(
+            self._paused_until - time.monotonic(),
+            self.requests.wait_time(1),
+            self.tokens.wait_time(tokens)
+        )
+        if wait > 0:
+            return wait
+        self.requests.take(1)
+        self.tokens.take(tokens)
+        if tokens:  # Retries re-admit with 0 tokens and keep the original reservation
+            self._reserved_tokens += tokens
+            self._reserved_calls += 1
+        heapq.heappop(self._queue)
+        self._wake_head()
+        return 0.0
+    
+    def _record_admission(self, level: Priority, waited: float) -> None:
+        metrics.increment("scheduler.admitted")
+        metrics.observe("scheduler.wait_seconds", waited)
+        metrics.observe(f"scheduler.wait_seconds.{level.name.lower()}", waited)
+    
+    # --- BaseRateLimiter ------------------------------------------------------------------
+    
+    def acquire(self, *, blocking: bool = True, tokens: Optional[float] = None) -> bool:
+        """
+        Wait for admission of one request reserving `tokens` (default: the running estimate).
+        
+        Args:
+            blocking: Wait until admitted; if False, return False instead of waiting
+            tokens: Tokens to reserve (0 for retries of an already admitted call)
+        """
+        start = time.perf_counter()
+        with self._cond:
+            tokens = self.estimate if tokens is None else tokens
+            entry = self._enqueue(self._cond.notify_all)
+            while True:
+                wait = self._try_admit(entry, tokens)
+                if wait == 0.0:
+                    break
+                if not blocking:
+                    self._remove(entry)
+                    return False
+                self._cond.wait(timeout=wait)
+        self._record_admission(entry[0], time.perf_counter() - start)
+        return True
+    
+    async def aacquire(self, *, blocking: bool = True, tokens: Optional[float] = None) -> bool:
+        """Async variant of `acquire`; waiting never blocks the event loop."""
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        woken = asyncio.Event()
+        admitted = False
+        with self._lock:
+            tokens = self.estimate if tokens is None else tokens
+            entry = self._enqueue(lambda: loop.call_soon_threadsafe(woken.set))
+        try:
+            while True:
+                with self._lock:
+                    wait = self._try_admit(entry, tokens)
+                    if wait == 0.0:
+                        admitted = True
+                        break
+                    if not blocking:
+                        return False
+                    woken.clear()
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(woken.wait(), timeout=wait)
+        finally:
+            if not admitted:  # Non-blocking miss or cancelled while queued
+                with self._lock:
+                    self._remove(entry)
+        self._record_admission(entry[0], time.perf_counter() - start)
+        return True
+    
+    # --- feedback from responses ----------------------------------------------------------
+    
+    def _settle(self) -> float:
+        """Release one in-flight reservation (call with the lock held)."""
+        if not self._reserved_calls:
+            return 0.0
+        reserved = self._reserved_tokens / self._reserved_calls
+        self._reserved_tokens -= reserved
+        self._reserved_calls -= 1
+        return reserved
+    
+    def reconcile(self, actual_tokens: Optional[float]) -> None:
+        """
+        Settle a completed call's reservation against its reported usage and
+        update the estimate (None = usage unknown, the reservation stands).
+        """
+        with self._cond:
+            reserved = self._settle()
+            if actual_tokens is not None:
+                self.tokens.take(actual_tokens - reserved)
+                self.estimate += ESTIMATE_SMOOTHING * (actual_tokens - self.estimate)
+            self._wake_head()
+    
+    def refund(self) -> None:
+        """Return a failed call's reservation."""
+        with self._cond:
+            self.tokens.take(-self._settle())
+            self._wake_head()
+    
+    def on_retry(self, attempt: int, status_code: int, retry_after: float = 0.0) -> float:
+        """
+        Record a retryable response and return how long to back off.
+        
+        A 429 pauses admissions for every caller until Retry-After has passed:
+        the account limit is shared, so other calls would be rejected too.
+        """
+        metrics.increment("scheduler.retries")
+        record_retry()
+        if status_code == 429:
+            metrics.increment("scheduler.rate_limited")
+            with self._cond:
+                self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+        return backoff(attempt, retry_after)
+    
+    def queue_depth(self) -> int:
+        with self._lock:
+            return len(self._queue)
+    
+    def stats(self) -> dict:
+        """Current queue and budgets plus the wait-time / retry metrics."""
+        with self._lock:
+            by_priority = {level.name.lower(): sum(1 for e in self._queue if e[0] == level) for level in Priority}
+            state = {
+                "queue_depth": len(self._queue),
+                "queue_depth_by_priority": by_priority,
+                "requests_available": round(self.requests.available(), 1),
+                "tokens_available": round(self.tokens.available()),
+                "estimated_tokens_per_call": round(self.estimate),
+                "paused_seconds": round(max(0.0, self._paused_until - time.monotonic()), 3)
+            }
+        state.update({
+            "admitted": int(metrics.get_counter("scheduler.admitted")),
+            "retries": int(metrics.get_counter("scheduler.retries")),
+            "rate_limited": int(metrics.get_counter("scheduler.rate_limited")),
+            "wait_seconds": metrics.get_summary("scheduler.wait_seconds"),
+            "wait_seconds_by_priority": {
+                level.name.lower(): metrics.get_summary(f"scheduler.wait_seconds.{level.name.lower()}")
+                for level in Priority
+            },
+            "queue_depth_on_arrival": metrics.get_summary("scheduler.queue_depth")
+        })
+        return state
+
+
+def _usage_tokens(response) -> Optional[int]:
+    usage = token_usage(response)
+    return sum(usage) if usage else None
+
+
+class UsageCallback(BaseCallbackHandler):
+    """Feeds the token usage of each completed call back into the scheduler's TPM bucket."""
+    
+    run_inline = True
+    
+    def __init__(self, scheduler: RequestScheduler):
+        self.scheduler = scheduler
+    
+    def on_llm_end(self, response, **kwargs) -> None:
+        self.scheduler.reconcile(_usage_tokens(response))
+    
+    def on_llm_error(self, error, **kwargs) -> None:
+        self.scheduler.refund()
+
+
+def _retry_after(response: httpx.Response) -> float:
+    """Seconds the server asked us to wait (retry-after-ms / retry-after headers)."""
+    for header, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        try:
+            return float(response.headers[header]) * scale
+        except (KeyError, ValueError):
+            continue
+    return 0.0
+
+
+def _should_retry(response: httpx.Response) -> bool:
+    # An exhausted quota is also a 429, but waiting will not fix it
+    return response.status_code in RETRY_STATUS_CODES and b"insufficient_quota" not in response.content
+
+
+class RetryTransport(httpx.BaseTransport):
+    """httpx transport that retries rate-limited responses through the scheduler."""
+    
+    def __init__(self, scheduler: RequestScheduler, transport: httpx.BaseTransport, max_retries: int = MAX_RETRIES):
+        self.scheduler = scheduler
+        self.transport = transport
+        self.max_retries = max_retries
+    
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        for attempt in range(self.max_retries + 1):
+            response = self.transport.handle_request(request)
+            if response.status_code not in RETRY_STATUS_CODES or attempt == self.max_retries:
+                return response
+            response.read()
+            if not _should_retry(response):
+                return response
+            response.close()
+            time.sleep(self.scheduler.on_retry(attempt, response.status_code, _retry_after(response)))
+            self.scheduler.acquire(tokens=0)
+        return response
+    
+    def close(self) -> None:
+        self.transport.close()
+
+
+class AsyncRetryTransport(httpx.AsyncBaseTransport):
+    """Async variant of `RetryTransport`."""
+    
+    def __init__(self, scheduler: RequestScheduler, transport: httpx.AsyncBaseTransport, max_retries: int = MAX_RETRIES):
+        self.scheduler = scheduler
+        self.transport = transport
+        self.max_retries = max_retries
+    
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        for attempt in range(self.max_retries + 1):
+            response = await self.transport.handle_async_request(request)
+            if response.status_code not in RETRY_STATUS_CODES or attempt == self.max_retries:
+                return response
+            await response.aread()
+            if not _should_retry(response):
+                return response
+            await response.aclose()
+            await asyncio.sleep(self.scheduler.on_retry(attempt, response.status_code, _retry_after(response)))
+            await self.scheduler.aacquire(tokens=0)
+        return response
+    
+    async def aclose(self) -> None:
+        await self.transport.aclose()
@@ -0,0 +1,420 @@
+"""
+Session Store - Conversation state outside the worker process
+
+A modification turn needs the previous turn's ConversationHistory (original
+request, change log, latest story, writer and evaluation). Keeping it in a
+session store instead of a local variable lets any stateless worker serve
+any turn of any session.
+
+- Pluggable backends behind one interface: in-memory (single process),
+  SQLite (one host, many processes; WAL mode) and a directory of JSON
+  files (e.g. a shared volume)
+- Compact serialization: the history is stored as compact JSON, and story
+  bodies are stored once per content hash and referenced, so the latest
+  story and the evaluator's fixed copy of it (usually identical), or the
+  same cached story in many sessions, are kept once
+- TTL: a session not saved for SESSION_TTL seconds is gone; expired
+  sessions and unreferenced story bodies are purged periodically
+- Optimistic concurrency: every session carries a version. `save` only
+  succeeds if nobody saved the session since it was loaded, otherwise it
+  raises SessionConflict and the caller decides (reload and retry, or
+  report the conflict) instead of silently losing a turn
+"""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+from agents import metrics
+from agents.history import ConversationHistory
+
+
+# "memory", "sqlite" or "file"
+SESSION_STORE = os.getenv("SESSION_STORE", "sqlite").lower()
+SESSION_STORE_PATH = os.getenv("SESSION_STORE_PATH", str(Path(__file__).parent.parent / ".cache" / "sessions"))
+SESSION_TTL = float(os.getenv("SESSION_TTL", "86400"))
+# Expired sessions are purged on save, at most this often (seconds)
+SESSION_PURGE_INTERVAL = float(os.getenv("SESSION_PURGE_INTERVAL", "300"))
+
+
+class SessionConflict(RuntimeError):
+    """The session was saved by someone else since it was loaded."""
+
+
+class Session:
+    """A conversation's history and the version it was loaded at (0 = new session)."""
+    
+    def __init__(self, session_id: str, history: Optional[ConversationHistory] = None, version: int = 0,
+                 updated_at: Optional[float] = None):
+        self.id = session_id
+        self.history = history if history is not None else ConversationHistory()
+        self.version = version
+        self.updated_at = updated_at
+
+
+def _body_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+
+def encode_history(history: ConversationHistory) -> Tuple[str, Dict[str, str]]:
+    """
+    Serialize a history with its story bodies replaced by content hashes.
+    
+    Returns:
+        (compact JSON state, {hash: story text} of the bodies it references)
+    """
+    bodies = {}
+    
+    def ref(text: Optional[str]) -> Optional[str]:
+        if text is None:
+            return None
+        digest = _body_hash(text)
+        bodies[digest] = text
+        return digest
+    
+    state = history.to_dict()
+    state["latest_story"] = ref(state["latest_story"])
+    if state["evaluation"] is not None:
+        state["evaluation"]["fixed_story"] = ref(state["evaluation"]["fixed_story"])
+    return json.dumps(state, ensure_ascii=False, separators=(",", ":")), bodies
+
+
+def decode_history(data: str, bodies: Dict[str, str]) -> ConversationHistory:
+    """Inverse of `encode_history`, given the referenced bodies."""
+    state = json.loads(data)
+    state["latest_story"] = bodies[state["latest_story"]] if state["latest_story"] else None
+    evaluation = state["evaluation"]
+    if evaluation is not None and evaluation["fixed_story"]:
+        evaluation["fixed_story"] = bodies[evaluation["fixed_story"]]
+    return ConversationHistory.from_dict(state)
+
+
+def _may_write(current: Optional[Tuple[int, float, str]], expected_version: int, cutoff: float) -> bool:
+    """Optimistic concurrency check: nobody saved the session since `expected_version` was loaded."""
+    return current is None or current[0] == expected_version or (expected_version == 0 and current[1] < cutoff)
+
+
+def _refs(data: str) -> list:
+    state = json.loads(data)
+    evaluation = state["evaluation"] or {}
+    return [ref for ref in (state["latest_story"], evaluation.get("fixed_story")) if ref]
+
+
+class SessionStore(ABC):
+    """
+    Load / save / expire sessions. Backends implement the abstract `_read`,
+    `_write`, `_bodies`, `_delete` and `_purge` hooks over serialized state,
+    so a backend missing one fails when it is constructed.
+    """
+    
+    def __init__(self, ttl: float = SESSION_TTL, purge_interval: float = SESSION_PURGE_INTERVAL):
+        self.ttl = ttl
+        self.purge_interval = purge_interval
+        self._last_purge = time.time()
+    
+    def load(self, session_id: str) -> Optional[Session]:
+        """The saved session, or None if it does not exist or has expired."""
+        row = self._read(session_id)
+        if row is None or row[1] < time.time() - self.ttl:
+            metrics.increment("sessions.misses")
+            return None
+        version, updated_at, data = row
+        history = decode_history(data, self._bodies(_refs(data)))
+        metrics.increment("sessions.hits")
+        return Session(session_id, history, version, updated_at)
+    
+    def get(self, session_id: str) -> Session:
+        """The saved session, or a new empty one (version 0) to be saved after its first turn."""
+        return self.load(session_id) or Session(session_id)
+    
+    def save(self, session: Session) -> Session:
+        """
+        Save a session if it is unchanged since it was loaded, and bump its version.
+        
+        Raises:
+            SessionConflict: Another worker saved the session in the meantime
+        """
+        data, bodies = encode_history(session.history)
+        now = time.time()
+        if not self._write(session.id, session.version, now, data, bodies):
+            metrics.increment("sessions.conflicts")
+            raise SessionConflict(f"Session {session.id!r} changed since version {session.version} was loaded")
+        session.version += 1
+        session.updated_at = now
+        metrics.increment("sessions.saves")
+        metrics.observe("sessions.state_bytes", len(data))
+        if now - self._last_purge > self.purge_interval:
+            self._last_purge = now
+            self.purge_expired()
+        return session
+    
+    def delete(self, session_id: str) -> None:
+        self._delete(session_id)
+    
+    def purge_expired(self) -> int:
+        """Delete expired sessions and story bodies no session references; returns sessions deleted."""
+        purged = self._purge(time.time() - self.ttl)
+        metrics.increment("sessions.expired", purged)
+        return purged
+    
+    # --- backend hooks ---------------------------------------------------------------------
+    
+    @abstractmethod
+    def _read(self, session_id: str) -> Optional[Tuple[int, float, str]]:
+        """(version, updated_at, state) or None."""
+    
+    @abstractmethod
+    def _write(self, session_id: str, expected_version: int, updated_at: float, data: str,
+               bodies: Dict[str, str]) -> bool:
+        """Store bodies and state as version `expected_version + 1` if `_may_write` allows it, else return False."""
+    
+    @abstractmethod
+    def _bodies(self, hashes: Iterable[str]) -> Dict[str, str]:
+        """Story bodies by content hash."""
+    
+    @abstractmethod
+    def _delete(self, session_id: str) -> None:
+        """Delete the session's state (its story bodies go at the next purge)."""
+    
+    @abstractmethod
+    def _purge(self, cutoff: float) -> int:
+        """Delete sessions last saved before `cutoff` and unreferenced bodies; returns sessions deleted."""
+
+
+class MemorySessionStore(SessionStore):
+    """Sessions in this process only (development, a single worker)."""
+    
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._sessions: Dict[str, Tuple[int, float, str]] = {}
+        self._bodies_by_hash: Dict[str, str] = {}
+        self._lock = threading.Lock()
+    
+    def _read(self, session_id):
+        return self._sessions.get(session_id)
+    
+    def _write(self, session_id, expected_version, updated_at, data, bodies):
+        with self._lock:
+            if not _may_write(self._sessions.get(session_id), expected_version, time.time() - self.ttl):
+                return False
+            self._bodies_by_hash.update(bodies)
+            self._sessions[session_id] = (expected_version + 1, updated_at, data)
+            return True
+    
+    def _bodies(self, hashes):
+        return {digest: self._bodies_by_hash[digest] for digest in hashes}
+    
+    def _delete(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+    
+    def _purge(self, cutoff):
+        with self._lock:
+            expired = [session_id for session_id, (_, updated_at, _) in self._sessions.items() if updated_at < cutoff]
+            for session_id in expired:
+                del self._sessions[session_id]
+            referenced = {ref for _, _, data in self._sessions.values() for ref in _refs(data)}
+            self._bodies_by_hash = {digest: text for digest, text in self._bodies_by_hash.items() if digest in referenced}
+        return len(expired)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    updated_at REAL NOT NULL,
+    state TEXT NOT NULL,
+    refs TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at);
+CREATE TABLE IF NOT EXISTS bodies (
+    hash TEXT PRIMARY KEY,
+    text TEXT NOT NULL
+);
+"""
+
+
+class SQLiteSessionStore(SessionStore):
+    """Sessions in SQLite (WAL), shared by every worker process on the host."""
+    
+    def __init__(self, path: str = SESSION_STORE_PATH + ".sqlite3", **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+    
+    def _read(self, session_id):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT version, updated_at, state FROM sessions WHERE id = ?", (session_id,)
+            ).fetchone()
+    
+    def _write(self, session_id, expected_version, updated_at, data, bodies):
+        with self._lock:
+            # IMMEDIATE: the version check and the update cannot interleave with another process
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany("INSERT OR IGNORE INTO bodies (hash, text) VALUES (?, ?)", bodies.items())
+                # The upsert's WHERE is `_may_write`
+                written = self._conn.execute(
+                    "INSERT INTO sessions (id, version, updated_at, state, refs) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT (id) DO UPDATE SET version = excluded.version, updated_at = excluded.updated_at, "
+                    "state = excluded.state, refs = excluded.refs "
+                    "WHERE sessions.version = ? OR (? = 0 AND sessions.updated_at < ?)",
+                    (session_id, expected_version + 1, updated_at, data, json.dumps(list(bodies)),
+                     expected_version, expected_version, time.time() - self.ttl)
+                ).rowcount
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return written == 1
+    
+    def _bodies(self, hashes):
+        hashes = list(hashes)
+        if not hashes:
+            return {}
+        with self._lock:
+            return dict(self._conn.execute(
+                f"SELECT hash, text FROM bodies WHERE hash IN ({', '.join('?' * len(hashes))})", hashes
+            ).fetchall())
+    
+    def _delete(self, session_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+    
+    def _purge(self, cutoff):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                purged = self._conn.execute("DELETE FROM sessions WHERE updated_at < ?", (cutoff,)).rowcount
+                self._conn.execute(
+                    "DELETE FROM bodies WHERE hash NOT IN (SELECT value FROM sessions, json_each(sessions.refs))"
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return purged
+
+
+class FileSessionStore(SessionStore):
+    """
+    One JSON file per session plus one file per story body, e.g. on a volume
+    shared by workers on several hosts. Saves take a per-session lock file
+    around the version check and the atomic rename.
+    """
+    
+    LOCK_TIMEOUT = 10.0
+    # Bodies younger than this are never purged: a concurrent save may be about to reference them
+    BODY_GRACE_SECONDS = 60.0
+    
+    def __init__(self, root: str = SESSION_STORE_PATH, **kwargs):
+        super().__init__(**kwargs)
+        self.root = Path(root)
+        (self.root / "sessions").mkdir(parents=True, exist_ok=True)
+        (self.root / "bodies").mkdir(parents=True, exist_ok=True)
+    
+    def _path(self, session_id: str) -> Path:
+        # Hashed, so any session id is a safe file name
+        return self.root / "sessions" / f"{hashlib.sha256(session_id.encode('utf-8')).hexdigest()[:32]}.json"
+    
+    @staticmethod
+    def _replace(path: Path, text: str) -> None:
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_text(text, encoding="utf-8")
+        os.replace(tmp, path)
+    
+    def _read(self, session_id):
+        try:
+            record = json.loads(self._path(session_id).read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return None
+        return record["version"], record["updated_at"], record["state"]
+    
+    def _lock(self, path: Path) -> Path:
+        lock = path.with_suffix(".lock")
+        deadline = time.monotonic() + self.LOCK_TIMEOUT
+        while True:
+            try:
+                os.close(os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return lock
+            except FileExistsError:
+                if time.monotonic() > deadline:
+                    # Left behind by a crashed worker
+                    lock.unlink(missing_ok=True)
+                    deadline = time.monotonic() + self.LOCK_TIMEOUT
+                time.sleep(0.005)
+    
+    def _write(self, session_id, expected_version, updated_at, data, bodies):
+        for digest, text in bodies.items():
+            body = self.root / "bodies" / f"{digest}.txt"
+            if body.exists():
+                os.utime(body)  # Keep it out of a concurrent purge's reach
+            else:
+                self._replace(body, text)
+        path = self._path(session_id)
+        lock = self._lock(path)
+        try:
+            if not _may_write(self._read(session_id), expected_version, time.time() - self.ttl):
+                return False
+            self._replace(path, json.dumps({"id": session_id, "version": expected_version + 1,
+                                            "updated_at": updated_at, "state": data}))
+            return True
+        finally:
+            lock.unlink(missing_ok=True)
+    
+    def _bodies(self, hashes):
+        return {digest: (self.root / "bodies" / f"{digest}.txt").read_text(encoding="utf-8") for digest in hashes}
+    
+    def _delete(self, session_id):
+        self._path(session_id).unlink(missing_ok=True)
+    
+    def _purge(self, cutoff):
+        purged = 0
+        referenced = set()
+        for path in (self.root / "sessions").glob("*.json"):
+            try:
+                record = json.loads(path.read_text(encoding="utf-8"))
+            except (FileNotFoundError, json.JSONDecodeError):
+                continue
+            if record["updated_at"] < cutoff:
+                path.unlink(missing_ok=True)
+                purged += 1
+            else:
+                referenced.update(_refs(record["state"]))
+        grace = time.time() - self.BODY_GRACE_SECONDS
+        for body in (self.root / "bodies").glob("*.txt"):
+            try:
+                if body.stem not in referenced and body.stat().st_mtime < grace:
+                    body.unlink()
+            except FileNotFoundError:
+                continue
+        return purged
+
+
+_BACKENDS = {"memory": MemorySessionStore, "sqlite": SQLiteSessionStore, "file": FileSessionStore}
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_session_store() -> SessionStore:
+    """Process-wide session store of the SESSION_STORE backend."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                try:
+                    _store = _BACKENDS[SESSION_STORE]()
+                except KeyError:
+                    raise ValueError(f"Unknown SESSION_STORE {SESSION_STORE!r}, expected one of {', '.join(_BACKENDS)}") from None
+    return _store
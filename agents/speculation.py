@@ -0,0 +1,167 @@
+"""
+Speculation - Parallel candidate writers for ambiguous first-turn requests
+
+When the router is not confident ("a reindeer who wants to be a princess at
+Christmas"), the orchestrator's tool-selection completion has to finish
+before any writing starts. In speculative mode the router's top-2 or top-3
+genres start writing immediately, in parallel with that decision. Once the
+orchestrator picks a writer, its stream continues (its head start is
+replayed at once) and the other candidates are cancelled mid-stream. If the
+orchestrator picks a genre that was not speculated on, every candidate is
+cancelled and the chosen writer starts from scratch.
+
+This trades tokens for latency. Discarded work is charged to the request's
+"speculative" stage (agents/instrumentation.py) and to the speculation.*
+metrics: prompt tokens plus whatever the losers had generated when they
+were cancelled (estimated, since cancelled streams report no usage).
+"""
+import os
+import time
+import asyncio
+from typing import AsyncIterator, Awaitable, List, Optional
+from agents import metrics
+from agents.instrumentation import current_trace, detached_trace, token_cost
+from agents.router import ROUTER_MIN_SCORE, RouteDecision
+from agents.utils import estimate_tokens
+from agents.writers.base import astream_writer, writer_prompt_tokens
+
+
+# Set SPECULATION_ENABLED=true to speculate on ambiguous first-turn requests (async pipelines)
+SPECULATION_ENABLED = os.getenv("SPECULATION_ENABLED", "false").lower() == "true"
+# Writers started per ambiguous request (2 or 3)
+SPECULATION_CANDIDATES = max(2, min(3, int(os.getenv("SPECULATION_CANDIDATES", "2"))))
+
+
+def speculation_candidates(decision: Optional[RouteDecision], limit: int = SPECULATION_CANDIDATES) -> List[str]:
+    """
+    Genres worth speculating on for a routing decision: the top `limit` by
+    router score, or none when speculation is off, the request was routed
+    confidently, or no genre matched at all (nothing to bet on).
+    """
+    if not SPECULATION_ENABLED or decision is None or decision.confident:
+        return []
+    ranked = sorted(decision.scores, key=decision.scores.get, reverse=True)
+    if decision.scores[ranked[0]] < ROUTER_MIN_SCORE:
+        return []
+    return [name for name in ranked[:limit] if decision.scores[name] > 0]
+
+
+class _Candidate:
+    """One speculative writer: its task, its chunks so far and its own trace."""
+    
+    def __init__(self, tool_name: str):
+        self.tool_name = tool_name
+        self.parts: List[str] = []
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.trace = None
+        self.task: Optional[asyncio.Task] = None
+    
+    async def run(self, user_request: str) -> None:
+        try:
+            with detached_trace() as trace:
+                self.trace = trace
+                async for text in astream_writer(self.tool_name, user_request):
+                    self.parts.append(text)
+                    self.queue.put_nowait(text)
+        finally:
+            self.queue.put_nowait(None)  # End of stream (also after an error or cancellation)
+
+
+class Speculation:
+    """
+    Speculative writing for one request.
+    
+    Usage:
+        speculation = Speculation(user_request, candidates)
+        async for text in speculation.stream(choose_writer()):
+            ...
+        speculation.winner  # the writer whose story was streamed
+    """
+    
+    def __init__(self, user_request: str, candidates: List[str]):
+        self.user_request = user_request
+        self.candidates = {name: _Candidate(name) for name in candidates}
+        self.winner: Optional[str] = None
+    
+    async def stream(self, decision: Awaitable[str]) -> AsyncIterator[str]:
+        """
+        Start every candidate, wait for `decision` (the chosen writer tool name),
+        then stream the winner's story; losers are cancelled.
+        """
+        start = time.perf_counter()
+        for candidate in self.candidates.values():
+            candidate.task = asyncio.create_task(candidate.run(self.user_request))
+        metrics.increment("speculation.requests")
+        
+        try:
+            try:
+                self.winner = await decision
+            except Exception:  # Tool selection failed: bet on the router's favourite
+                metrics.increment("speculation.decision_errors")
+                self.winner = next(iter(self.candidates))
+            metrics.observe("speculation.decision_seconds", time.perf_counter() - start)
+            
+            chosen = self.candidates.get(self.winner)
+            await self._cancel_losers(keep=chosen)
+            if chosen is None:
+                metrics.increment("speculation.misses")
+                async for text in astream_writer(self.winner, self.user_request):
+                    yield text
+                return
+            
+            metrics.increment("speculation.hits")
+            metrics.increment("speculation.head_start_tokens", estimate_tokens("".join(chosen.parts)))
+            while (text := await chosen.queue.get()) is not None:
+                yield text
+            await chosen.task  # Re-raise the winner's error, if any
+            trace = current_trace()
+            if trace and chosen.trace:
+                trace.merge(chosen.trace)
+            chosen.trace = None  # Kept work, not waste
+        finally:
+            # Consumer went away (client disconnect, cancellation): stop everything
+            await self._cancel_losers(keep=None)
+    
+    async def _cancel_losers(self, keep: Optional[_Candidate]) -> None:
+        losers = [c for c in self.candidates.values() if c is not keep and c.task and not c.task.done()]
+        for candidate in losers:
+            candidate.task.cancel()
+        await asyncio.gather(*(c.task for c in losers), return_exceptions=True)
+        for candidate in self.candidates.values():
+            if candidate is not keep and candidate.trace is not None:
+                self._charge(candidate)
+                candidate.trace = None  # Charged once
+    
+    def _charge(self, candidate: _Candidate) -> None:
+        """Account a discarded candidate's tokens to the request and the speculation metrics."""
+        recorded = candidate.trace.record()
+        calls = sum(entry["calls"] for entry in recorded["stages"].values())
+        prompt_tokens, completion_tokens = 0, 0
+        if calls:  # No call means a cache hit, or cancelled before the request went out
+            prompt_tokens = recorded["prompt_tokens"] or writer_prompt_tokens(candidate.tool_name, self.user_request)
+            completion_tokens = recorded["completion_tokens"] or estimate_tokens("".join(candidate.parts))
+        metrics.increment("speculation.cancelled")
+        metrics.increment("speculation.wasted_prompt_tokens", prompt_tokens)
+        metrics.increment("speculation.wasted_completion_tokens", completion_tokens)
+        metrics.increment("speculation.wasted_cost_usd", token_cost(prompt_tokens, completion_tokens))
+        trace = current_trace()
+        if trace:
+            trace.add("speculative", calls=calls, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+
+
+def speculation_stats() -> dict:
+    """Speculative requests, hit rate and tokens / cost spent on discarded writers."""
+    requests = metrics.get_counter("speculation.requests")
+    hits = metrics.get_counter("speculation.hits")
+    return {
+        "requests": int(requests),
+        "hits": int(hits),
+        "misses": int(metrics.get_counter("speculation.misses")),
+        "hit_rate": hits / requests if requests else 0.0,
+        "cancelled_writers": int(metrics.get_counter("speculation.cancelled")),
+        "head_start_tokens": int(metrics.get_counter("speculation.head_start_tokens")),
+        "wasted_prompt_tokens": int(metrics.get_counter("speculation.wasted_prompt_tokens")),
+        "wasted_completion_tokens": int(metrics.get_counter("speculation.wasted_completion_tokens")),
+        "wasted_cost_usd": round(metrics.get_counter("speculation.wasted_cost_usd"), 6),
+        "decision_seconds": metrics.get_summary("speculation.decision_seconds")
+    }
@@ -0,0 +1,325 @@
+"""
+Story Store - Persistent record of every generated story and its evaluation
+
+Each pipeline result (request, writer tool, story, rubric scores, feedback,
+fixed story, per-stage timings and token usage) is kept in SQLite (WAL mode)
+so weak rubric dimensions can be found across thousands of stories instead
+of scrolling past printed scores.
+
+- Off the request path: `record_story` only puts a tuple on a bounded queue;
+  a background writer thread drains it and inserts rows in batches (one
+  transaction per batch, at most STORY_STORE_BATCH_SIZE rows or
+  STORY_STORE_FLUSH_SECONDS of waiting). A full queue drops the record
+  (counted in `store.dropped`) rather than slowing a request down
+- Two tables: `stories` holds the text, `evaluations` the narrow numeric
+  columns, so analytics scans never read story text
+- Indexes: `evaluations (tool_name, story_id)` for per-genre windows,
+  `stories (created_at)` for time ranges; "last N stories" is a primary key
+  range scan
+- Reads use their own connections (WAL readers never block the writer);
+  `export` streams rows through the cursor instead of loading the table
+"""
+import os
+import json
+import time
+import queue
+import atexit
+import sqlite3
+import threading
+import contextlib
+from pathlib import Path
+from typing import Iterator, Optional, TextIO
+from agents import metrics
+from agents.instrumentation import current_trace
+
+
+STORE_ENABLED = os.getenv("STORY_STORE_ENABLED", "true").lower() != "false"
+STORE_PATH = os.getenv("STORY_STORE_PATH", str(Path(__file__).parent.parent / ".cache" / "stories.sqlite3"))
+STORE_BATCH_SIZE = int(os.getenv("STORY_STORE_BATCH_SIZE", "200"))
+STORE_FLUSH_SECONDS = float(os.getenv("STORY_STORE_FLUSH_SECONDS", "1.0"))
+# Records waiting for the writer; beyond this they are dropped, never blocking a request
+STORE_QUEUE_SIZE = int(os.getenv("STORY_STORE_QUEUE_SIZE", "10000"))
+
+DIMENSIONS = ("age_appropriate", "grounded", "conciseness", "engagement", "structure")
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS stories (
+    id INTEGER PRIMARY KEY,
+    created_at REAL NOT NULL,
+    kind TEXT NOT NULL,
+    tool_name TEXT,
+    request TEXT NOT NULL,
+    story TEXT NOT NULL,
+    fixed_story TEXT,
+    feedback TEXT NOT NULL,
+    timings TEXT
+);
+CREATE INDEX IF NOT EXISTS stories_created_at ON stories (created_at);
+CREATE TABLE IF NOT EXISTS evaluations (
+    story_id INTEGER PRIMARY KEY REFERENCES stories (id),
+    tool_name TEXT,
+    word_count INTEGER NOT NULL,
+    {", ".join(f"{dimension} REAL NOT NULL" for dimension in DIMENSIONS)},
+    overall_score REAL NOT NULL,
+    approved INTEGER NOT NULL,
+    fixed INTEGER NOT NULL,
+    seconds REAL,
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER,
+    cost_usd REAL
+);
+CREATE INDEX IF NOT EXISTS evaluations_tool_name ON evaluations (tool_name, story_id);
+"""
+
+_INSERT_STORY = (
+    "INSERT INTO stories (created_at, kind, tool_name, request, story, fixed_story, feedback, timings) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+_INSERT_EVALUATION = (
+    f"INSERT INTO evaluations (story_id, tool_name, word_count, {', '.join(DIMENSIONS)}, overall_score, "
+    f"approved, fixed, seconds, prompt_tokens, completion_tokens, cost_usd) "
+    f"VALUES ({', '.join('?' * (len(DIMENSIONS) + 10))})"
+)
+
+
+def _weakest_query(last: int, tool_name: Optional[str]) -> tuple:
+    """(sql, params) of the per-genre dimension means over the latest `last` evaluations."""
+    means = ", ".join(f"AVG({dimension})" for dimension in DIMENSIONS)
+    genre = "tool_name = ?" if tool_name else "1"
+    offset = max(last, 1) - 1
+    # Lower bound of the window: the id of the `last`-th newest story (an index seek, not a sort)
+    window = f"(SELECT story_id FROM evaluations WHERE {genre} ORDER BY story_id DESC LIMIT 1 OFFSET ?)"
+    sql = (
+        f"SELECT tool_name, COUNT(*), {means}, AVG(overall_score), AVG(approved) FROM evaluations "
+        f"WHERE {genre} AND story_id >= COALESCE({window}, 0) GROUP BY tool_name"
+    )
+    return sql, ((tool_name, tool_name, offset) if tool_name else (offset,))
+
+
+_STOP = object()
+
+
+class StoryStore:
+    """SQLite story / evaluation store with a batching background writer."""
+    
+    def __init__(self, path: str = STORE_PATH, batch_size: int = STORE_BATCH_SIZE,
+                 flush_seconds: float = STORE_FLUSH_SECONDS, queue_size: int = STORE_QUEUE_SIZE):
+        self.path = path
+        self.batch_size = max(1, batch_size)
+        self.flush_seconds = flush_seconds
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with contextlib.closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+        atexit.register(self.close)
+    
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+    
+    # --- writes ----------------------------------------------------------------------------
+    
+    def record(self, row: tuple) -> bool:
+        """
+        Queue one record for the writer thread (never blocks).
+        
+        Args:
+            row: (created_at, kind, tool_name, request, story, fixed_story, feedback,
+                timings, word_count, scores, overall_score, approved) as built by `record_story`
+        
+        Returns:
+            False when the queue was full and the record was dropped
+        """
+        if self._writer is None:
+            self._start_writer()
+        try:
+            self._queue.put_nowait(row)
+            return True
+        except queue.Full:
+            metrics.increment("store.dropped")
+            return False
+    
+    def _start_writer(self) -> None:
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._run, name="story-store-writer", daemon=True)
+                self._writer.start()
+    
+    def _run(self) -> None:
+        conn = self._connect()
+        while True:
+            item = self._queue.get()
+            batch = [item]
+            # Collect more rows until the batch is full or the flush interval passes
+            deadline = time.monotonic() + self.flush_seconds
+            while item is not _STOP and len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                batch.append(item)
+            rows = [row for row in batch if row is not _STOP]
+            if rows:
+                self._write(conn, rows)
+            for _ in batch:
+                self._queue.task_done()
+            if len(rows) < len(batch):
+                conn.close()
+                return
+    
+    def _write(self, conn: sqlite3.Connection, rows: list) -> None:
+        start = time.perf_counter()
+        try:
+            with conn:  # One transaction per batch
+                conn.execute("BEGIN")
+                for (created_at, kind, tool_name, request, story, fixed_story, feedback, timings,
+                     word_count, scores, overall_score, approved) in rows:
+                    story_id = conn.execute(_INSERT_STORY, (
+                        created_at, kind, tool_name, request, story, fixed_story, feedback,
+                        json.dumps(timings) if timings else None
+                    )).lastrowid
+                    usage = timings or {}
+                    cost = sum(stage["cost_usd"] for stage in usage["stages"].values()) if timings else None
+                    conn.execute(_INSERT_EVALUATION, (
+                        story_id, tool_name, word_count, *(scores[d] for d in DIMENSIONS), overall_score,
+                        int(approved), int(fixed_story is not None), usage.get("total_seconds"),
+                        usage.get("prompt_tokens"), usage.get("completion_tokens"), cost
+                    ))
+        except sqlite3.Error:
+            metrics.increment("store.errors")
+            return
+        metrics.increment("store.batches")
+        metrics.increment("store.rows_written", len(rows))
+        metrics.observe("store.batch_seconds", time.perf_counter() - start)
+    
+    def flush(self) -> None:
+        """Block until every queued record is written."""
+        if self._writer is not None:
+            self._queue.join()
+    
+    def close(self) -> None:
+        """Write what is queued and stop the writer thread (also runs at exit)."""
+        with self._writer_lock:
+            writer, self._writer = self._writer, None
+        if writer is not None and writer.is_alive():
+            self._queue.put(_STOP)
+            writer.join()
+    
+    # --- reads -----------------------------------------------------------------------------
+    
+    @contextlib.contextmanager
+    def _reader(self):
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA query_only=ON")
+            yield conn
+        finally:
+            conn.close()
+    
+    def weakest_dimensions(self, last: int = 10000, tool_name: Optional[str] = None) -> dict:
+        """
+        Mean rubric scores per genre over the most recent stories, and the
+        lowest-scoring dimension of each genre.
+        
+        Args:
+            last: Window size: the latest `last` stories (of `tool_name`, if given)
+            tool_name: Restrict to one writer tool (uses the per-genre index)
+        
+        Returns:
+            dict: tool_name -> {"stories", "means" (dimension -> mean), "weakest",
+            "weakest_score", "overall", "approval_rate"}
+        """
+        sql, params = _weakest_query(last, tool_name)
+        with self._reader() as conn:
+            rows = conn.execute(sql, params).fetchall()
+        result = {}
+        for name, count, *values in rows:
+            dimension_means = dict(zip(DIMENSIONS, values[:len(DIMENSIONS)]))
+            weakest = min(dimension_means, key=dimension_means.get)
+            result[name] = {
+                "stories": count,
+                "means": {dimension: round(mean, 2) for dimension, mean in dimension_means.items()},
+                "weakest": weakest,
+                "weakest_score": round(dimension_means[weakest], 2),
+                "overall": round(values[-2], 2),
+                "approval_rate": round(values[-1], 3)
+            }
+        return result
+    
+    def iter_records(self, since_id: int = 0, batch: int = 500) -> Iterator[dict]:
+        """Stream stories with their evaluation in id order, `batch` rows in memory at a time."""
+        columns = ("id", "created_at", "kind", "tool_name", "request", "story", "fixed_story", "feedback", "timings",
+                   "word_count", *DIMENSIONS, "overall_score", "approved", "seconds", "prompt_tokens",
+                   "completion_tokens", "cost_usd")
+        sql = (
+            f"SELECT s.id, s.created_at, s.kind, s.tool_name, s.request, s.story, s.fixed_story, s.feedback, "
+            f"s.timings, e.word_count, {', '.join(f'e.{d}' for d in DIMENSIONS)}, e.overall_score, e.approved, "
+            f"e.seconds, e.prompt_tokens, e.completion_tokens, e.cost_usd "
+            f"FROM stories s JOIN evaluations e ON e.story_id = s.id WHERE s.id > ? ORDER BY s.id"
+        )
+        with self._reader() as conn:
+            cursor = conn.execute(sql, (since_id,))
+            while rows := cursor.fetchmany(batch):
+                for row in rows:
+                    record = dict(zip(columns, row))
+                    record["approved"] = bool(record["approved"])
+                    record["timings"] = json.loads(record["timings"]) if record["timings"] else None
+                    yield record
+    
+    def export(self, out: TextIO, since_id: int = 0) -> int:
+        """Write every record after `since_id` to `out` as JSON lines; returns the number written."""
+        count = 0
+        for record in self.iter_records(since_id):
+            out.write(json.dumps(record) + "\n")
+            count += 1
+        return count
+    
+    def stats(self) -> dict:
+        """Row counts per writer tool and the number of records still queued."""
+        with self._reader() as conn:
+            genres = dict(conn.execute("SELECT tool_name, COUNT(*) FROM evaluations GROUP BY tool_name").fetchall())
+        return {"path": self.path, "stories": sum(genres.values()), "by_tool": genres, "queued": self._queue.qsize()}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> Optional[StoryStore]:
+    """Process-wide store, or None when STORY_STORE_ENABLED=false."""
+    global _store
+    if not STORE_ENABLED:
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = StoryStore()
+    return _store
+
+
+def record_story(request: str, result: dict, kind: str = "story") -> None:
+    """
+    Queue a finished pipeline result for the store; returns immediately.
+    
+    Call it inside the traced pipeline: the per-stage timings are taken from
+    the current request trace.
+    
+    Args:
+        request: The user's request (or change request for a revision)
+        result: Pipeline result with "story", "word_count", "evaluation" and "tool_name"
+        kind: "story" for a generated story, "revision" for an in-place edit
+    """
+    store = get_store()
+    if store is None:
+        return
+    trace = current_trace()
+    evaluation = result["evaluation"]
+    store.record((
+        time.time(), kind, result.get("tool_name"), request, result["story"], evaluation.fixed_story,
+        evaluation.feedback, trace.record() if trace else result.get("timings"), result["word_count"],
+        evaluation.scores.model_dump(), evaluation.overall_score, evaluation.approved
+    ))
@@ -1,7 +1,50 @@
 """
 Utility functions for agents
 """
+import os
+import re
+import math
+from collections import Counter
+from functools import lru_cache
 from pathlib import Path
+from typing import List, NamedTuple, Optional
+
+
+EXAMPLES_DIR = Path(__file__).parent.parent / "examples"
+
+# Few-shot selection defaults (override via environment)
+FEW_SHOT_TOP_K = int(os.getenv("FEW_SHOT_TOP_K", "2"))
+FEW_SHOT_TOKEN_BUDGET = int(os.getenv("FEW_SHOT_TOKEN_BUDGET", "2500"))
+
+# Truncated example variants are cut to roughly this many tokens
+TRUNCATED_EXAMPLE_TOKENS = 600
+
+_WORD_RE = re.compile(r"[a-z']+")
+_STOPWORDS = frozenset(
+    "a an and are as at be but by for from had has have he her his i in is it its me my "
+    "of on or our she so that the their them then there they this to was we were what "
+    "when who will with you your story about".split()
+)
+
+
+def load_examples(genre: str) -> List[tuple]:
+    """
+    Load the raw example stories for a genre.
+    
+    Returns:
+        List of (name, content) tuples sorted by file name
+    """
+    examples_dir = EXAMPLES_DIR / genre
+    examples = []
+    for file in sorted(examples_dir.glob("*.md")):
+        with open(file, 'r', encoding='utf-8') as f:
+            examples.append((file.stem, f.read()))
+    return examples
+
+
+def format_example(name: str, content: str) -> str:
+    """Format one example the way it appears in writer prompts."""
+    return f"### Example from {name}:\n{content}\n"
 
 
 def load_examples_from_md(genre: str) -> str:
@@ -14,13 +57,124 @@ def load_examples_from_md(genre: str) -> str:
     Returns:
         Concatenated string of all example stories from the genre folder
     """
-    examples_dir = Path(__file__).parent.parent / "examples" / genre
-    examples = []
+    return "\n".join(format_example(name, content) for name, content in load_examples(genre))
+
+
+@lru_cache(maxsize=1)
+def _tokenizer():
+    """tiktoken encoder for the writer model, or None when unavailable offline."""
+    try:
+        import tiktoken
+        return tiktoken.encoding_for_model("gpt-3.5-turbo")
+    except Exception:  # Not installed, or BPE file cannot be downloaded
+        return None
+
+
+def estimate_tokens(text: str) -> int:
+    """Count prompt tokens with tiktoken, falling back to ~4 characters per token."""
+    encoder = _tokenizer()
+    if encoder is not None:
+        return len(encoder.encode(text))
+    return (len(text) + 3) // 4
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens without stopwords, for lexical matching."""
+    return [word for word in _WORD_RE.findall(text.lower()) if word not in _STOPWORDS]
+
+
+def truncate_example(content: str, max_tokens: int = TRUNCATED_EXAMPLE_TOKENS) -> str:
+    """Cut an example at a paragraph boundary so it fits roughly `max_tokens`."""
+    kept = []
+    used = 0
+    for paragraph in content.split("\n\n"):
+        cost = estimate_tokens(paragraph)
+        if kept and used + cost > max_tokens:
+            break
+        kept.append(paragraph)
+        used += cost
+    truncated = "\n\n".join(kept)
+    return truncated if truncated == content else f"{truncated}\n\n[... example truncated ...]"
+
+
+class FewShotSelection(NamedTuple):
+    """Examples chosen for one request and the prompt tokens that saved."""
+    text: str
+    names: List[str]
+    prompt_tokens: int
+    tokens_saved: int
+
+
+class ExampleSelector:
+    """
+    BM25 index over one genre's example stories.
     
-    # Load all markdown files from the genre directory
-    for file in sorted(examples_dir.glob("*.md")):
-        with open(file, 'r', encoding='utf-8') as f:
-            content = f.read()
-            examples.append(f"### Example from {file.stem}:\n{content}\n")
+    Picks the top-k examples most relevant to a request that fit a token
+    budget. When a relevant example is too long for the remaining budget, a
+    pre-truncated variant is used instead. Fully offline.
+    """
+    
+    def __init__(self, examples: List[tuple], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.names = [name for name, _ in examples]
+        self.full = [format_example(name, content) for name, content in examples]
+        self.truncated = [format_example(name, truncate_example(content)) for name, content in examples]
+        self.full_tokens = [estimate_tokens(block) for block in self.full]
+        self.truncated_tokens = [estimate_tokens(block) for block in self.truncated]
+        self.all_tokens = estimate_tokens("\n".join(self.full))
+        
+        self._term_freqs = [Counter(tokenize(content)) for _, content in examples]
+        self._lengths = [sum(tf.values()) for tf in self._term_freqs]
+        self._avg_length = (sum(self._lengths) / len(self._lengths)) if self._lengths else 0.0
+        doc_freq = Counter(term for tf in self._term_freqs for term in tf)
+        n = len(examples)
+        self._idf = {term: math.log((n - df + 0.5) / (df + 0.5) + 1.0) for term, df in doc_freq.items()}
     
-    return "\n".join(examples)
+    def scores(self, query: str) -> List[float]:
+        """BM25 relevance of every example for the query."""
+        terms = tokenize(query)
+        results = []
+        for tf, length in zip(self._term_freqs, self._lengths):
+            norm = self.k1 * (1 - self.b + self.b * length / self._avg_length) if self._avg_length else self.k1
+            score = 0.0
+            for term in terms:
+                freq = tf.get(term)
+                if freq:
+                    score += self._idf[term] * freq * (self.k1 + 1) / (freq + norm)
+            results.append(score)
+        return results
+    
+    def select(self, query: str, top_k: Optional[int] = FEW_SHOT_TOP_K,
+               token_budget: Optional[int] = FEW_SHOT_TOKEN_BUDGET) -> FewShotSelection:
+        """
+        Choose examples for a request.
+        
+        Args:
+            query: The user request
+            top_k: Maximum number of examples (None = no limit)
+            token_budget: Maximum tokens for the examples section (None = no limit)
+            
+        Returns:
+            FewShotSelection with the rendered examples and the tokens saved
+            versus including every example verbatim
+        """
+        scores = self.scores(query)
+        # Ties (e.g. no overlap at all) fall back to the shorter example
+        ranking = sorted(range(len(self.full)), key=lambda i: (-scores[i], self.full_tokens[i]))
+        
+        blocks, names, used = [], [], 0
+        for i in ranking:
+            if top_k is not None and len(blocks) >= top_k:
+                break
+            if token_budget is None or used + self.full_tokens[i] <= token_budget:
+                blocks.append(self.full[i])
+                used += self.full_tokens[i]
+                names.append(self.names[i])
+            elif used + self.truncated_tokens[i] <= token_budget:
+                blocks.append(self.truncated[i])
+                used += self.truncated_tokens[i]
+                names.append(f"{self.names[i]} (truncated)")
+        
+        saved = max(self.all_tokens - used, 0)
+        return FewShotSelection(text="\n".join(blocks), names=names, prompt_tokens=used, tokens_saved=saved)
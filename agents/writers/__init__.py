@@ -1,5 +1,6 @@
 """
 Specialized Genre Writers
 
-Each writer is an expert in a specific story genre with CoT and examples.
+Each writer is an expert in a specific story genre with CoT and examples,
+generated from `examples/<genre>/genre.yaml` by the genre registry.
 """
@@ -0,0 +1,271 @@
+"""
+Writer Base - Shared LLM plumbing for the specialized genre writers
+"""
+from collections import defaultdict
+from typing import AsyncIterator, Iterator, List, Literal
+from pydantic import BaseModel, Field
+from langchain_openai import ChatOpenAI
+from langchain_core.messages import SystemMessage, HumanMessage
+from langchain_core.tools import StructuredTool
+from agents.cache import cache_get, cache_put, make_key
+from agents.coalescing import acoalesce, coalesce, current_variant
+from agents.instrumentation import stage
+from agents.llm import DEFAULT_MODEL, get_chat_model, get_or_create
+from agents.prompts import GenrePrompt
+from agents.utils import estimate_tokens
+
+
+WRITER_TEMPERATURE = 0.7  # Higher for creativity
+WRITER_MAX_TOKENS = 1000  # 400-500 words
+REVISION_MAX_TOKENS = 600  # Edited paragraphs only, not the whole story
+
+
+def _writer_llm() -> ChatOpenAI:
+    """Get the chat model shared by every genre writer."""
+    return get_chat_model(temperature=WRITER_TEMPERATURE, max_tokens=WRITER_MAX_TOKENS)
+
+
+def _cache_key(messages: list) -> str:
+    """Content address of a writer call (model config + rendered prompt + request, and the fan-out variant)."""
+    parts = ("writer", DEFAULT_MODEL, WRITER_TEMPERATURE, WRITER_MAX_TOKENS, [m.content for m in messages])
+    variant = current_variant()
+    return make_key(*parts, variant) if variant else make_key(*parts)
+
+
+# Genre prompt per writer tool name, for the streaming and revision entry points
+_WRITER_PROMPTS: dict = {}
+
+
+def _writer_prompt(tool_name: str) -> GenrePrompt:
+    """Genre prompt of a writer tool, building the tool from the genre registry on first use."""
+    if tool_name not in _WRITER_PROMPTS:
+        # Imported here: the registry builds its tools with this module
+        from agents.writers.registry import get_registry
+        get_registry().tool(tool_name)
+    return _WRITER_PROMPTS[tool_name]
+
+
+def _messages(prompt: GenrePrompt, user_request: str) -> list:
+    return [
+        SystemMessage(content=prompt.render(user_request)),
+        HumanMessage(content=user_request)
+    ]
+
+
+def stream_writer(tool_name: str, user_request: str) -> Iterator[str]:
+    """
+    Stream a writer's story token by token, bypassing the tool wrapper.
+    
+    Args:
+        tool_name: Name of a writer tool built by `build_writer_tool`
+        user_request: The user's story request
+        
+    Yields:
+        Story text chunks as the model produces them
+    """
+    with stage("tool"):
+        messages = _messages(_writer_prompt(tool_name), user_request)
+        key = _cache_key(messages)
+        cached = cache_get("writer", key)
+        if cached is not None:
+            yield cached
+            return
+        
+        parts = []
+        with stage("writer"):
+            for chunk in _writer_llm().stream(messages):
+                if chunk.content:
+                    parts.append(chunk.content)
+                    yield chunk.content
+        cache_put("writer", key, "".join(parts))
+
+
+async def astream_writer(tool_name: str, user_request: str) -> AsyncIterator[str]:
+    """Async variant of `stream_writer`."""
+    with stage("tool"):
+        messages = _messages(_writer_prompt(tool_name), user_request)
+        key = _cache_key(messages)
+        cached = cache_get("writer", key)
+        if cached is not None:
+            yield cached
+            return
+        
+        parts = []
+        with stage("writer"):
+            async for chunk in _writer_llm().astream(messages):
+                if chunk.content:
+                    parts.append(chunk.content)
+                    yield chunk.content
+        cache_put("writer", key, "".join(parts))
+
+
+def writer_prompt_tokens(tool_name: str, user_request: str) -> int:
+    """Estimated prompt tokens of a writer call (for calls cancelled before usage is reported)."""
+    return sum(estimate_tokens(m.content) for m in _messages(_writer_prompt(tool_name), user_request))
+
+
+def build_writer_tool(name: str, description: str, prompt: GenrePrompt) -> StructuredTool:
+    """
+    Build a writer tool with both a sync and a native async implementation.
+    
+    The sync path is used by `agent.invoke`, the async path by `agent.ainvoke`
+    so concurrent sessions never block the event loop on the writer call.
+    The tool is `return_direct`: the agent stops as soon as the story is
+    written instead of spending another completion copying it out.
+    Responses go through the persistent response cache (agents/cache.py), and
+    concurrent identical calls share one completion (agents/coalescing.py).
+    A cache hit, like a call that shares another caller's completion, returns
+    without an LLM call, so nothing is streamed from the tool; the agent's
+    streaming route then delivers the story in one piece (`stream_story` in
+    agents/orchestrator.py).
+    
+    Args:
+        name: Tool name exposed to the orchestrator
+        description: Tool description the orchestrator reasons over
+        prompt: The genre system prompt (its genre is recorded in the tool metadata)
+        
+    Returns:
+        A StructuredTool taking a single `user_request` argument
+    """
+    def generate(messages: list, key: str) -> str:
+        with stage("writer"):
+            story_text = _writer_llm().invoke(messages).content
+        cache_put("writer", key, story_text)
+        return story_text
+    
+    async def agenerate(messages: list, key: str) -> str:
+        with stage("writer"):
+            response = await _writer_llm().ainvoke(messages)
+        cache_put("writer", key, response.content)
+        return response.content
+    
+    def write(user_request: str) -> str:
+        with stage("tool"):
+            messages = _messages(prompt, user_request)
+            key = _cache_key(messages)
+            cached = cache_get("writer", key)
+            if cached is not None:
+                return cached
+            story_text, _ = coalesce("writer", key, lambda: generate(messages, key))
+            return story_text
+    
+    async def awrite(user_request: str) -> str:
+        with stage("tool"):
+            messages = _messages(prompt, user_request)
+            key = _cache_key(messages)
+            cached = cache_get("writer", key)
+            if cached is not None:
+                return cached
+            story_text, _ = await acoalesce("writer", key, lambda: agenerate(messages, key))
+            return story_text
+    
+    _WRITER_PROMPTS[name] = prompt
+    return StructuredTool.from_function(
+        func=write,
+        coroutine=awrite,
+        name=name,
+        description=description,
+        return_direct=True,
+        metadata={"genre": prompt.genre}
+    )
+
+
+class ParagraphEdit(BaseModel):
+    """One paragraph-level change to an existing story"""
+    index: int = Field(description="Paragraph number from the numbered story (use -1 with insert_after to insert at the start)")
+    action: Literal["replace", "insert_after", "delete"] = Field(description="How to apply the edit")
+    text: str = Field(default="", description="New paragraph text (empty for delete)")
+
+
+class StoryRevision(BaseModel):
+    """Response schema for incremental story revision"""
+    edits: List[ParagraphEdit] = Field(description="Only the paragraphs that must change")
+
+
+REVISION_SYSTEM_PROMPT = """You are an expert {genre} story writer for children ages 5-10, revising an existing story.
+
+YOUR TASK:
+Apply the requested change by editing ONLY the paragraphs that must change.
+- Paragraphs are numbered [0], [1], ... - refer to them by number
+- Use "replace" to rewrite a paragraph, "insert_after" to add one, "delete" to remove one
+- Keep every untouched paragraph exactly as it is (do not return it)
+- Keep the story coherent with the new change and between 400-500 words in total
+- Keep it age-appropriate, warm and with a happy ending"""
+
+
+def split_paragraphs(story_text: str) -> List[str]:
+    return [p.strip() for p in story_text.split("\n\n") if p.strip()]
+
+
+def apply_edits(paragraphs: List[str], edits: List[ParagraphEdit]) -> tuple:
+    """
+    Apply paragraph edits (indices refer to the original paragraphs).
+    
+    Returns:
+        tuple: (new_story_text, changed_paragraph_texts)
+    """
+    replaced, inserted, deleted = {}, defaultdict(list), set()
+    for edit in edits:
+        if edit.action == "insert_after" and -1 <= edit.index < len(paragraphs) and edit.text.strip():
+            inserted[edit.index].append(edit.text.strip())
+        elif 0 <= edit.index < len(paragraphs):
+            if edit.action == "delete":
+                deleted.add(edit.index)
+            elif edit.text.strip():
+                replaced[edit.index] = edit.text.strip()
+    
+    new_paragraphs, changed = list(inserted[-1]), list(inserted[-1])
+    for i, paragraph in enumerate(paragraphs):
+        if i in replaced:
+            new_paragraphs.append(replaced[i])
+            changed.append(replaced[i])
+        elif i not in deleted:
+            new_paragraphs.append(paragraph)
+        new_paragraphs.extend(inserted[i])
+        changed.extend(inserted[i])
+    return "\n\n".join(new_paragraphs), changed
+
+
+def _reviser():
+    return get_or_create(
+        "writer_reviser",
+        lambda: get_chat_model(temperature=WRITER_TEMPERATURE, max_tokens=REVISION_MAX_TOKENS)
+        .with_structured_output(StoryRevision)
+    )
+
+
+def _revision_messages(tool_name: str, paragraphs: List[str], change_request: str) -> list:
+    numbered = "\n\n".join(f"[{i}] {paragraph}" for i, paragraph in enumerate(paragraphs))
+    return [
+        SystemMessage(content=REVISION_SYSTEM_PROMPT.format(genre=_writer_prompt(tool_name).genre)),
+        HumanMessage(content=f"Change request: {change_request}\n\nStory:\n\n{numbered}")
+    ]
+
+
+def revise_writer(tool_name: str, previous_story: str, change_request: str) -> tuple:
+    """
+    Revise a story in place instead of regenerating it.
+    
+    Only the edited paragraphs are generated, so a follow-up turn costs a
+    fraction of the output tokens of a full 400-500 word rewrite.
+    
+    Args:
+        tool_name: The writer tool that wrote the story
+        previous_story: The story to revise
+        change_request: What the user wants changed
+        
+    Returns:
+        tuple: (revised_story, changed_paragraphs)
+    """
+    with stage("writer"):
+        paragraphs = split_paragraphs(previous_story)
+        revision = _reviser().invoke(_revision_messages(tool_name, paragraphs, change_request))
+        return apply_edits(paragraphs, revision.edits)
+
+
+async def arevise_writer(tool_name: str, previous_story: str, change_request: str) -> tuple:
+    """Async variant of `revise_writer`."""
+    with stage("writer"):
+        paragraphs = split_paragraphs(previous_story)
+        revision = await _reviser().ainvoke(_revision_messages(tool_name, paragraphs, change_request))
+        return apply_edits(paragraphs, revision.edits)
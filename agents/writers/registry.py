@@ -0,0 +1,226 @@
+"""
+Genre Registry - Writer tools generated from declarative genre definitions
+
+Every genre lives in one folder: `examples/<genre>/` holds its example
+stories and a `genre.yaml` with what used to be a hand-written writer
+module (tool name and description, orchestrator hint, the five story steps
+and the genre-specific prompt lines). The writer prompt, writer tool and
+router entry are all generated from it, so adding a genre is a new folder
+and no code.
+
+Startup only lists the folders. A definition is parsed the first time its
+genre is needed, and its GenrePrompt and writer tool are built only when a
+request is actually routed to it, so dozens of genres cost nothing until
+they are used. Listing and parsing do not import LangChain, so the CLI can
+show the genres before the agents are loaded.
+"""
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional
+import yaml
+from pydantic import BaseModel
+from agents.prompts import GenrePrompt, preload_prompts
+from agents.utils import EXAMPLES_DIR
+
+if TYPE_CHECKING:
+    from langchain_core.tools import StructuredTool
+
+
+GENRE_FILE = "genre.yaml"
+# libyaml parses ~10x faster when PyYAML was built with it
+_YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+# Shared writer prompt; {{examples}} and {{user_request}} stay placeholders for GenrePrompt
+WRITER_TEMPLATE = """You are an expert {story} writer for children ages 5-10.
+
+CRITICAL REQUIREMENTS - YOU MUST FOLLOW THESE STRICTLY:
+
+1. WORD COUNT: 400-500 words MINIMUM. This is NON-NEGOTIABLE.
+   - Count as you write
+   - Too short = FAILURE
+   - Aim for 450 words to be safe
+   
+2. ORIGINALITY: Create something UNIQUE and AUTHENTIC
+   - Imagine you're telling this story for the first time
+   - Use fresh characters, new settings, original plot twists
+   - Every story should be different - even for the same request
+   - Think: "What makes THIS story special and memorable?"
+   
+3. CREATIVITY: Avoid clichés and predictable plots
+   - Surprise the reader with unexpected elements
+   - Create vivid, specific details (not generic descriptions)
+   - Make characters feel real and relatable
+   
+4. FOLLOW THE GUIDELINES: Use storytelling techniques and match example quality
+   - Show, don't tell
+   - Use vivid imagery and sensory details
+   - Create emotional connections
+
+THINK STEP-BY-STEP while writing the story (INTERNAL STRUCTURE ONLY - DO NOT include "Step 1:", "Step 2:" labels in your output):
+
+{steps}
+
+KEY STORYTELLING TECHNIQUES:
+- SHOW, DON'T TELL: Reveal character traits through actions and dialogue, not descriptions
+- THREE-ACT STRUCTURE: Clear setup → confrontation → resolution
+- VIVID IMAGERY: {imagery}
+- EMOTIONAL APPEAL: Evoke emotions like {emotions}
+- DIALOGUE: Use dialogue to reveal character and advance plot
+- PACING: Vary sentence length to control rhythm and maintain engagement
+- CHARACTER ARC: Give {protagonist} clear goal, obstacles, transformation
+
+KEY ELEMENTS:
+{key_elements}
+
+EXAMPLE STORIES (for reference - DO NOT COPY):
+{{examples}}
+
+CRITICAL: Your output must be a clean, flowing narrative WITHOUT "Step 1:", "Step 2:" labels. 
+The steps above are for structure only - write one continuous story.
+
+Write {a_story} based on: {{user_request}}"""
+
+TOOL_DESCRIPTION_TEMPLATE = """Generate {a_story} for children ages 5-10.
+
+Use this tool when the user wants {a_story} with:
+{use_when}
+
+Args:
+    user_request: The user's story request describing what they want
+
+Returns:
+    A complete {story} as a string"""
+
+
+def _bullets(lines: List[str], indent: str = "") -> str:
+    return "\n".join(f"{indent}- {line}" for line in lines)
+
+
+class GenreStep(BaseModel):
+    """One step of the writer's internal story structure"""
+    title: str
+    words: str
+    points: List[str]
+
+
+class GenreSpec(BaseModel):
+    """A writer genre as declared in `examples/<genre>/genre.yaml`"""
+    genre: str  # Examples folder name, filled in by the registry
+    name: str  # Writer tool name
+    label: str
+    emoji: str = "📖"
+    tagline: str = ""
+    story: str  # What the writer writes, e.g. "princess story"
+    use_for: str  # One-line orchestrator hint
+    use_when: List[str]
+    steps: List[GenreStep]
+    imagery: str
+    emotions: List[str]
+    protagonist: str = "protagonist"
+    key_elements: List[str]
+    
+    @property
+    def a_story(self) -> str:
+        article = "an" if self.story[:1].lower() in "aeiou" else "a"
+        return f"{article} {self.story}"
+    
+    @property
+    def description(self) -> str:
+        """Writer tool description the orchestrator and router reason over."""
+        return TOOL_DESCRIPTION_TEMPLATE.format(a_story=self.a_story, story=self.story,
+                                                use_when=_bullets(self.use_when))
+    
+    def template(self) -> str:
+        """The writer system prompt, with `{examples}` and `{user_request}` placeholders."""
+        steps = "\n\n".join(
+            f"Step {i}: {step.title} ({step.words} words)\n{_bullets(step.points, '   ')}"
+            for i, step in enumerate(self.steps, 1)
+        )
+        return WRITER_TEMPLATE.format(
+            story=self.story,
+            a_story=self.a_story,
+            steps=steps,
+            imagery=self.imagery,
+            emotions=", ".join(self.emotions),
+            protagonist=self.protagonist,
+            key_elements=_bullets(self.key_elements)
+        )
+
+
+class GenreRegistry:
+    """Lazily loaded writer genres, one per `examples/<genre>/genre.yaml`."""
+    
+    def __init__(self, root: Path = EXAMPLES_DIR):
+        # Only the folder listing happens up front
+        self._paths: Dict[str, Path] = {path.parent.name: path for path in sorted(root.glob(f"*/{GENRE_FILE}"))}
+        self._specs: Dict[str, GenreSpec] = {}
+        self._tools: Dict[str, "StructuredTool"] = {}
+        self._by_name: Optional[Dict[str, str]] = None
+        self._lock = threading.Lock()
+    
+    def genres(self) -> List[str]:
+        """Examples folder of every registered genre, in folder order."""
+        return list(self._paths)
+    
+    def spec(self, genre: str) -> GenreSpec:
+        """Parse a genre definition on first use."""
+        try:
+            return self._specs[genre]
+        except KeyError:
+            pass
+        with open(self._paths[genre], encoding="utf-8") as f:
+            spec = GenreSpec(genre=genre, **yaml.load(f, Loader=_YAML_LOADER))
+        return self._specs.setdefault(genre, spec)
+    
+    def specs(self, names: Optional[List[str]] = None) -> List[GenreSpec]:
+        """Definitions for the given tool names (default: every genre), in folder order."""
+        if names is None:
+            return [self.spec(genre) for genre in self._paths]
+        return [self.spec(self.genre_of(name)) for name in names]
+    
+    def names(self) -> List[str]:
+        """Writer tool name of every genre, in folder order."""
+        return [spec.name for spec in self.specs()]
+    
+    def genre_of(self, name: str) -> str:
+        """Examples folder of a writer tool name."""
+        if self._by_name is None:
+            self._by_name = {spec.name: spec.genre for spec in self.specs()}
+        try:
+            return self._by_name[name]
+        except KeyError:
+            raise KeyError(f"Unknown writer tool: {name}") from None
+    
+    def tool(self, name: str) -> "StructuredTool":
+        """The writer tool for a tool name, built (prompt included) on first use."""
+        try:
+            return self._tools[name]
+        except KeyError:
+            pass
+        # Imported here: the writers need LangChain, listing genres does not
+        from agents.writers.base import build_writer_tool
+        with self._lock:
+            if name not in self._tools:
+                spec = self.spec(self.genre_of(name))
+                self._tools[name] = build_writer_tool(
+                    name=spec.name,
+                    description=spec.description,
+                    prompt=GenrePrompt(spec.genre, spec.template())
+                )
+            return self._tools[name]
+    
+    def tools(self, names: Optional[List[str]] = None) -> List["StructuredTool"]:
+        """Writer tools for the given names (default: every genre)."""
+        return [self.tool(name) for name in (names if names is not None else self.names())]
+    
+    def preload(self) -> None:
+        """Build every writer and compile its prompt (server warm-up)."""
+        self.tools()
+        preload_prompts()
+
+
+@lru_cache(maxsize=1)
+def get_registry() -> GenreRegistry:
+    """Shared genre registry (folders are listed once per process)."""
+    return GenreRegistry()
@@ -0,0 +1,3 @@
+"""
+Offline benchmarks for the Storyteller pipeline (no network, fake LLM backend).
+"""
@@ -0,0 +1,149 @@
+"""
+Coalescing benchmark - concurrent identical requests against a slow fake LLM
+
+Fires a burst of the same popular request (with different casing and
+spacing) at once and checks what single-flight coalescing buys:
+
+- async burst:   N sessions on one event loop (`run_sessions`)
+- thread burst:  N threads calling `generate_story_pipeline`
+- fan-out:       the async burst with COALESCE_VARIANTS=3 (three distinct stories)
+- writer tool:   N threads invoking the same writer tool directly
+
+For each it reports LLM calls, wall time, distinct stories returned and
+the coalescing metrics, with coalescing off and on. With coalescing on, a
+burst must cost exactly one chain of calls per variant and every caller
+must get a story; the script exits non-zero otherwise. The same guarantees
+are tested in tests/test_coalescing.py; this script measures them at scale.
+
+    python -m benchmarks.coalescing --requests 50 --latency 0.2
+"""
+import time
+import asyncio
+import argparse
+import itertools
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from langchain_core.messages import ToolMessage
+
+from agents import coalescing, metrics
+from benchmarks.fake_llm import CALLS, FakeChatModel, _fake_story, offline_backend
+
+REQUEST = "A Christmas story about Santa's reindeer"
+SPELLINGS = [REQUEST, REQUEST.lower(), f"  {REQUEST}!", REQUEST.upper(), REQUEST.replace(" ", "  ")]
+
+_takes = itertools.count()
+
+
+class SamplingFakeLLM(FakeChatModel):
+    """Fake whose writer output differs on every call, like sampling at the writer's temperature."""
+
+    def _reply(self, messages):
+        message = super()._reply(messages)
+        if not message.tool_calls and not isinstance(messages[-1], ToolMessage):
+            message.content = _fake_story(f"{messages[-1].content} take {next(_takes)}")
+        return message
+
+
+@contextlib.contextmanager
+def _scenario(latency: float, enabled: bool, variants: int = 1):
+    def factory(**kwargs):
+        return SamplingFakeLLM(latency=latency, **kwargs)
+
+    CALLS.clear()
+    metrics.reset()
+    coalescing._flights.clear()
+    with offline_backend(factory), contextlib.redirect_stdout(None), \
+            mock.patch.object(coalescing, "COALESCE_ENABLED", enabled), \
+            mock.patch.object(coalescing, "COALESCE_VARIANTS", variants):
+        yield
+    coalescing._flights.clear()
+
+
+def _requests(count: int) -> list:
+    return [SPELLINGS[i % len(SPELLINGS)] for i in range(count)]
+
+
+def async_burst(count: int, latency: float, enabled: bool, variants: int = 1) -> tuple:
+    import main
+
+    with _scenario(latency, enabled, variants):
+        start = time.perf_counter()
+        results = asyncio.run(main.run_sessions(_requests(count), concurrency=count))
+        seconds = time.perf_counter() - start
+    return results, seconds
+
+
+def thread_burst(count: int, latency: float, enabled: bool) -> tuple:
+    import main
+
+    with _scenario(latency, enabled), ThreadPoolExecutor(max_workers=count) as pool:
+        start = time.perf_counter()
+        results = list(pool.map(lambda request: _call(main.generate_story_pipeline, request), _requests(count)))
+        seconds = time.perf_counter() - start
+    return results, seconds
+
+
+def writer_burst(count: int, latency: float, enabled: bool) -> tuple:
+    from agents.writers.registry import get_registry
+
+    with _scenario(latency, enabled), ThreadPoolExecutor(max_workers=count) as pool:
+        tool = get_registry().tool("generate_christmas_story")
+        start = time.perf_counter()
+        results = list(pool.map(lambda _: _call(tool.invoke, {"user_request": REQUEST}), range(count)))
+        seconds = time.perf_counter() - start
+    return results, seconds
+
+
+def _call(fn, *args):
+    try:
+        return fn(*args)
+    except Exception as exc:  # Reported per caller, like run_sessions does
+        return exc
+
+
+def _story(result) -> str:
+    return result if isinstance(result, str) else result["evaluation"].fixed_story or result["story"]
+
+
+def _report(name: str, results: list, seconds: float, chain: int) -> dict:
+    failures = [result for result in results if isinstance(result, Exception)]
+    stories = {_story(result) for result in results if not isinstance(result, Exception)}
+    stats = coalescing.coalescing_stats()
+    calls = sum(CALLS.values())
+    print(f"{name:<26} {len(results):>5} {calls:>6} {calls / chain:>7.1f} {seconds:>7.2f}s {len(stories):>8} "
+          f"{stats['pipeline']['coalesced']:>9} {stats['writer']['coalesced']:>7} "
+          f"{stats['pipeline']['calls_saved'] + stats['writer']['calls_saved']:>11} {len(failures):>7}")
+    return {"calls": calls, "stories": len(stories), "failures": len(failures)}
+
+
+def run(count: int, latency: float) -> bool:
+    print(f"{count} concurrent '{REQUEST}' requests, {latency * 1000:.0f} ms per fake LLM call")
+    print(f"{'scenario':<26} {'reqs':>5} {'calls':>6} {'chains':>7} {'wall':>8} {'stories':>8} "
+          f"{'pipeline':>9} {'writer':>7} {'calls saved':>11} {'errors':>7}")
+
+    # Calls of one uncoalesced request
+    async_burst(1, latency, enabled=False)
+    chain = sum(CALLS.values())
+    ok = True
+    for name, burst, variants in [("async burst", async_burst, 1), ("thread burst", thread_burst, 1),
+                                  ("fan-out (3 variants)", async_burst, 3), ("writer tool", writer_burst, 1)]:
+        expected_chain = 1 if burst is writer_burst else chain
+        for enabled in (False, True):
+            args = (count, latency, enabled, variants) if variants > 1 else (count, latency, enabled)
+            label = f"{name}, {'on' if enabled else 'off'}"
+            outcome = _report(label, *burst(*args), expected_chain)
+            if enabled:
+                ok = ok and outcome["failures"] == 0 and outcome["calls"] == expected_chain * variants \
+                    and outcome["stories"] == variants
+    print("ok" if ok else "FAIL: a coalesced burst must cost one chain of calls per variant")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=50, help="Identical requests per burst")
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds per fake LLM call")
+    args = parser.parse_args()
+    raise SystemExit(0 if run(args.requests, args.latency) else 1)
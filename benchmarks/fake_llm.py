@@ -0,0 +1,232 @@
+"""
+Fake LLM - Local stand-in for ChatOpenAI used by the offline benchmarks
+
+Mimics the kinds of calls the pipeline makes:
+- Orchestrator: tools bound, no tool result yet -> emits a writer tool call
+  (also when forced to pick one, as the speculative writer selector is)
+- Writer: plain completion -> returns a ~450 word story in 5 paragraphs
+- Echo: an agent turn after a tool result -> copies the tool output (counted
+  separately so tests catch a writer tool that is no longer `return_direct`)
+- Evaluator / reviser: structured output (tool_choice forced) -> fills the schema
+  (the reviser replaces one paragraph)
+
+Latency is `latency` per call plus `seconds_per_token` per output token, so
+benchmarks can compare calls that generate different amounts of text.
+"""
+import json
+import time
+import random
+import asyncio
+import itertools
+import contextlib
+from collections import Counter
+from unittest import mock
+from typing import Any, Literal, Optional, List, get_args, get_origin
+from pydantic import BaseModel
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from agents.utils import estimate_tokens
+
+
+STORY_WORDS = 450
+STORY_PARAGRAPHS = 5
+
+_GENRE_KEYWORDS = [
+    ("generate_christmas_story", ("christmas", "santa", "reindeer", "holiday", "snow", "elf")),
+    ("generate_princess_story", ("princess", "prince", "castle", "queen", "king", "royal")),
+]
+
+_call_ids = itertools.count()
+
+# LLM calls made so far, by kind: orchestrator, writer, echo (should stay 0), evaluator, reviser
+CALLS: Counter = Counter()
+# Output tokens generated so far, by the same kinds
+OUTPUT_TOKENS: Counter = Counter()
+
+
+_VOCABULARY = (
+    "once upon a time the little hero was brave and kind gentle fox wise owl sleepy bear "
+    "bright star quiet forest river meadow friend laughed shared helped found golden warm "
+    "snow castle garden lantern moon song dream smiled whispered carefully together home"
+).split()
+
+
+def _fake_story(seed: str, words: int = STORY_WORDS, paragraphs: int = STORY_PARAGRAPHS) -> str:
+    """Deterministic, non-repetitive filler text so local checks pass like a real story."""
+    rng = random.Random(seed)
+    vocabulary = (seed.split() or ["once"]) + _VOCABULARY
+    body = [rng.choice(vocabulary) for _ in range(words)]
+    body[9::10] = [f"{word}." for word in body[9::10]]
+    body[-1] = body[-1].rstrip(".") + "."
+    size = -(-len(body) // paragraphs)
+    return "\n\n".join(" ".join(body[i:i + size]) for i in range(0, len(body), size))
+
+
+def _fake_revision(seed: str) -> dict:
+    """Replace one paragraph, like a small change request would."""
+    paragraph = _fake_story(f"revised {seed}", STORY_WORDS // STORY_PARAGRAPHS, 1)
+    return {"edits": [{"index": 1, "action": "replace", "text": paragraph}]}
+
+
+def _fake_value(annotation: Any) -> Any:
+    """Build a plausible value for a pydantic field annotation."""
+    if get_origin(annotation) is not None and type(None) in get_args(annotation):
+        return None
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return {name: _fake_value(field.annotation) for name, field in annotation.model_fields.items()}
+    if get_origin(annotation) is Literal:
+        return get_args(annotation)[0]
+    if get_origin(annotation) in (list, List):
+        return [_fake_value(get_args(annotation)[0])]
+    if annotation is bool:
+        return True
+    if annotation is int:
+        return 0
+    if annotation is float:
+        return 8.0
+    return "Looks good."
+
+
+class FakeChatModel(BaseChatModel):
+    """Chat model with fixed latency that never touches the network."""
+    model: str = "fake-gpt-3.5-turbo"
+    temperature: float = 0.0
+    max_tokens: Optional[int] = None
+    api_key: Optional[str] = None
+    latency: float = 0.05
+    seconds_per_token: float = 0.0
+    bound_tools: List[Any] = []
+    tool_choice: Optional[Any] = None
+    
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+    
+    def bind_tools(self, tools, *, tool_choice=None, **kwargs):
+        return self.model_copy(update={"bound_tools": list(tools), "tool_choice": tool_choice})
+    
+    def _respond(self, messages: List[BaseMessage]) -> AIMessage:
+        """Reply plus token usage, reported like the real API does."""
+        message = self._reply(messages)
+        prompt_tokens = sum(estimate_tokens(str(m.content)) for m in messages)
+        completion_tokens = self._output_tokens(message)
+        message.usage_metadata = {
+            "input_tokens": prompt_tokens,
+            "output_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+        return message
+    
+    def _reply(self, messages: List[BaseMessage]) -> AIMessage:
+        last = messages[-1]
+        last_human = next((m.content for m in reversed(messages) if isinstance(m, HumanMessage)), "")
+        
+        # Structured output: the schema is bound as the only, forced tool
+        if len(self.bound_tools) == 1 and self.tool_choice:
+            schema = self.bound_tools[0]
+            name = convert_to_openai_tool(schema)["function"]["name"]
+            if name == "StoryRevision":
+                kind, args = "reviser", _fake_revision(str(last_human)[:40])
+            else:
+                kind, args = "evaluator", _fake_value(schema) if isinstance(schema, type) else {}
+            return self._count(kind, AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": f"call_{next(_call_ids)}"}]))
+        
+        # Orchestrator turn: pick a writer tool by keyword
+        if self.bound_tools and not isinstance(last, ToolMessage):
+            lowered = str(last_human).lower()
+            bound = [convert_to_openai_tool(tool)["function"]["name"] for tool in self.bound_tools]
+            name = next(
+                (tool for tool, words in _GENRE_KEYWORDS if tool in bound and any(w in lowered for w in words)),
+                "generate_animal_story" if "generate_animal_story" in bound else bound[0]
+            )
+            message = AIMessage(content="", tool_calls=[{"name": name, "args": {"user_request": str(last_human)}, "id": f"call_{next(_call_ids)}"}])
+            return self._count("orchestrator", message)
+        
+        # Echo turn after the tool returned
+        if isinstance(last, ToolMessage):
+            return self._count("echo", AIMessage(content=last.content))
+        
+        return self._count("writer", AIMessage(content=_fake_story(str(last_human))))
+    
+    @staticmethod
+    def _output_tokens(message: AIMessage) -> int:
+        return estimate_tokens(message.content) + sum(estimate_tokens(json.dumps(call["args"])) for call in message.tool_calls)
+    
+    def _count(self, kind: str, message: AIMessage) -> AIMessage:
+        CALLS[kind] += 1
+        OUTPUT_TOKENS[kind] += self._output_tokens(message)
+        return message
+    
+    def _delay(self, message: AIMessage) -> float:
+        return self.latency + self.seconds_per_token * self._output_tokens(message)
+    
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        message = self._respond(messages)
+        time.sleep(self._delay(message))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+    
+    def _chunks(self, messages):
+        """Split a plain completion into word chunks (tool calls come back whole)."""
+        message = self._respond(messages)
+        if message.tool_calls or not message.content:
+            tool_call_chunks = [
+                {"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": i, "type": "tool_call_chunk"}
+                for i, call in enumerate(message.tool_calls)
+            ]
+            return self._delay(message), [AIMessageChunk(content=message.content, tool_call_chunks=tool_call_chunks,
+                                                         usage_metadata=message.usage_metadata)]
+        words = message.content.split(" ")
+        chunks = [AIMessageChunk(content=word if i == 0 else f" {word}") for i, word in enumerate(words)]
+        # Usage arrives with the last chunk, as with stream_usage=True
+        chunks[-1].usage_metadata = message.usage_metadata
+        return self._delay(message), chunks
+    
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        delay, chunks = self._chunks(messages)
+        for chunk in chunks:
+            # Spread the call latency over the chunks, like a real token stream
+            time.sleep(delay / len(chunks))
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.content, chunk=ChatGenerationChunk(message=chunk))
+            yield ChatGenerationChunk(message=chunk)
+    
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        delay, chunks = self._chunks(messages)
+        for chunk in chunks:
+            await asyncio.sleep(delay / len(chunks))
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.content, chunk=ChatGenerationChunk(message=chunk))
+            yield ChatGenerationChunk(message=chunk)
+    
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        message = self._respond(messages)
+        await asyncio.sleep(self._delay(message))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+@contextlib.contextmanager
+def offline_backend(factory, scheduler: bool = False):
+    """
+    Build every chat client with `factory` (agents.llm backend hook) for the
+    duration of the block. The persistent response cache, the story store and
+    the story index are disabled so fake output never lands in them and every
+    call reaches the model. The request scheduler is off unless `scheduler=True`: its default
+    budgets are the real account limits, which would throttle a benchmark of a
+    local model.
+    """
+    import agents.llm
+    
+    with mock.patch("agents.cache.CACHE_ENABLED", False), mock.patch("agents.store.STORE_ENABLED", False), \
+            mock.patch("agents.retrieval.STORY_INDEX_ENABLED", False), \
+            mock.patch("agents.scheduler.SCHEDULER_ENABLED", scheduler), agents.llm.use_backend(factory):
+        yield
+
+
+def use_fake_llm(latency: float = 0.05, seconds_per_token: float = 0.0, scheduler: bool = False):
+    """Route every client the registry builds to FakeChatModel (see `offline_backend`)."""
+    def factory(**kwargs):
+        return FakeChatModel(latency=latency, seconds_per_token=seconds_per_token, **kwargs)
+    
+    return offline_backend(factory, scheduler)
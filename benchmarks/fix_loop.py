@@ -0,0 +1,125 @@
+"""
+Fix loop benchmark - convergence, cost and latency of fix-and-verify by loop limits
+
+Evaluates a fixed set of rejected drafts against a scripted fake judge and
+reports, for each iteration limit / token budget, how often the returned
+rewrite is verified to pass, the rewrites and re-judges it took, estimated
+tokens per story, and the loop latency. Three kinds of drafts:
+
+- long:  600 words, every judged dimension passes; only conciseness fails,
+         so rewrites are verified by the local checks alone (no re-judge)
+- dull:  judged below threshold on engagement; each score-only re-judge
+         passes with probability `--pass-rate`
+- short: 150 words, a clear-cut local failure (judge skipped); the rewrite
+         always needs a re-judge
+
+    python -m benchmarks.fix_loop --stories 60 --iterations 1,2,3 --budgets 3000,6000,12000
+"""
+import json
+import time
+import random
+import argparse
+import contextlib
+from unittest import mock
+
+from langchain_core.messages import AIMessage
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from agents import evaluator, metrics
+from agents.checks import run_local_checks
+from agents.utils import estimate_tokens
+from benchmarks.fake_llm import FakeChatModel, _call_ids, _fake_story, offline_backend
+
+
+class ScriptedJudge(FakeChatModel):
+    """FakeChatModel whose judge fails "dull" drafts and passes rewrites at random (seeded by their text)."""
+    pass_rate: float = 0.6
+
+    def _reply(self, messages):
+        if len(self.bound_tools) == 1 and self.tool_choice:
+            name = convert_to_openai_tool(self.bound_tools[0])["function"]["name"]
+            text = str(messages[-1].content)
+            if name == "JudgeResponse":
+                engagement = 5.0 if "dull" in text else 8.0
+                args = {"scores": {"age_appropriate": 9.0, "grounded": 8.0, "engagement": engagement, "structure": 8.0},
+                        "feedback": "The middle drags." if engagement < 7 else "Looks good."}
+            elif name == "JudgeScores":
+                rng = random.Random(text)
+                engagement = 8.0 if rng.random() < self.pass_rate else 5.0 + 1.9 * rng.random()
+                args = {"age_appropriate": 9.0, "grounded": 8.0, "engagement": engagement, "structure": 8.0}
+            else:
+                return super()._reply(messages)
+            message = AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": f"call_{next(_call_ids)}"}])
+            return self._count("evaluator", message)
+        return super()._reply(messages)
+
+
+def _drafts(count: int) -> list:
+    kinds = [("long", 600), ("dull", 450), ("short", 150)]
+    return [(kind, _fake_story(f"{kind} draft number {i} {'dull' if kind == 'dull' else ''}", words))
+            for i in range(count) for kind, words in [kinds[i % len(kinds)]]]
+
+
+def _run(drafts: list, iterations: int, budget: int, pass_rate: float, latency: float) -> dict:
+    def factory(**kwargs):
+        return ScriptedJudge(latency=latency, pass_rate=pass_rate, **kwargs)
+
+    metrics.reset()
+    by_kind = {}
+    with offline_backend(factory), contextlib.redirect_stdout(None), \
+            mock.patch.object(evaluator, "FIX_MAX_ITERATIONS", iterations), \
+            mock.patch.object(evaluator, "FIX_TOKEN_BUDGET", budget):
+        start = time.perf_counter()
+        for kind, draft in drafts:
+            evaluation = evaluator.evaluate_story(draft)
+            by_kind.setdefault(kind, []).append(evaluation.fix)
+        seconds = time.perf_counter() - start
+    stats = evaluator.fix_loop_stats()
+    stats["seconds_per_story"] = seconds / len(drafts)
+    stats["verified_by_kind"] = {kind: sum(fix.verified for fix in fixes) / len(fixes) for kind, fixes in by_kind.items()}
+    return stats
+
+
+def run(stories: int, iteration_limits: list, budgets: list, pass_rate: float, latency: float, as_json: bool) -> None:
+    drafts = _drafts(stories)
+    rows = []
+    for iterations in iteration_limits:
+        for budget in budgets:
+            rows.append({"iterations": iterations, "budget": budget,
+                         **_run(drafts, iterations, budget, pass_rate, latency)})
+    if as_json:
+        print(json.dumps(rows, indent=2))
+        return
+
+    print(f"{len(drafts)} rejected drafts (long / dull / short), re-judge pass rate {pass_rate:.0%}, "
+          f"{latency * 1000:.0f} ms per call")
+    print(f"{'max iter':>8} {'budget':>7} {'verified':>9} {'long':>5} {'dull':>5} {'short':>5} {'rewrites':>9} "
+          f"{'rejudges':>9} {'skipped':>8} {'tokens':>7} {'s/story':>8}  stops")
+    for row in rows:
+        verified = row["verified_by_kind"]
+        stops = ", ".join(f"{reason} {count}" for reason, count in row["stops"].items() if count)
+        print(f"{row['iterations']:>8} {row['budget']:>7} {row['converged_rate']:>8.0%} {verified.get('long', 0):>5.0%} "
+              f"{verified.get('dull', 0):>5.0%} {verified.get('short', 0):>5.0%} {row['mean_iterations']:>9.2f} "
+              f"{row['rejudges'] / max(row['loops'], 1):>9.2f} {row['rejudges_skipped']:>8} {row['mean_tokens']:>7.0f} "
+              f"{row['seconds_per_story']:>8.3f}  {stops}")
+
+    # What verifying one rewrite costs on each path (prompt tokens + completion limit)
+    rewrite = _fake_story("a rewritten story")
+    checks = run_local_checks(rewrite)
+    score_only = sum(estimate_tokens(m.content) for m in evaluator._verify_messages(rewrite, checks))
+    full = sum(estimate_tokens(m.content) for m in evaluator._scoring_messages(rewrite, checks))
+    print(f"\nverifying one rewrite: local checks 0 tokens, score-only re-judge {score_only} + {evaluator.VERIFY_MAX_TOKENS}, "
+          f"full judge call {full} + {evaluator.SCORING_MAX_TOKENS} (rewrite itself: prompt + up to {evaluator.FIX_MAX_TOKENS})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stories", type=int, default=60)
+    parser.add_argument("--iterations", default="1,2,3", help="Comma-separated EVALUATOR_FIX_MAX_ITERATIONS values")
+    parser.add_argument("--budgets", default="3000,6000,12000", help="Comma-separated EVALUATOR_FIX_TOKEN_BUDGET values")
+    parser.add_argument("--pass-rate", type=float, default=0.6, help="Chance a re-judged rewrite passes")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds per fake LLM call")
+    parser.add_argument("--json", action="store_true", help="Print the raw statistics as JSON")
+    args = parser.parse_args()
+    run(args.stories, [int(n) for n in args.iterations.split(",")], [int(n) for n in args.budgets.split(",")],
+        args.pass_rate, args.latency, args.json)
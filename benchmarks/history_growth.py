@@ -0,0 +1,50 @@
+"""
+History growth benchmark - orchestrator history tokens per turn over a long session
+
+Runs a multi-turn session against the fake LLM twice: once resending the raw
+agent transcript (the old behavior) and once with the compact
+ConversationHistory. Prints the history tokens sent on each turn.
+
+    python -m benchmarks.history_growth --turns 20
+"""
+import argparse
+import contextlib
+
+from agents.history import ConversationHistory, MODIFY_PREFIX
+from agents.utils import estimate_tokens
+from benchmarks.fake_llm import use_fake_llm
+
+CHANGES = ["make the princess braver", "add a dragon", "make it funnier", "add a talking cat", "set it in winter"]
+
+
+def transcript_tokens(messages: list) -> int:
+    return sum(estimate_tokens(str(m.content)) + estimate_tokens(str(getattr(m, "tool_calls", "") or "")) for m in messages)
+
+
+def run(turns: int) -> None:
+    import main
+    
+    raw_history = []
+    compact = ConversationHistory()
+    rows = []
+    with use_fake_llm(latency=0.0), contextlib.redirect_stdout(None):
+        request = "a princess who befriends a dragon"
+        for turn in range(turns):
+            raw_tokens = transcript_tokens(raw_history)
+            compact_tokens = compact.token_count()
+            raw_history = main.generate_story_pipeline(request, raw_history)["conversation_history"]
+            result = main.generate_story_pipeline(request, compact.messages())
+            compact.record_turn(request, result["evaluation"].fixed_story or result["story"])
+            rows.append((turn + 1, raw_tokens, compact_tokens))
+            request = f"{MODIFY_PREFIX}{CHANGES[turn % len(CHANGES)]}"
+    
+    print(f"{'turn':>4} {'raw transcript':>15} {'compact':>8}")
+    for turn, raw_tokens, compact_tokens in rows:
+        print(f"{turn:>4} {raw_tokens:>15} {compact_tokens:>8}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=20)
+    args = parser.parse_args()
+    run(args.turns)
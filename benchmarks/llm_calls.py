@@ -0,0 +1,55 @@
+"""
+LLM call count check - how many completions one request costs
+
+Runs the pipeline against the counting FakeChatModel and fails if the
+orchestrator ever spends an extra completion echoing the writer's story.
+
+    python -m benchmarks.llm_calls
+"""
+import contextlib
+from unittest import mock
+
+from benchmarks.fake_llm import CALLS, use_fake_llm
+
+EXPECTED = {
+    # (scenario): {kind: calls}
+    "first turn, agent": {"orchestrator": 1, "writer": 1, "evaluator": 1},
+    "first turn, router": {"writer": 1, "evaluator": 1},
+    "modification turn": {"orchestrator": 1, "writer": 1, "evaluator": 1},
+}
+
+
+def count(fn) -> dict:
+    CALLS.clear()
+    with contextlib.redirect_stdout(None):
+        fn()
+    return dict(CALLS)
+
+
+def run() -> None:
+    import main
+    import agents.orchestrator
+    
+    with use_fake_llm(latency=0.0):
+        with mock.patch.object(agents.orchestrator, "ROUTER_ENABLED", False):
+            agent_calls = count(lambda: main.generate_story_pipeline("a princess who befriends a dragon"))
+        history = []
+        
+        def first_turn():
+            history.extend(main.generate_story_pipeline("a princess who befriends a dragon")["conversation_history"])
+        router_calls = count(first_turn)
+        modification_calls = count(lambda: main.generate_story_pipeline("Modify the story: add a dragon", history))
+    
+    observed = {
+        "first turn, agent": agent_calls,
+        "first turn, router": router_calls,
+        "modification turn": modification_calls,
+    }
+    for scenario, calls in observed.items():
+        status = "ok" if calls == EXPECTED[scenario] else f"FAIL (expected {EXPECTED[scenario]})"
+        print(f"{scenario:<20} {sum(calls.values())} LLM calls {calls}  {status}")
+    assert observed == EXPECTED, "unexpected number of LLM calls per request"
+
+
+if __name__ == "__main__":
+    run()
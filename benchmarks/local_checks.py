@@ -0,0 +1,53 @@
+"""
+Local checks benchmark - judge calls avoided over a corpus of stored stories
+
+Runs the deterministic pre-checks over every .md/.txt story in the given
+files or directories (default: examples/) and reports check latency, how
+many stories fail clear-cut (judge skipped) and the fact block size the
+judge receives instead of recounting words itself.
+
+    python -m benchmarks.local_checks [path ...]
+"""
+import time
+import argparse
+from pathlib import Path
+
+from agents.checks import run_local_checks
+from agents.utils import EXAMPLES_DIR, estimate_tokens
+
+
+def load_corpus(paths: list) -> list:
+    stories = []
+    for path in map(Path, paths):
+        files = sorted(path.rglob("*.md")) + sorted(path.rglob("*.txt")) if path.is_dir() else [path]
+        stories.extend((file, file.read_text(encoding="utf-8")) for file in files)
+    return stories
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="*", default=[str(EXAMPLES_DIR)])
+    parser.add_argument("--repeat", type=int, default=100, help="Timing repetitions per story")
+    args = parser.parse_args()
+    
+    corpus = load_corpus(args.paths)
+    skipped = 0
+    total_seconds = 0.0
+    fact_tokens = 0
+    for path, text in corpus:
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            checks = run_local_checks(text)
+        elapsed = (time.perf_counter() - start) / args.repeat
+        total_seconds += elapsed
+        fact_tokens += estimate_tokens(checks.facts())
+        skipped += checks.clear_cut_failure
+        verdict = f"SKIP JUDGE ({'; '.join(checks.failures)})" if checks.clear_cut_failure else "judge (narrowed)"
+        print(f"{path.name:<24} {checks.word_count:5d} words  conciseness {checks.conciseness_score:4.1f}  "
+              f"{elapsed * 1e6:7.1f} us  {verdict}")
+    
+    n = len(corpus) or 1
+    print(f"\n{len(corpus)} stories, mean check time {total_seconds / n * 1e6:.1f} us")
+    print(f"judge calls skipped: {skipped}/{len(corpus)} ({skipped / n:.0%})")
+    print("judge scores requested per remaining call: 4 of 5 (conciseness computed locally)")
+    print(f"mean fact block added to the judge prompt: {fact_tokens / n:.0f} tokens")
@@ -0,0 +1,55 @@
+"""
+Prompt render benchmark - per-call system prompt cost and size, before and after
+
+Before: every writer call globbed and read all example files and embedded all
+of them verbatim. After: the static prompt is cached, only the top-k relevant
+examples within the token budget are spliced in, plus the request.
+
+    python -m benchmarks.prompt_render --iterations 2000
+"""
+import time
+import argparse
+
+from agents.utils import estimate_tokens, load_examples_from_md
+from agents.prompts import EXAMPLES_PLACEHOLDER, REQUEST_PLACEHOLDER, GenrePrompt
+from agents.writers.registry import get_registry
+
+REQUESTS = {
+    "princess": "a brave princess who befriends a shy dragon",
+    "christmas": "a poor couple who want to give each other a Christmas gift",
+    "animals": "a pig and a spider who become best friends on a farm",
+}
+
+
+def legacy_render(prompt, user_request: str) -> str:
+    """The pre-cache path: read and embed every example on each call."""
+    return (
+        prompt.template
+        .replace(EXAMPLES_PLACEHOLDER, load_examples_from_md(prompt.genre))
+        .replace(REQUEST_PLACEHOLDER, user_request)
+    )
+
+
+def measure(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+    
+    for spec in get_registry().specs():
+        prompt = GenrePrompt(spec.genre, spec.template())
+        request = REQUESTS.get(spec.genre, spec.story)
+        before = measure(lambda: legacy_render(prompt, request), args.iterations)
+        after = measure(lambda: prompt.render(request), args.iterations)
+        rendered, selection = prompt.select(request)
+        before_tokens = estimate_tokens(legacy_render(prompt, request))
+        after_tokens = estimate_tokens(rendered)
+        print(f"{prompt.genre:<10} render {before * 1e6:8.1f} -> {after * 1e6:6.1f} us   "
+              f"prompt {before_tokens:5d} -> {after_tokens:5d} tokens "
+              f"(saved {selection.tokens_saved}, examples: {', '.join(selection.names)})")
@@ -0,0 +1,160 @@
+"""
+Rate-limit benchmark - the request scheduler against a local server that returns 429s
+
+Starts a fake OpenAI chat completions endpoint on localhost that allows
+`--server-rpm` requests per minute (in one-second windows) and answers
+everything above that with a 429 and a Retry-After. A burst of concurrent
+completions is then sent through agents/llm.py twice: without the scheduler
+(the SDK's own retries) and with it (token-bucket admission at the server's
+budget). Half of the scheduled burst is marked as batch work and submitted
+first, to show interactive calls overtaking it in the queue.
+
+    python -m benchmarks.rate_limit --calls 120 --server-rpm 1200
+"""
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    """Chat completions endpoint with a requests-per-second limit."""
+
+    daemon_threads = True
+
+    def __init__(self, rpm: int, latency: float):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.per_second = max(1, rpm // 60)
+        self.latency = latency
+        self.served = Counter()
+        self._window = (0, 0)  # (second, requests in that second)
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+    def admit(self) -> float:
+        """0 if the request fits this second's budget, else seconds until the next window."""
+        with self._lock:
+            now = time.time()
+            second, count = self._window
+            if int(now) != second:
+                second, count = int(now), 0
+            if count >= self.per_second:
+                self.served[429] += 1
+                return second + 1 - now
+            self._window = (second, count + 1)
+            self.served[200] += 1
+            return 0.0
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, *args) -> None:
+        pass
+
+    def _reply(self, status: int, body: dict, headers: dict = None) -> None:
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self) -> None:
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        wait = self.server.admit()
+        if wait:
+            self._reply(429, {"error": {"message": "Rate limit reached for requests", "type": "requests",
+                                        "code": "rate_limit_exceeded"}},
+                        {"retry-after-ms": str(int(wait * 1000))})
+            return
+        time.sleep(self.server.latency)
+        prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in request["messages"])
+        self._reply(200, {
+            "id": f"chatcmpl-{time.time_ns()}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request["model"],
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": "Once upon a time there was a kind little fox."}}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": 12, "total_tokens": prompt_tokens + 12}
+        })
+
+
+async def _burst(calls: int, scheduled: bool) -> tuple:
+    from agents.llm import get_chat_model
+    from agents.scheduler import Priority, priority
+
+    model = get_chat_model(max_tokens=50)
+    latencies = {Priority.BATCH: [], Priority.INTERACTIVE: []}
+    failures = 0
+
+    async def one(level: Priority) -> None:
+        nonlocal failures
+        with priority(level):
+            start = time.perf_counter()
+            try:
+                await model.ainvoke("Tell me a one line bedtime story.")
+                latencies[level].append(time.perf_counter() - start)
+            except Exception:
+                failures += 1
+
+    start = time.perf_counter()
+    tasks = [asyncio.create_task(one(Priority.BATCH if scheduled else Priority.INTERACTIVE)) for _ in range(calls // 2)]
+    await asyncio.sleep(0.01)
+    tasks += [asyncio.create_task(one(Priority.INTERACTIVE)) for _ in range(calls - calls // 2)]
+    await asyncio.gather(*tasks)
+    return time.perf_counter() - start, failures, latencies
+
+
+def run(calls: int, server_rpm: int, latency: float) -> None:
+    import agents.llm
+    from agents import metrics
+    from agents.scheduler import Priority
+
+    server = FakeOpenAIServer(server_rpm, latency)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"fake server at {server.base_url}: {server.per_second} requests/s, {calls} concurrent calls\n")
+
+    env = {"OPENAI_BASE_URL": server.base_url, "OPENAI_API_BASE": server.base_url}
+    for label, scheduled in (("SDK retries only", False), ("request scheduler", True)):
+        agents.llm.clear_cache()
+        metrics.reset()
+        server.served.clear()
+        with mock.patch.dict(os.environ, env), \
+                mock.patch("agents.scheduler.SCHEDULER_ENABLED", scheduled), \
+                mock.patch("agents.scheduler.RPM_LIMIT", server_rpm), \
+                mock.patch("agents.scheduler.BURST_SECONDS", 1.0), \
+                mock.patch("agents.scheduler.RETRY_BASE_DELAY", 0.25):
+            elapsed, failures, latencies = asyncio.run(_burst(calls, scheduled))
+            stats = agents.llm.get_scheduler().stats() if scheduled else None
+
+        print(f"{label}: {elapsed:.2f}s, {server.served[200]} ok, {server.served[429]} x 429, {failures} failed")
+        if stats:
+            for level in Priority:
+                values = sorted(latencies[level])
+                if values:
+                    print(f"  {level.name.lower():<12} {len(values):>4} calls, median latency {values[len(values) // 2]:.2f}s")
+            print(f"  retries {stats['retries']}, mean admission wait {stats['wait_seconds']['mean']:.2f}s, "
+                  f"max queue depth {stats['queue_depth_on_arrival']['max']:.0f}, "
+                  f"estimated tokens/call {stats['estimated_tokens_per_call']}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=120)
+    parser.add_argument("--server-rpm", type=int, default=1200, help="Requests per minute the fake server allows")
+    parser.add_argument("--latency", type=float, default=0.05, help="Server response time in seconds")
+    args = parser.parse_args()
+    run(args.calls, args.server_rpm, args.latency)
@@ -0,0 +1,214 @@
+"""
+Replay LLM - Record real completions once, replay them offline
+
+Recording wraps ChatOpenAI and appends every completion (content or tool
+calls, token usage and wall time) to a JSONL file, keyed by the prompt the
+pipeline built: message types and contents, tool-call names/arguments (ids
+are random per run and left out), the bound tool names and the structured
+output schema. Replaying serves those completions from FakeChatModel, so
+streaming, structured output and usage reporting behave as in the synthetic
+benchmarks, but the text is what the real model wrote.
+
+    python -m benchmarks.suite --record recordings/stories.jsonl   # needs OPENAI_API_KEY
+    python -m benchmarks.suite --replay recordings/stories.jsonl   # offline
+
+A prompt that was never recorded falls back to the synthetic reply (counted
+in REPLAY["misses"]), or raises with `strict=True`.
+"""
+import json
+import time
+import hashlib
+import threading
+import contextlib
+from collections import Counter
+from typing import List, Optional
+from unittest import mock
+from langchain_core.messages import AIMessage, BaseMessage, ToolMessage
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from langchain_openai import ChatOpenAI
+from benchmarks.fake_llm import FakeChatModel, offline_backend
+
+# Replay lookups so far: hits, misses
+REPLAY: Counter = Counter()
+
+_write_lock = threading.Lock()
+
+
+def _tool_name(tool) -> str:
+    return convert_to_openai_tool(tool)["function"]["name"]
+
+
+def _schema_name(response_format) -> Optional[str]:
+    """Name of a structured output schema as ChatOpenAI receives it (class or json_schema dict)."""
+    if response_format is None:
+        return None
+    if isinstance(response_format, dict):
+        return response_format.get("json_schema", {}).get("name") or response_format.get("type")
+    return getattr(response_format, "__name__", str(response_format))
+
+
+def recording_key(messages: List[BaseMessage], tools: List[str], schema: Optional[str]) -> str:
+    """Stable hash of a prompt: what the pipeline sent, not per-run ids."""
+    normalized = [
+        [message.type, message.content,
+         [[call["name"], call["args"]] for call in getattr(message, "tool_calls", None) or []]]
+        for message in messages
+    ]
+    payload = json.dumps([normalized, sorted(tools), schema], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _call_kind(messages: List[BaseMessage], tools: List[str], schema: Optional[str]) -> str:
+    """Same call kinds as FakeChatModel counts: orchestrator, writer, echo, evaluator, reviser."""
+    if schema:
+        return "reviser" if schema == "StoryRevision" else "evaluator"
+    if messages and isinstance(messages[-1], ToolMessage):
+        return "echo"
+    return "orchestrator" if tools else "writer"
+
+
+def load_recordings(path: str) -> dict:
+    """key -> recorded completion (the last recording of a prompt wins)."""
+    recordings = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                recordings[entry["key"]] = entry
+    return recordings
+
+
+class RecordingChatOpenAI(ChatOpenAI):
+    """ChatOpenAI that appends every completion it returns to `recording_path`."""
+    recording_path: str
+
+    def _record(self, messages, kwargs: dict, message: AIMessage, seconds: float) -> None:
+        tools = [_tool_name(tool) for tool in kwargs.get("tools") or []]
+        schema = _schema_name(kwargs.get("response_format"))
+        entry = {
+            "key": recording_key(messages, tools, schema),
+            "kind": _call_kind(messages, tools, schema),
+            "schema": schema,
+            "content": message.content,
+            "tool_calls": [{"name": call["name"], "args": call["args"]} for call in message.tool_calls],
+            "usage": message.usage_metadata,
+            "seconds": round(seconds, 4)
+        }
+        with _write_lock, open(self.recording_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        start = time.perf_counter()
+        result = super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        self._record(messages, kwargs, result.generations[0].message, time.perf_counter() - start)
+        return result
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        start = time.perf_counter()
+        result = await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        self._record(messages, kwargs, result.generations[0].message, time.perf_counter() - start)
+        return result
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        start, message = time.perf_counter(), None
+        for chunk in super()._stream(messages, stop=stop, run_manager=run_manager, **kwargs):
+            message = chunk.message if message is None else message + chunk.message
+            yield chunk
+        if message is not None:
+            self._record(messages, kwargs, message, time.perf_counter() - start)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        start, message = time.perf_counter(), None
+        async for chunk in super()._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+            message = chunk.message if message is None else message + chunk.message
+            yield chunk
+        if message is not None:
+            self._record(messages, kwargs, message, time.perf_counter() - start)
+
+
+class ReplayChatModel(FakeChatModel):
+    """FakeChatModel that answers recorded prompts with the recorded completion."""
+    recordings: dict = {}
+    strict: bool = False
+    realtime: bool = False
+
+    @property
+    def _llm_type(self) -> str:
+        return "replay-chat"
+
+    def _reply(self, messages: List[BaseMessage]) -> AIMessage:
+        tools, schema = [], None
+        if self.bound_tools:
+            names = [_tool_name(tool) for tool in self.bound_tools]
+            # A forced single tool is a structured output schema (see FakeChatModel)
+            if len(names) == 1 and self.tool_choice:
+                schema = names[0]
+            else:
+                tools = names
+        entry = self.recordings.get(recording_key(messages, tools, schema))
+        if entry is None:
+            REPLAY["misses"] += 1
+            if self.strict:
+                raise KeyError(f"No recorded completion for this {_call_kind(messages, tools, schema)} prompt")
+            return super()._reply(messages)
+
+        REPLAY["hits"] += 1
+        tool_calls = entry["tool_calls"]
+        if schema and not tool_calls:
+            # Recorded with json_schema structured output; FakeChatModel binds the schema as a tool
+            tool_calls = [{"name": schema, "args": json.loads(entry["content"])}]
+        message = AIMessage(
+            content="" if schema else entry["content"],
+            tool_calls=[dict(call, id=f"call_replay_{i}_{entry['key'][:8]}") for i, call in enumerate(tool_calls)],
+            response_metadata={"replay_seconds": entry["seconds"], "replay_usage": entry.get("usage")}
+        )
+        return self._count(entry["kind"], message)
+
+    def _respond(self, messages: List[BaseMessage]) -> AIMessage:
+        message = super()._respond(messages)
+        # Report what the API actually counted, when it was recorded
+        if message.response_metadata.get("replay_usage"):
+            message.usage_metadata = message.response_metadata["replay_usage"]
+        return message
+
+    def _delay(self, message: AIMessage) -> float:
+        if self.realtime and "replay_seconds" in message.response_metadata:
+            return message.response_metadata["replay_seconds"]
+        return super()._delay(message)
+
+
+@contextlib.contextmanager
+def use_recording_llm(path: str):
+    """
+    Build every client as a RecordingChatOpenAI appending to `path`. Real API
+    calls are made (the scheduler stays as configured); the response cache is
+    disabled so every prompt is actually sent and recorded.
+    """
+    import agents.llm
+
+    def factory(**kwargs):
+        return RecordingChatOpenAI(recording_path=path, **kwargs)
+
+    with mock.patch("agents.cache.CACHE_ENABLED", False), agents.llm.use_backend(factory):
+        yield
+
+
+def use_replay_llm(path: str, latency: float = 0.0, seconds_per_token: float = 0.0, realtime: bool = False,
+                   strict: bool = False):
+    """
+    Replay the completions recorded in `path` offline (see `offline_backend`).
+
+    Args:
+        path: JSONL file written by `use_recording_llm`
+        latency: Seconds per call (ignored for recorded calls when realtime=True)
+        seconds_per_token: Seconds per output token
+        realtime: Sleep for each call's recorded wall time instead
+        strict: Raise on an unrecorded prompt instead of falling back to a synthetic reply
+    """
+    recordings = load_recordings(path)
+
+    def factory(**kwargs):
+        return ReplayChatModel(recordings=recordings, strict=strict, realtime=realtime, latency=latency,
+                               seconds_per_token=seconds_per_token, **kwargs)
+
+    return offline_backend(factory)
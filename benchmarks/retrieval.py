@@ -0,0 +1,89 @@
+"""
+Retrieval benchmark - story index build time, footprint and query latency by size
+
+Grows one story index to each size in `--sizes` with synthetic stories
+(words drawn from the example corpus, one topic per story) and reports at
+each size: build throughput of the increment, bytes on disk (memory-mapped)
+and in process memory, query latency percentiles, and recall@k of the
+postings search against an exhaustive scan of the same index.
+
+    python -m benchmarks.retrieval --sizes 10000,100000,1000000
+"""
+import time
+import random
+import argparse
+import tempfile
+
+from agents.retrieval import StoryIndex
+from agents.utils import EXAMPLES_DIR, load_examples, tokenize
+
+TEMPLATES = ["a {} who befriends a {}", "a {} lost in the {}", "the {} and the {} at bedtime", "a brave {} saves the {}"]
+
+
+def _vocabulary() -> list:
+    words = set()
+    for genre in (path.name for path in EXAMPLES_DIR.iterdir() if path.is_dir()):
+        for _, content in load_examples(genre):
+            words.update(tokenize(content))
+    return sorted(words)
+
+
+def _corpus(rng: random.Random, vocabulary: list, story_words: int):
+    """Endless (story, request) pairs: each story mixes general words with its topic's words."""
+    while True:
+        topic = rng.sample(vocabulary, 2)
+        request = rng.choice(TEMPLATES).format(*topic)
+        words = rng.choices(vocabulary, k=story_words) + topic * (story_words // 25)
+        rng.shuffle(words)
+        yield " ".join(words), request
+
+
+def _percentile(values: list, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run(sizes: list, story_words: int, queries: int, k: int, batch: int, seed: int) -> None:
+    rng = random.Random(seed)
+    vocabulary = _vocabulary()
+    corpus = _corpus(rng, vocabulary, story_words)
+    print(f"{story_words}-word synthetic stories over a {len(vocabulary)}-word vocabulary, top-{k}, {queries} queries")
+    print(f"{'stories':>8} {'build/s':>8} {'disk':>9} {'memory':>9} {'query p50':>10} {'query p99':>10} "
+          f"{'exact p50':>10} {'recall@k':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        index = StoryIndex(tmp)
+        for size in sizes:
+            added, build = 0, 0.0
+            while index.count < size:
+                items = [(*next(corpus), 8.0) for _ in range(min(batch, size - index.count))]
+                start = time.perf_counter()
+                added += index.add_many(items)
+                build += time.perf_counter() - start
+
+            requests = [rng.choice(TEMPLATES).format(*rng.sample(vocabulary, 2)) for _ in range(queries)]
+            latencies, exact_latencies, hits = [], [], 0
+            for request in requests:
+                start = time.perf_counter()
+                found = index.search(request, k)
+                latencies.append(time.perf_counter() - start)
+                start = time.perf_counter()
+                best = index.search(request, k, exact=True)
+                exact_latencies.append(time.perf_counter() - start)
+                hits += len({row for row, _ in found} & {row for row, _ in best})
+            footprint = index.nbytes()
+            print(f"{size:>8} {added / build:>8.0f} {footprint['disk'] / 1e6:>7.1f}MB {footprint['memory'] / 1e6:>7.2f}MB "
+                  f"{_percentile(latencies, 0.5) * 1000:>8.3f}ms {_percentile(latencies, 0.99) * 1000:>8.3f}ms "
+                  f"{_percentile(exact_latencies, 0.5) * 1000:>8.3f}ms {hits / (queries * k):>9.2f}")
+        index.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="Comma-separated index sizes")
+    parser.add_argument("--story-words", type=int, default=150)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=3)
+    parser.add_argument("--batch", type=int, default=1000, help="Stories per add_many commit while building")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    run(sorted(int(size) for size in args.sizes.split(",")), args.story_words, args.queries, args.k, args.batch, args.seed)
@@ -0,0 +1,65 @@
+"""
+Revision benchmark - output tokens and latency of a modification turn
+
+Runs the same follow-up changes against the fake LLM twice: once through the
+full-regeneration path (orchestrator -> writer -> evaluator) and once through
+the incremental revision path (paragraph edits -> span re-check). Latency is
+simulated per output token so the difference in generated text shows up in
+the timings.
+
+    python -m benchmarks.revision --turns 5 --seconds-per-token 0.002
+"""
+import argparse
+import contextlib
+import time
+
+from agents.history import ConversationHistory, MODIFY_PREFIX
+from benchmarks.fake_llm import CALLS, OUTPUT_TOKENS, use_fake_llm
+
+CHANGES = ["add a dragon", "make the princess braver", "add a talking cat", "set it in winter", "make it funnier"]
+
+
+def _session(turns: int, revise: bool) -> tuple:
+    """Run a first turn plus `turns` modifications; return (tokens, seconds, calls) for the modifications."""
+    import main
+
+    history = ConversationHistory()
+    request = "a princess who befriends a dragon"
+    result = main.generate_story_pipeline(request)
+    history.record_turn(request, result["evaluation"].fixed_story or result["story"],
+                        result["tool_name"], result["evaluation"])
+
+    OUTPUT_TOKENS.clear()
+    CALLS.clear()
+    start = time.perf_counter()
+    for turn in range(turns):
+        change = CHANGES[turn % len(CHANGES)]
+        request = f"{MODIFY_PREFIX}{change}"
+        if revise:
+            result = main.revise_story_pipeline(change, history)
+        else:
+            result = main.generate_story_pipeline(request, history.messages())
+        history.record_turn(request, result["evaluation"].fixed_story or result["story"],
+                            result["tool_name"], result["evaluation"])
+    return sum(OUTPUT_TOKENS.values()), time.perf_counter() - start, dict(CALLS)
+
+
+def run(turns: int, latency: float, seconds_per_token: float) -> None:
+    with use_fake_llm(latency=latency, seconds_per_token=seconds_per_token), contextlib.redirect_stdout(None):
+        full = _session(turns, revise=False)
+        revised = _session(turns, revise=True)
+
+    print(f"{turns} modification turns ({latency * 1000:.0f} ms/call + {seconds_per_token * 1000:.1f} ms/output token)")
+    print(f"{'path':<20} {'output tokens':>14} {'seconds':>8}  calls")
+    for label, (tokens, seconds, calls) in (("full regeneration", full), ("revision", revised)):
+        print(f"{label:<20} {tokens:>14} {seconds:>8.2f}  {calls}")
+    print(f"output tokens saved: {1 - revised[0] / full[0]:.0%}, latency saved: {1 - revised[1] / full[1]:.0%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.05, help="Fixed seconds per LLM call")
+    parser.add_argument("--seconds-per-token", type=float, default=0.002, help="Simulated decode time per output token")
+    args = parser.parse_args()
+    run(args.turns, args.latency, args.seconds_per_token)
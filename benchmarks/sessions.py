@@ -0,0 +1,124 @@
+"""
+Session store benchmark - stateless multi-turn sessions on each backend
+
+Runs multi-turn sessions against the fake LLM with `session_id` only (no
+history passed between turns, as a stateless worker would), then reports
+for each backend (memory, SQLite, files):
+
+- load / save latency of one session
+- stored bytes per session, and what inline story bodies would have cost
+- optimistic concurrency: N workers load the same session and save at
+  once; exactly one save may succeed, the others get SessionConflict
+
+    python -m benchmarks.sessions --sessions 200 --turns 3 --workers 8
+"""
+import json
+import time
+import argparse
+import tempfile
+import threading
+import contextlib
+from pathlib import Path
+
+from agents import sessions
+from agents.history import MODIFY_PREFIX
+from benchmarks.fake_llm import use_fake_llm
+
+REQUESTS = ["a princess who befriends a dragon", "a reindeer who is afraid of snow", "a fox who learns to share"]
+CHANGES = ["add a dragon", "make it funnier", "set it in winter", "add a talking cat"]
+
+
+def _stored_bytes(store: sessions.SessionStore) -> int:
+    if isinstance(store, sessions.SQLiteSessionStore):
+        store._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return Path(store.path).stat().st_size
+    if isinstance(store, sessions.FileSessionStore):
+        return sum(path.stat().st_size for path in store.root.rglob("*") if path.is_file())
+    return (sum(len(data.encode("utf-8")) for _, _, data in store._sessions.values())
+            + sum(len(text.encode("utf-8")) for text in store._bodies_by_hash.values()))
+
+
+def _conflicts(store: sessions.SessionStore, session_id: str, workers: int) -> tuple:
+    """(saves that succeeded, saves rejected) when `workers` save the same loaded version at once."""
+    loaded = [store.load(session_id) for _ in range(workers)]
+    barrier = threading.Barrier(workers)
+    outcomes = []
+
+    def save(session):
+        session.history.record_turn(f"{MODIFY_PREFIX}make it shorter", session.history.latest_story)
+        barrier.wait()
+        try:
+            store.save(session)
+            outcomes.append(True)
+        except sessions.SessionConflict:
+            outcomes.append(False)
+
+    threads = [threading.Thread(target=save, args=(session,)) for session in loaded]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return outcomes.count(True), outcomes.count(False)
+
+
+def _run_backend(store: sessions.SessionStore, session_count: int, turns: int, workers: int) -> dict:
+    import main
+
+    sessions._store = store
+    ids = [f"session-{i}" for i in range(session_count)]
+    for i, session_id in enumerate(ids):
+        request = REQUESTS[i % len(REQUESTS)]
+        for turn in range(turns):
+            main.generate_story_pipeline(request, session_id=session_id)
+            request = f"{MODIFY_PREFIX}{CHANGES[turn % len(CHANGES)]}"
+
+    start = time.perf_counter()
+    loaded = [store.load(session_id) for session_id in ids]
+    load_seconds = (time.perf_counter() - start) / len(ids)
+    inline = sum(len(json.dumps(session.history.to_dict(), ensure_ascii=False).encode("utf-8")) for session in loaded)
+    start = time.perf_counter()
+    for session in loaded:
+        store.save(session)
+    save_seconds = (time.perf_counter() - start) / len(ids)
+    assert all(session.version == turns + 1 for session in loaded), "a turn was lost"
+
+    won, rejected = _conflicts(store, ids[0], workers)
+    return {
+        "load_ms": load_seconds * 1000,
+        "save_ms": save_seconds * 1000,
+        "bytes_per_session": _stored_bytes(store) / len(ids),
+        "inline_bytes_per_session": inline / len(ids),
+        "conflict": (won, rejected)
+    }
+
+
+def run(session_count: int, turns: int, workers: int) -> bool:
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp, use_fake_llm(latency=0.0), contextlib.redirect_stdout(None):
+        backends = {
+            "memory": sessions.MemorySessionStore(),
+            "sqlite": sessions.SQLiteSessionStore(str(Path(tmp) / "sessions.sqlite3")),
+            "file": sessions.FileSessionStore(str(Path(tmp) / "sessions"))
+        }
+        results = {name: _run_backend(store, session_count, turns, workers) for name, store in backends.items()}
+    sessions._store = None
+
+    print(f"{session_count} sessions x {turns} turns, {workers} concurrent savers")
+    print(f"{'backend':<8} {'load':>8} {'save':>8} {'stored/session':>15} {'inline bodies':>14}  concurrent saves")
+    for name, result in results.items():
+        won, rejected = result["conflict"]
+        print(f"{name:<8} {result['load_ms']:>6.2f}ms {result['save_ms']:>6.2f}ms "
+              f"{result['bytes_per_session']:>13.0f}B {result['inline_bytes_per_session']:>12.0f}B  "
+              f"{won} saved, {rejected} conflicts")
+        ok = ok and won == 1 and rejected == workers - 1
+    print("ok" if ok else "FAIL: concurrent saves of one version must leave exactly one winner")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=8, help="Savers racing on one session version")
+    args = parser.parse_args()
+    raise SystemExit(0 if run(args.sessions, args.turns, args.workers) else 1)
@@ -0,0 +1,64 @@
+"""
+Setup overhead microbenchmark - per-request client/agent construction cost
+
+Compares what every request used to pay (new ChatOpenAI clients, a fresh
+`create_agent` compile and a fresh `with_structured_output` binding) with
+registry lookups. No network calls are made; clients are only constructed.
+
+    python -m benchmarks.setup_overhead --iterations 200
+"""
+import os
+import time
+import argparse
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from langchain_openai import ChatOpenAI
+from langchain.agents import create_agent
+
+import agents.llm
+from agents.llm import get_chat_model, get_or_create
+from agents.orchestrator import _get_agent, _system_prompt
+from agents.evaluator import EvaluationResponse, _build_scorer
+from agents.writers.registry import get_registry
+
+
+def uncached_setup() -> None:
+    """Per-request setup as it was before the registry."""
+    tool_names = tuple(get_registry().names())
+    orchestrator_model = ChatOpenAI(model="gpt-3.5-turbo", temperature=0.1)
+    create_agent(model=orchestrator_model, tools=get_registry().tools(list(tool_names)), system_prompt=_system_prompt(tool_names))
+    ChatOpenAI(model="gpt-3.5-turbo", temperature=0.7, max_tokens=1000)
+    ChatOpenAI(model="gpt-3.5-turbo", temperature=0.1).with_structured_output(EvaluationResponse)
+
+
+def cached_setup() -> None:
+    """Per-request setup through the registry."""
+    _get_agent(tuple(get_registry().names()))
+    get_chat_model(temperature=0.7, max_tokens=1000)
+    get_or_create("evaluator_scorer", _build_scorer)
+
+
+def measure(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+    
+    agents.llm.clear_cache()
+    start = time.perf_counter()
+    cached_setup()
+    first_build = time.perf_counter() - start
+    
+    uncached = measure(uncached_setup, args.iterations)
+    cached = measure(cached_setup, args.iterations)
+    print(f"uncached setup per request: {uncached * 1000:8.3f} ms")
+    print(f"registry first build:       {first_build * 1000:8.3f} ms (once per process)")
+    print(f"registry setup per request: {cached * 1000:8.3f} ms")
+    print(f"saved per request:          {(uncached - cached) * 1000:8.3f} ms")
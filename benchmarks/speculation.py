@@ -0,0 +1,82 @@
+"""
+Speculation benchmark - time to first token on ambiguous requests, and the tokens it costs
+
+Streams the same ambiguous first-turn requests (the router is not confident
+about them) through the async pipeline twice against the fake LLM: through
+the orchestrator agent, then with speculative candidate writers. Reports
+time to first story token, total latency and the tokens spent on cancelled
+writers.
+
+    python -m benchmarks.speculation --latency 0.3 --seconds-per-token 0.002 --candidates 2
+"""
+import time
+import asyncio
+import argparse
+import contextlib
+from unittest import mock
+
+from benchmarks.fake_llm import use_fake_llm
+
+REQUESTS = [
+    "a reindeer who wants to be a princess at Christmas",
+    "a prince who finds a lost puppy in the snow on Christmas eve",
+    "a queen and her cat decorate the castle for the holidays",
+    "an elf who dreams of living in the royal palace",
+]
+
+
+async def _stream(request: str) -> tuple:
+    import main
+    start = time.perf_counter()
+    first_token = None
+    async for event in main.astream_story_pipeline(request):
+        if event["type"] == "token" and first_token is None:
+            first_token = time.perf_counter() - start
+        elif event["type"] == "result":
+            result = event
+    return first_token, time.perf_counter() - start, result
+
+
+def _run(requests: list, speculative: bool, candidates: int) -> dict:
+    import agents.speculation
+    with mock.patch.object(agents.speculation, "SPECULATION_ENABLED", speculative), \
+            mock.patch.object(agents.speculation, "SPECULATION_CANDIDATES", candidates):
+        runs = [asyncio.run(_stream(request)) for request in requests]
+    n = len(runs)
+    stages = [result["timings"]["stages"] for _, _, result in runs]
+    return {
+        "first_token": sum(first for first, _, _ in runs) / n,
+        "total": sum(total for _, total, _ in runs) / n,
+        "tokens": sum(result["timings"]["prompt_tokens"] + result["timings"]["completion_tokens"] for _, _, result in runs) / n,
+        "wasted": sum(s["speculative"]["prompt_tokens"] + s["speculative"]["completion_tokens"]
+                      for s in stages if "speculative" in s) / n
+    }
+
+
+def run(latency: float, seconds_per_token: float, candidates: int) -> None:
+    from agents.orchestrator import get_router
+    from agents.speculation import speculation_stats
+
+    with use_fake_llm(latency=latency, seconds_per_token=seconds_per_token), contextlib.redirect_stdout(None):
+        requests = [r for r in REQUESTS if not get_router().route(r).confident]
+        agent = _run(requests, speculative=False, candidates=candidates)
+        speculative = _run(requests, speculative=True, candidates=candidates)
+        stats = speculation_stats()
+
+    print(f"{len(requests)} ambiguous requests ({latency * 1000:.0f} ms/call + {seconds_per_token * 1000:.1f} ms/output token), "
+          f"{candidates} candidates")
+    print(f"{'path':<14} {'first token s':>14} {'total s':>8} {'tokens/request':>15} {'wasted':>7}")
+    for label, r in (("agent", agent), ("speculative", speculative)):
+        print(f"{label:<14} {r['first_token']:>14.3f} {r['total']:>8.3f} {r['tokens']:>15.0f} {r['wasted']:>7.0f}")
+    print(f"first token {1 - speculative['first_token'] / agent['first_token']:.0%} sooner, "
+          f"{speculative['tokens'] / agent['tokens'] - 1:+.0%} tokens; hit rate {stats['hit_rate']:.0%}, "
+          f"{stats['cancelled_writers']} writers cancelled")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.3, help="Fixed seconds per LLM call")
+    parser.add_argument("--seconds-per-token", type=float, default=0.002, help="Simulated decode time per output token")
+    parser.add_argument("--candidates", type=int, default=2, choices=(2, 3))
+    args = parser.parse_args()
+    run(args.latency, args.seconds_per_token, args.candidates)
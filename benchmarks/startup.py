@@ -0,0 +1,93 @@
+"""
+Startup benchmark - `python main.py --help` wall time and import cost, against a budget
+
+Runs `python -X importtime main.py --help` in fresh interpreters and reports
+wall time, the cumulative import time of `main` and its most expensive
+imports. Exits 1 when the import time exceeds `--budget-ms` or when any
+heavy module (LangChain, LangGraph, the OpenAI SDK) is imported before the
+first generation, so it can gate CI.
+
+    python -m benchmarks.startup --runs 5 --budget-ms 150
+"""
+import os
+import sys
+import time
+import argparse
+import subprocess
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+# Must not be imported by the CLI until a story is generated
+HEAVY_MODULES = ("langchain", "langchain_core", "langchain_openai", "langgraph", "openai", "tiktoken", "httpx")
+
+
+def _run(args: list) -> tuple:
+    """(wall seconds, stderr) of one fresh interpreter."""
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, *args], cwd=ROOT, capture_output=True, text=True,
+                               env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"})
+    elapsed = time.perf_counter() - start
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr)
+    return elapsed, completed.stderr
+
+
+def parse_importtime(stderr: str) -> list:
+    """(depth, module, cumulative us) per `-X importtime` line, in output order (children before parents)."""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append((depth, name.strip(), int(cumulative)))
+    return entries
+
+
+def direct_imports(entries: list, module: str) -> list:
+    """(module, cumulative us) of the top-level module's direct imports."""
+    children = []
+    for depth, name, cumulative in entries:
+        if depth == 0:
+            if name == module:
+                return children
+            children = []
+        elif depth == 1:
+            children.append((name, cumulative))
+    return []
+
+
+def run(runs: int, budget_ms: float, top: int) -> bool:
+    # Interpreter baseline, to tell our imports from Python's own startup
+    baseline = min(_run(["-c", "pass"])[0] for _ in range(runs))
+    wall = min(_run(["main.py", "--help"])[0] for _ in range(runs))
+    entries = parse_importtime(_run(["-X", "importtime", "-c", "import main"])[1])
+    main_us = next(cumulative for depth, name, cumulative in entries if depth == 0 and name == "main")
+    heavy = sorted({name.split(".")[0] for _, name, _ in entries if name.split(".")[0] in HEAVY_MODULES})
+    
+    print(f"python main.py --help: {wall * 1000:.0f} ms wall (best of {runs}; bare interpreter {baseline * 1000:.0f} ms)")
+    print(f"import main: {main_us / 1000:.1f} ms cumulative (budget {budget_ms:.0f} ms)")
+    print("most expensive imports of main:")
+    for name, cumulative in sorted(direct_imports(entries, "main"), key=lambda item: item[1], reverse=True)[:top]:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+    
+    ok = True
+    if heavy:
+        print(f"FAIL: heavy modules imported at startup: {', '.join(heavy)}")
+        ok = False
+    if main_us / 1000 > budget_ms:
+        print(f"FAIL: import main took {main_us / 1000:.1f} ms, over the {budget_ms:.0f} ms budget")
+        ok = False
+    if ok:
+        print("ok")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=150.0, help="Maximum cumulative import time of main")
+    parser.add_argument("--top", type=int, default=8, help="Expensive imports to list")
+    args = parser.parse_args()
+    sys.exit(0 if run(args.runs, args.budget_ms, args.top) else 1)
@@ -0,0 +1,121 @@
+"""
+Story store benchmark - request-path cost, write throughput, analytics and export
+
+Fills a temporary story store with synthetic stories (random rubric scores
+spread over the registered genres) and reports:
+
+- `record_story` latency on the request path (the call only queues a tuple)
+- rows per second the background writer sustains with batched transactions
+- "weakest dimension per genre over the last 10k stories" query time at each
+  table size, with SQLite's query plan
+- peak Python memory of a full JSONL export (rows are streamed, so it stays
+  flat as the table grows)
+
+    python -m benchmarks.store --sizes 10000,100000 --story-words 450
+"""
+import os
+import time
+import random
+import argparse
+import tempfile
+import tracemalloc
+from pathlib import Path
+from types import SimpleNamespace
+
+from agents.store import DIMENSIONS, StoryStore, _weakest_query
+from agents.writers.registry import get_registry
+
+
+def _result(tool_names: list, story: str, rng: random.Random) -> tuple:
+    """A pipeline-shaped (request, result) pair with random scores."""
+    scores = {dimension: round(rng.uniform(5.0, 10.0), 1) for dimension in DIMENSIONS}
+    overall = sum(scores.values()) / len(scores)
+    evaluation = SimpleNamespace(
+        scores=SimpleNamespace(model_dump=lambda: scores), overall_score=overall, approved=overall >= 7.0,
+        feedback="Synthetic feedback for the store benchmark.", fixed_story=None
+    )
+    timings = {"total_seconds": 4.2, "prompt_tokens": 2100, "completion_tokens": 700,
+               "stages": {"writer": {"cost_usd": 0.0012}, "evaluator": {"cost_usd": 0.0004}}}
+    return ("a story about a brave little fox", {
+        "story": story, "word_count": len(story.split()), "evaluation": evaluation,
+        "tool_name": rng.choice(tool_names), "timings": timings
+    })
+
+
+def _fill(store: StoryStore, rows: int, tool_names: list, story: str, rng: random.Random) -> tuple:
+    """Record `rows` stories; return (per-call record seconds, seconds until all are on disk)."""
+    from agents import store as store_module
+
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(rows):
+        request, result = _result(tool_names, story, rng)
+        call = time.perf_counter()
+        store_module.record_story(request, result)
+        latencies.append(time.perf_counter() - call)
+    store.flush()
+    return latencies, time.perf_counter() - start
+
+
+def _percentile(values: list, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def _query_plan(store: StoryStore, window: int, tool_name: str) -> list:
+    sql, params = _weakest_query(window, tool_name)
+    with store._reader() as conn:
+        return [row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+
+def run(sizes: list, story_words: int, window: int, seed: int) -> None:
+    from agents import store as store_module
+
+    rng = random.Random(seed)
+    tool_names = get_registry().names()
+    story = " ".join(rng.choice(("the", "fox", "moon", "sang", "softly", "over", "a", "river")) for _ in range(story_words))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = StoryStore(path=str(Path(tmp) / "stories.sqlite3"))
+        store_module._store = store
+        store_module.STORE_ENABLED = True
+
+        print(f"{len(tool_names)} genres, {story_words}-word stories, batch {store.batch_size}")
+        print(f"{'rows':>8} {'record p50':>11} {'record p99':>11} {'rows/s':>9} "
+              f"{'weakest all':>12} {'weakest one':>12} {'export peak':>12} {'db size':>9}")
+        total = 0
+        for size in sizes:
+            latencies, seconds = _fill(store, size - total, tool_names, story, rng)
+            total = size
+
+            start = time.perf_counter()
+            store.weakest_dimensions(window)
+            weakest_all = time.perf_counter() - start
+            start = time.perf_counter()
+            store.weakest_dimensions(window, tool_name=tool_names[0])
+            weakest_one = time.perf_counter() - start
+
+            tracemalloc.start()
+            with open(os.devnull, "w", encoding="utf-8") as out:
+                store.export(out)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            print(f"{size:>8} {_percentile(latencies, 0.5) * 1e6:>9.1f}us {_percentile(latencies, 0.99) * 1e6:>9.1f}us "
+                  f"{len(latencies) / seconds:>9.0f} {weakest_all * 1000:>10.1f}ms {weakest_one * 1000:>10.1f}ms "
+                  f"{peak / 1e6:>10.2f}MB {os.path.getsize(store.path) / 1e6:>7.0f}MB")
+
+        print(f"query plan (one genre, last {window}):")
+        for line in _query_plan(store, window, tool_names[0]):
+            print(f"  {line}")
+        store.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000", help="Comma-separated table sizes to measure at")
+    parser.add_argument("--story-words", type=int, default=450)
+    parser.add_argument("--window", type=int, default=10000, help="Latest stories the weakest-dimension query covers")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    run(sorted(int(size) for size in args.sizes.split(",")), args.story_words, args.window, args.seed)
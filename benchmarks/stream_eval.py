@@ -0,0 +1,86 @@
+"""
+Streaming evaluation benchmark - verdict delay after the last token, and early aborts
+
+Streams stories through `stream_story_pipeline` against the fake LLM with the
+streaming evaluator off (judge after the story) and on (passages judged while
+the story is written), and reports how long the verdict takes after the last
+story token. A second scenario makes the fake writer use a banned word in
+its second paragraph, to show the writer being stopped early.
+
+    python -m benchmarks.stream_eval --stories 5 --latency 0.3 --seconds-per-token 0.003
+"""
+import time
+import argparse
+import contextlib
+from unittest import mock
+
+from benchmarks import fake_llm
+from benchmarks.fake_llm import use_fake_llm
+
+REQUESTS = [
+    "a princess who befriends a dragon",
+    "a Christmas story about Santa's reindeer",
+    "a fox who learns to share",
+]
+
+
+def _stream(request: str) -> tuple:
+    import main
+    last_token = start = time.perf_counter()
+    for event in main.stream_story_pipeline(request):
+        if event["type"] == "token":
+            last_token = time.perf_counter()
+        else:
+            result = event
+    end = time.perf_counter()
+    return end - start, end - last_token, result
+
+
+def _run(stories: int, streaming: bool) -> dict:
+    import agents.evaluator
+    with mock.patch.object(agents.evaluator, "STREAM_EVAL_ENABLED", streaming):
+        runs = [_stream(REQUESTS[i % len(REQUESTS)]) for i in range(stories)]
+    return {
+        "total": sum(total for total, _, _ in runs) / stories,
+        "verdict_delay": sum(delay for _, delay, _ in runs) / stories,
+        "approved": sum(result["evaluation"].approved for _, _, result in runs),
+        "streamed_words": sum(result["word_count"] for _, _, result in runs) / stories,
+        "judge_calls": sum(result["timings"]["stages"]["evaluator"]["calls"] for _, _, result in runs) / stories
+    }
+
+
+_fake_story = fake_llm._fake_story
+
+
+def _unsafe_story(seed: str, words: int = fake_llm.STORY_WORDS, paragraphs: int = fake_llm.STORY_PARAGRAPHS) -> str:
+    """A fake story that turns inappropriate in its second paragraph."""
+    story = _fake_story(seed, words, paragraphs).split("\n\n")
+    if len(story) > 1:
+        story[1] = "The robber pulled out a gun. " + story[1]
+    return "\n\n".join(story)
+
+
+def run(stories: int, latency: float, seconds_per_token: float) -> None:
+    with use_fake_llm(latency=latency, seconds_per_token=seconds_per_token), contextlib.redirect_stdout(None):
+        after = _run(stories, streaming=False)
+        overlapped = _run(stories, streaming=True)
+        with mock.patch.object(fake_llm, "_fake_story", _unsafe_story):
+            unsafe_after = _run(stories, streaming=False)
+            unsafe_overlapped = _run(stories, streaming=True)
+
+    print(f"{stories} streamed stories ({latency * 1000:.0f} ms/call + {seconds_per_token * 1000:.1f} ms/output token)")
+    print(f"{'scenario':<32} {'total s':>8} {'verdict after last token s':>27} {'judge calls':>12} {'streamed words':>15}")
+    for label, r in (("evaluate after story", after), ("evaluate while streaming", overlapped),
+                     ("unsafe story, after", unsafe_after), ("unsafe story, while streaming", unsafe_overlapped)):
+        print(f"{label:<32} {r['total']:>8.3f} {r['verdict_delay']:>27.3f} {r['judge_calls']:>12.1f} {r['streamed_words']:>15.0f}")
+    print(f"verdict {1 - overlapped['verdict_delay'] / after['verdict_delay']:.0%} sooner after the last token; "
+          f"unsafe stories stopped after {unsafe_overlapped['streamed_words'] / unsafe_after['streamed_words']:.0%} of their words")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stories", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.3, help="Fixed seconds per LLM call")
+    parser.add_argument("--seconds-per-token", type=float, default=0.003, help="Simulated decode time per output token")
+    args = parser.parse_args()
+    run(args.stories, args.latency, args.seconds_per_token)
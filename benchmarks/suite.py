@@ -0,0 +1,264 @@
+"""
+Benchmark suite - throughput, per-stage overhead, prompt sizes and memory, offline
+
+Runs three workloads through the real pipeline code with a local model
+backend (agents.llm `use_backend`), so it needs no API key or network and
+can gate CI:
+
+- single:     sequential `generate_story_pipeline` requests
+- concurrent: independent sessions through `run_sessions` on one event loop
+- multi_turn: sessions with follow-up changes (incremental revision when possible)
+
+The backend is the synthetic FakeChatModel (fixed latency per call plus a
+decode rate), or the completions recorded by `--record` replayed with
+`--replay`. Each workload is run twice: once for timings, once under
+tracemalloc for peak memory (tracing slows Python code down). Per-stage
+numbers come from the "timings" record every pipeline result carries
+(agents/instrumentation.py); "overhead" is the time not spent waiting on the
+model (tool stage plus unattributed glue).
+
+    python -m benchmarks.suite --json results.json
+    python -m benchmarks.suite --baseline results.json          # exit 1 on regression
+    python -m benchmarks.suite --record recordings/stories.jsonl  # real API, once
+    python -m benchmarks.suite --replay recordings/stories.jsonl --realtime
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import contextlib
+import tracemalloc
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from agents.history import ConversationHistory, MODIFY_PREFIX
+from agents.instrumentation import STAGES
+from benchmarks.fake_llm import use_fake_llm
+
+REQUESTS = [
+    "a princess who befriends a dragon",
+    "a Christmas story about Santa's reindeer",
+    "a fox who learns to share",
+    "a brave little turtle who crosses the river",
+    "a prince who is afraid of the dark",
+]
+CHANGES = ["add a dragon", "make the ending happier", "add a talking cat", "set it in winter", "make it funnier"]
+
+# Metric -> (direction, tolerance kind): counts are deterministic, timings and memory are noisy
+CHECKED_METRICS = {
+    "stories_per_second": ("higher", "timing"),
+    "latency_p95_seconds": ("lower", "timing"),
+    "overhead_seconds_mean": ("lower", "timing"),
+    "calls_per_story": ("lower", "count"),
+    "prompt_tokens_per_story": ("lower", "count"),
+    "completion_tokens_per_story": ("lower", "count"),
+    "peak_memory_mb": ("lower", "timing"),
+}
+COUNT_TOLERANCE = 0.05
+
+
+def _final_story(result: dict) -> str:
+    return result["evaluation"].fixed_story or result["story"]
+
+
+def _single(sessions: int, **_) -> list:
+    import main
+    return [main.generate_story_pipeline(REQUESTS[i % len(REQUESTS)]) for i in range(sessions)]
+
+
+def _concurrent(sessions: int, concurrency: int, **_) -> list:
+    import main
+    requests = [REQUESTS[i % len(REQUESTS)] for i in range(sessions)]
+    results = asyncio.run(main.run_sessions(requests, concurrency))
+    failures = [r for r in results if isinstance(r, Exception)]
+    if failures:
+        raise RuntimeError(f"{len(failures)} concurrent sessions failed: {failures[0]!r}")
+    return results
+
+
+def _multi_turn(sessions: int, turns: int, **_) -> list:
+    import main
+    results = []
+    for i in range(sessions):
+        history = ConversationHistory()
+        request = REQUESTS[i % len(REQUESTS)]
+        result = main.generate_story_pipeline(request)
+        history.record_turn(request, _final_story(result), result["tool_name"], result["evaluation"])
+        results.append(result)
+        for turn in range(turns):
+            change = CHANGES[turn % len(CHANGES)]
+            request = f"{MODIFY_PREFIX}{change}"
+            if history.can_revise:
+                result = main.revise_story_pipeline(change, history)
+            else:
+                result = main.generate_story_pipeline(request, history.messages())
+            history.record_turn(request, _final_story(result), result["tool_name"], result["evaluation"])
+            results.append(result)
+    return results
+
+
+WORKLOADS = {"single": _single, "concurrent": _concurrent, "multi_turn": _multi_turn}
+
+
+def _percentile(values: list, q: float) -> float:
+    from main import _percentile as percentile
+    return round(percentile(values, q), 4)
+
+
+def summarize(results: list, elapsed: float) -> dict:
+    """Aggregate the per-request timing records of one workload run."""
+    timings = [result["timings"] for result in results]
+    n = len(timings)
+    stages = {}
+    for name in STAGES:
+        entries = [t["stages"][name] for t in timings if name in t["stages"]]
+        if entries:
+            stages[name] = {
+                "seconds_mean": round(sum(e["seconds"] for e in entries) / n, 4),
+                "calls_per_story": round(sum(e["calls"] for e in entries) / n, 3),
+                "prompt_tokens_per_story": round(sum(e["prompt_tokens"] for e in entries) / n, 1),
+                "completion_tokens_per_story": round(sum(e["completion_tokens"] for e in entries) / n, 1)
+            }
+    overhead = [t["unattributed_seconds"] + t["stages"].get("tool", {}).get("seconds", 0.0) for t in timings]
+    latencies = [t["total_seconds"] for t in timings]
+    return {
+        "stories": n,
+        "seconds": round(elapsed, 3),
+        "stories_per_second": round(n / elapsed, 2),
+        "latency_p50_seconds": _percentile(latencies, 50),
+        "latency_p95_seconds": _percentile(latencies, 95),
+        "overhead_seconds_mean": round(sum(overhead) / n, 4),
+        "calls_per_story": round(sum(e["calls_per_story"] for e in stages.values()), 3),
+        "prompt_tokens_per_story": round(sum(e["prompt_tokens_per_story"] for e in stages.values()), 1),
+        "completion_tokens_per_story": round(sum(e["completion_tokens_per_story"] for e in stages.values()), 1),
+        "cost_usd_per_story": round(sum(t["cost_usd"] for t in timings) / n, 6),
+        "stages": stages
+    }
+
+
+def run_workload(name: str, memory: bool = True, **options) -> dict:
+    """Timed pass, then (optionally) a tracemalloc pass for peak memory."""
+    workload = WORKLOADS[name]
+    start = time.perf_counter()
+    results = workload(**options)
+    summary = summarize(results, time.perf_counter() - start)
+    if memory:
+        tracemalloc.start()
+        try:
+            workload(**options)
+            summary["peak_memory_mb"] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 2)
+        finally:
+            tracemalloc.stop()
+    return summary
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Regressions of `results` against a previous `--json` output, as readable lines."""
+    regressions = []
+    for name, current in results["workloads"].items():
+        previous = baseline.get("workloads", {}).get(name)
+        if not previous:
+            continue
+        for metric, (direction, kind) in CHECKED_METRICS.items():
+            if metric not in current or not previous.get(metric):
+                continue
+            allowed = COUNT_TOLERANCE if kind == "count" else tolerance
+            change = (current[metric] - previous[metric]) / previous[metric]
+            worse = -change if direction == "higher" else change
+            if worse > allowed:
+                regressions.append(f"{name}.{metric}: {previous[metric]} -> {current[metric]} "
+                                   f"({worse:+.0%} worse, {allowed:.0%} allowed)")
+    return regressions
+
+
+def _print_report(results: dict) -> None:
+    config = results["config"]
+    print(f"backend: {config['backend']} ({config['latency'] * 1000:.0f} ms/call, "
+          f"{config['tokens_per_second'] or 'unlimited'} tokens/s), cold start {results['cold_start_seconds']:.2f}s\n")
+    header = f"{'workload':<12} {'stories':>7} {'stories/s':>10} {'p50 s':>7} {'p95 s':>7} {'overhead ms':>12} " \
+             f"{'calls':>6} {'prompt tok':>11} {'output tok':>11} {'peak MB':>8}"
+    print(header)
+    print("-" * len(header))
+    for name, w in results["workloads"].items():
+        print(f"{name:<12} {w['stories']:>7} {w['stories_per_second']:>10.1f} {w['latency_p50_seconds']:>7.3f} "
+              f"{w['latency_p95_seconds']:>7.3f} {w['overhead_seconds_mean'] * 1000:>12.1f} {w['calls_per_story']:>6.2f} "
+              f"{w['prompt_tokens_per_story']:>11.0f} {w['completion_tokens_per_story']:>11.0f} "
+              f"{w.get('peak_memory_mb', float('nan')):>8.1f}")
+    print("\nper stage (mean seconds / prompt tokens per story):")
+    for name, w in results["workloads"].items():
+        stages = ", ".join(f"{stage} {s['seconds_mean'] * 1000:.1f}ms/{s['prompt_tokens_per_story']:.0f}tok"
+                           for stage, s in w["stages"].items())
+        print(f"  {name:<12} {stages}")
+
+
+def _backend(args):
+    seconds_per_token = 1 / args.tokens_per_second if args.tokens_per_second else 0.0
+    if args.record:
+        from benchmarks.replay_llm import use_recording_llm
+        return "record", use_recording_llm(args.record)
+    if args.replay:
+        from benchmarks.replay_llm import use_replay_llm
+        return "replay", use_replay_llm(args.replay, args.latency, seconds_per_token, args.realtime, args.strict)
+    return "synthetic", use_fake_llm(args.latency, seconds_per_token)
+
+
+def run(args) -> dict:
+    import main
+
+    backend, context = _backend(args)
+    options = {"concurrency": args.concurrency, "turns": args.turns, "memory": not args.no_memory}
+    sizes = {"single": args.single, "concurrent": args.sessions, "multi_turn": args.multi_turn}
+    results = {
+        "config": {"backend": backend, "latency": args.latency, "tokens_per_second": args.tokens_per_second,
+                   "concurrency": args.concurrency, "turns": args.turns, "sizes": sizes},
+        "workloads": {}
+    }
+    with context, contextlib.redirect_stdout(None):
+        # First request pays for imports, prompt loading and agent compilation
+        start = time.perf_counter()
+        main.generate_story_pipeline(REQUESTS[0])
+        results["cold_start_seconds"] = round(time.perf_counter() - start, 3)
+        for name in args.workloads:
+            results["workloads"][name] = run_workload(name, sessions=sizes[name], **options)
+    if backend == "replay":
+        from benchmarks.replay_llm import REPLAY
+        results["replay"] = dict(REPLAY)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workloads", nargs="+", choices=list(WORKLOADS), default=list(WORKLOADS))
+    parser.add_argument("--single", type=int, default=10, help="Sequential requests")
+    parser.add_argument("--sessions", type=int, default=100, help="Concurrent sessions")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--multi-turn", type=int, default=3, help="Multi-turn sessions")
+    parser.add_argument("--turns", type=int, default=4, help="Follow-up changes per multi-turn session")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds per model call")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="Simulated decode rate (0 = instant)")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc pass")
+    backend = parser.add_mutually_exclusive_group()
+    backend.add_argument("--record", metavar="PATH", help="Call the real API and record completions to PATH")
+    backend.add_argument("--replay", metavar="PATH", help="Replay completions recorded to PATH")
+    parser.add_argument("--realtime", action="store_true", help="Replay with the recorded call latencies")
+    parser.add_argument("--strict", action="store_true", help="Fail on prompts missing from the recording")
+    parser.add_argument("--json", metavar="PATH", help="Write the results as JSON (usable as a --baseline)")
+    parser.add_argument("--baseline", metavar="PATH", help="Previous --json results to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help=f"Allowed slowdown for timings and memory (counts allow {COUNT_TOLERANCE:.0%})")
+    args = parser.parse_args()
+
+    results = run(args)
+    _print_report(results)
+    if "replay" in results:
+        print(f"\nreplay: {results['replay'].get('hits', 0)} recorded, {results['replay'].get('misses', 0)} synthetic")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        print("\n" + ("\n".join(f"❌ {line}" for line in regressions) if regressions else "✅ no regressions"))
+        sys.exit(1 if regressions else 0)
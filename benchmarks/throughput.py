@@ -0,0 +1,53 @@
+"""
+Throughput benchmark - sequential sync pipeline vs concurrent async sessions
+
+Runs against the local FakeChatModel, so it needs no API key or network:
+
+    python -m benchmarks.throughput --sessions 200 --concurrency 100 --latency 0.05
+"""
+import time
+import asyncio
+import argparse
+import contextlib
+
+from benchmarks.fake_llm import use_fake_llm
+
+REQUESTS = [
+    "a princess who befriends a dragon",
+    "a Christmas story about Santa's reindeer",
+    "a fox who learns to share",
+]
+
+
+def run(sessions: int, concurrency: int, latency: float) -> None:
+    import main
+    
+    requests = [REQUESTS[i % len(REQUESTS)] for i in range(sessions)]
+    
+    with use_fake_llm(latency), contextlib.redirect_stdout(None):
+        # Sequential baseline on a small sample, extrapolated
+        sample = requests[:min(10, sessions)]
+        start = time.perf_counter()
+        for request in sample:
+            main.generate_story_pipeline(request)
+        sync_rate = len(sample) / (time.perf_counter() - start)
+        
+        start = time.perf_counter()
+        results = asyncio.run(main.run_sessions(requests, concurrency))
+        async_elapsed = time.perf_counter() - start
+    
+    failures = sum(isinstance(r, Exception) for r in results)
+    async_rate = sessions / async_elapsed
+    print(f"LLM latency per call: {latency * 1000:.0f} ms")
+    print(f"sync pipeline:   {sync_rate:8.1f} stories/s")
+    print(f"async x{concurrency:<4} {async_rate:11.1f} stories/s ({sessions} sessions in {async_elapsed:.2f}s, {failures} failed)")
+    print(f"speedup:         {async_rate / sync_rate:8.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds per fake LLM call")
+    args = parser.parse_args()
+    run(args.sessions, args.concurrency, args.latency)
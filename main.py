@@ -1,15 +1,30 @@
 import os
+import sys
+import json
+import math
+import time
+import asyncio
+import argparse
+import threading
+from typing import TYPE_CHECKING
 from dotenv import load_dotenv
 
+# Before the agents read their settings from the environment
+load_dotenv()
 
 # LangSmith tracing is automatically enabled if LANGCHAIN_TRACING_V2=true in .env
 # View traces at: https://smith.langchain.com/
 
-# Import agents
-from agents.orchestrator import generate_story
-from agents.evaluator import evaluate_story
+# Only light modules at startup: LangChain, LangGraph and the OpenAI SDK are
+# imported by the pipelines on first use (or by `warm_up`), so `--help` and
+# the banner do not wait for them
+from agents.cache import get_cache, CACHE_VARIANTS
+from agents.instrumentation import traced, stage_summary
+from agents.store import get_store, record_story
+from agents import metrics
 
-load_dotenv()
+if TYPE_CHECKING:
+    from agents.history import ConversationHistory
 
 
 """
@@ -31,7 +46,77 @@ NEXT PHASE (Additional time):
 """
 
 
-def generate_story_pipeline(user_request: str, conversation_history: list = None):
+def _print_summary(evaluation) -> None:
+    """Print the evaluation verdict and the dimensions that were improved."""
+    print(f"Overall Score: {evaluation.overall_score:.1f}/10 - {'✅ Approved' if evaluation.approved else '⚠️ Needs improvement'}")
+    
+    if not evaluation.approved:
+        # Identify which dimensions were below threshold
+        scores_dict = evaluation.scores.model_dump()
+        low_scores = [dim for dim, score in scores_dict.items() if score < 7.0]
+        if low_scores:
+            print(f"🔧 Improved: {', '.join(low_scores)}")
+        if evaluation.fix:
+            print(_fix_summary(evaluation.fix))
+
+
+def _fix_summary(fix) -> str:
+    """One line on how the evaluator's fix-and-verify loop ended."""
+    rewrites = f"{fix.iterations} rewrite{'s' if fix.iterations != 1 else ''}"
+    if fix.verified:
+        return f"✅ Rewrite verified after {rewrites}"
+    if fix.scores is None:
+        return f"⚠️ Rewrite not verified ({rewrites}, {fix.stop_reason.replace('_', ' ')})"
+    still_low = [dim for dim, score in fix.scores.model_dump().items() if score < 7.0]
+    return f"⚠️ Rewrite still below standard on {', '.join(still_low)} after {rewrites} ({fix.stop_reason.replace('_', ' ')})"
+
+
+def _load_session(session_id: str):
+    """The stored session for `session_id` (a new one if there is none), or None without an id."""
+    if session_id is None:
+        return None
+    from agents.sessions import get_session_store
+    return get_session_store().get(session_id)
+
+
+def _save_session(session, user_request: str, result: dict) -> None:
+    """Record the turn in the session and save it (raises SessionConflict if it changed meanwhile)."""
+    from agents.sessions import get_session_store
+    
+    evaluation = result["evaluation"]
+    session.history.record_turn(user_request, evaluation.fixed_story or result["story"], result["tool_name"], evaluation)
+    get_session_store().save(session)
+    result["session_id"], result["session_version"] = session.id, session.version
+
+
+def _record_result(request: str, result: dict, kind: str = "story", topic: str = None) -> None:
+    """
+    Keep a finished turn: every result goes to the story store, approved
+    stories also to their genre's retrieval index for future few-shot examples.
+    
+    Args:
+        request: The request as sent to the pipeline
+        result: Pipeline result dict
+        kind: "story" or "revision" (story store)
+        topic: What the story is about, for the index (default: the request
+            without the modification prefix)
+    """
+    from agents.history import MODIFY_PREFIX
+    from agents.retrieval import index_story
+    
+    record_story(request, result, kind)
+    evaluation = result["evaluation"]
+    topic = topic or request.removeprefix(MODIFY_PREFIX)
+    index_story(result["tool_name"], topic, evaluation.fixed_story or result["story"], evaluation)
+
+
+def _share_result(result: dict, shared: bool) -> dict:
+    """Each caller of a coalesced pipeline gets its own copy of the shared result."""
+    return {**result, "conversation_history": list(result["conversation_history"]), "coalesced": shared}
+
+
+@traced
+def generate_story_pipeline(user_request: str, conversation_history: list = None, session_id: str = None):
     """
     Complete story generation pipeline using ReAct agent orchestration.
     
@@ -40,13 +125,43 @@ def generate_story_pipeline(user_request: str, conversation_history: list = None
     2. Evaluate with rubric and fix if needed
     3. Return final story with scores and updated conversation history
     
+    First-turn requests (no history, no session) are coalesced: concurrent
+    identical requests share one generation (agents/coalescing.py).
+    
     Args:
         user_request: Current user request (new story or modification)
         conversation_history: List of previous messages for multi-turn context
+        session_id: Instead of `conversation_history`: load the history from the
+            session store and save this turn to it, so any worker can serve the
+            next turn (agents/sessions.py)
     
     Returns:
-        dict: Contains story, evaluation, and updated conversation history
+        dict: Contains story, evaluation, updated conversation history and
+        "timings" (per-stage seconds, tokens, retries and cost, agents/instrumentation.py);
+        with a session_id also "session_id" and "session_version"; first-turn
+        results also "coalesced" (True if another request's generation was shared)
+    
+    Raises:
+        SessionConflict: Another worker saved a turn of the same session meanwhile
     """
+    if conversation_history or session_id is not None:
+        return _generate_story(user_request, conversation_history, session_id)
+    from agents.coalescing import coalesce, normalize_request
+    
+    result, shared = coalesce("pipeline", normalize_request(user_request), lambda: _generate_story(user_request))
+    if shared:
+        print("♻️ Shared the story of an identical request already in progress")
+    return _share_result(result, shared)
+
+
+def _generate_story(user_request: str, conversation_history: list = None, session_id: str = None) -> dict:
+    from agents.orchestrator import generate_story, writer_tool_name
+    from agents.evaluator import evaluate_story
+    
+    session = _load_session(session_id)
+    if session:
+        conversation_history = session.history.messages()
+    
     # ReAct agent will reason and call the right tool with conversation context
     story_text, updated_messages = generate_story(user_request, conversation_history)
     word_count = len(story_text.split())
@@ -57,41 +172,579 @@ def generate_story_pipeline(user_request: str, conversation_history: list = None
     evaluation = evaluate_story(story_text)
     
     # Show summary
-    print(f"Overall Score: {evaluation.overall_score:.1f}/10 - {'✅ Approved' if evaluation.approved else '⚠️ Needs improvement'}")
-    
-    if not evaluation.approved:
-        # Identify which dimensions were below threshold
-        scores_dict = evaluation.scores.model_dump()
-        low_scores = [dim for dim, score in scores_dict.items() if score < 7.0]
-        if low_scores:
-            print(f"🔧 Improved: {', '.join(low_scores)}")
+    _print_summary(evaluation)
     
     # Always return result - evaluator will fix issues if needed
-    return {
+    result = {
+        "story": story_text,
+        "word_count": word_count,
+        "evaluation": evaluation,
+        "conversation_history": updated_messages,
+        "tool_name": writer_tool_name(updated_messages)
+    }
+    if session:
+        _save_session(session, user_request, result)
+    _record_result(user_request, result)
+    return result
+
+
+@traced
+async def agenerate_story_pipeline(user_request: str, conversation_history: list = None, verbose: bool = True,
+                                   session_id: str = None):
+    """
+    Async variant of `generate_story_pipeline`.
+    
+    Orchestrator, writer tool and evaluator all use `ainvoke`, so many
+    sessions can run concurrently on one event loop. First-turn requests are
+    coalesced like in `generate_story_pipeline`.
+    
+    Args:
+        user_request: Current user request (new story or modification)
+        conversation_history: List of previous messages for multi-turn context
+        verbose: Print progress lines (disable when running many sessions)
+        session_id: Load / save the history in the session store (see `generate_story_pipeline`)
+    
+    Returns:
+        dict: Contains story, evaluation, and updated conversation history
+    """
+    if conversation_history or session_id is not None:
+        return await _agenerate_story(user_request, conversation_history, verbose, session_id)
+    from agents.coalescing import acoalesce, normalize_request
+    
+    result, shared = await acoalesce("pipeline", normalize_request(user_request),
+                                     lambda: _agenerate_story(user_request, verbose=verbose))
+    if shared and verbose:
+        print("♻️ Shared the story of an identical request already in progress")
+    return _share_result(result, shared)
+
+
+async def _agenerate_story(user_request: str, conversation_history: list = None, verbose: bool = True,
+                           session_id: str = None) -> dict:
+    from agents.orchestrator import agenerate_story, writer_tool_name
+    from agents.evaluator import aevaluate_story
+    
+    session = _load_session(session_id)
+    if session:
+        conversation_history = session.history.messages()
+    
+    story_text, updated_messages = await agenerate_story(user_request, conversation_history)
+    word_count = len(story_text.split())
+    if verbose:
+        print(f"✅ Story generated ({word_count} words)")
+        print("📊 Evaluating quality...")
+    
+    evaluation = await aevaluate_story(story_text)
+    
+    if verbose:
+        _print_summary(evaluation)
+    
+    result = {
         "story": story_text,
         "word_count": word_count,
         "evaluation": evaluation,
-        "conversation_history": updated_messages
+        "conversation_history": updated_messages,
+        "tool_name": writer_tool_name(updated_messages)
     }
+    if session:
+        _save_session(session, user_request, result)
+    _record_result(user_request, result)
+    return result
+
+
+@traced
+def stream_story_pipeline(user_request: str, conversation_history: list = None):
+    """
+    Streaming variant of `generate_story_pipeline`.
+    
+    The writer's tokens are yielded as soon as they arrive. With
+    STREAM_EVAL_ENABLED, a StreamEvaluator checks (and judges) the story
+    paragraph by paragraph while it is written, stops the writer early on a
+    clear-cut failure, and delivers the verdict right after the last token;
+    otherwise evaluation runs once the story is complete.
+    
+    Args:
+        user_request: Current user request (new story or modification)
+        conversation_history: List of previous messages for multi-turn context
+    
+    Yields:
+        {"type": "token", "text": ...} while the story is written, then one
+        {"type": "result", ...} event carrying the same keys as
+        `generate_story_pipeline`'s return value
+    """
+    from agents.orchestrator import stream_story, writer_tool_name
+    from agents.evaluator import StreamEvaluator, STREAM_EVAL_ENABLED, evaluate_story
+    
+    evaluator = StreamEvaluator() if STREAM_EVAL_ENABLED else None
+    story_text, updated_messages = "", []
+    for event in stream_story(user_request, conversation_history, stop=evaluator and evaluator.should_stop):
+        if event["type"] == "token":
+            if evaluator:
+                evaluator.feed(event["text"])
+            yield event
+        else:
+            story_text, updated_messages = event["story"], event["messages"]
+    word_count = len(story_text.split())
+    print(f"\n\n✅ Story generated ({word_count} words)")
+    if evaluator and evaluator.aborted:
+        print(f"⚠️ Writing stopped early: {evaluator.aborted}")
+    
+    print("📊 Evaluating quality...")
+    evaluation = evaluator.finish(story_text) if evaluator else evaluate_story(story_text)
+    _print_summary(evaluation)
+    
+    result = {
+        "type": "result",
+        "story": story_text,
+        "word_count": word_count,
+        "evaluation": evaluation,
+        "conversation_history": updated_messages,
+        "tool_name": writer_tool_name(updated_messages)
+    }
+    _record_result(user_request, result)
+    yield result
+
+
+@traced
+async def astream_story_pipeline(user_request: str, conversation_history: list = None, verbose: bool = False):
+    """Async variant of `stream_story_pipeline` (same event protocol)."""
+    from agents.orchestrator import astream_story, writer_tool_name
+    from agents.evaluator import StreamEvaluator, STREAM_EVAL_ENABLED, aevaluate_story
+    
+    evaluator = StreamEvaluator(asynchronous=True) if STREAM_EVAL_ENABLED else None
+    story_text, updated_messages = "", []
+    async for event in astream_story(user_request, conversation_history, stop=evaluator and evaluator.should_stop):
+        if event["type"] == "token":
+            if evaluator:
+                evaluator.feed(event["text"])
+            yield event
+        else:
+            story_text, updated_messages = event["story"], event["messages"]
+    word_count = len(story_text.split())
+    if verbose:
+        print(f"\n\n✅ Story generated ({word_count} words)")
+        if evaluator and evaluator.aborted:
+            print(f"⚠️ Writing stopped early: {evaluator.aborted}")
+        print("📊 Evaluating quality...")
+    
+    evaluation = await evaluator.afinish(story_text) if evaluator else await aevaluate_story(story_text)
+    if verbose:
+        _print_summary(evaluation)
+    
+    result = {
+        "type": "result",
+        "story": story_text,
+        "word_count": word_count,
+        "evaluation": evaluation,
+        "conversation_history": updated_messages,
+        "tool_name": writer_tool_name(updated_messages)
+    }
+    _record_result(user_request, result)
+    yield result
+
+
+@traced
+def revise_story_pipeline(change_request: str, history: "ConversationHistory"):
+    """
+    Modification turn without regeneration: edit only the affected paragraphs
+    of the latest story, then re-check only the changed spans.
+    
+    Args:
+        change_request: The user's change (without the "Modify the story: " prefix)
+        history: Conversation state with the latest story, its writer and evaluation
+    
+    Returns:
+        dict: Same keys as `generate_story_pipeline`, plus "changed_paragraphs"
+    """
+    from agents.writers.base import revise_writer
+    from agents.evaluator import evaluate_revision
+    
+    story_text, changed = revise_writer(history.tool_name, history.latest_story, change_request)
+    word_count = len(story_text.split())
+    print(f"✅ Story revised ({len(changed)} paragraphs changed, {word_count} words)")
+    
+    print("📊 Evaluating changes...")
+    evaluation = evaluate_revision(story_text, changed, history.evaluation)
+    _print_summary(evaluation)
+    
+    result = {
+        "story": story_text,
+        "word_count": word_count,
+        "evaluation": evaluation,
+        "conversation_history": history.messages(),
+        "tool_name": history.tool_name,
+        "changed_paragraphs": changed
+    }
+    _record_result(change_request, result, kind="revision", topic=history.original_request)
+    return result
+
+
+@traced
+async def arevise_story_pipeline(change_request: str, history: "ConversationHistory", verbose: bool = True):
+    """Async variant of `revise_story_pipeline`."""
+    from agents.writers.base import arevise_writer
+    from agents.evaluator import aevaluate_revision
+    
+    story_text, changed = await arevise_writer(history.tool_name, history.latest_story, change_request)
+    word_count = len(story_text.split())
+    if verbose:
+        print(f"✅ Story revised ({len(changed)} paragraphs changed, {word_count} words)")
+        print("📊 Evaluating changes...")
+    
+    evaluation = await aevaluate_revision(story_text, changed, history.evaluation)
+    if verbose:
+        _print_summary(evaluation)
+    
+    result = {
+        "story": story_text,
+        "word_count": word_count,
+        "evaluation": evaluation,
+        "conversation_history": history.messages(),
+        "tool_name": history.tool_name,
+        "changed_paragraphs": changed
+    }
+    _record_result(change_request, result, kind="revision", topic=history.original_request)
+    return result
+
+
+async def _pipeline_with_retries(request: str, retries: int, session_id: str = None) -> dict:
+    """
+    Run one session, retrying only on rate-limit errors.
+    
+    Individual calls are already retried by the scheduler's transport; this
+    restarts the whole session once those retries are exhausted.
+    """
+    from openai import RateLimitError
+    from agents.scheduler import backoff
+    
+    for attempt in range(retries + 1):
+        try:
+            result = await agenerate_story_pipeline(request, verbose=False, session_id=session_id)
+            result["attempts"] = attempt + 1
+            return result
+        except RateLimitError:
+            if attempt == retries:
+                raise
+            await asyncio.sleep(backoff(attempt))
+
+
+async def run_sessions(requests, concurrency: int = 50, on_result=None, retries: int = 0, session_ids: list = None) -> list:
+    """
+    Run many independent story sessions concurrently on one event loop.
+    
+    Args:
+        requests: Iterable of user requests, one new session each
+        concurrency: Maximum number of sessions in flight at once
+        on_result: Optional callback(index, request, result_or_exception) fired as each session completes
+        retries: Extra attempts per session after a rate-limit error
+        session_ids: Optional session id per request (None entries start no session);
+            turns of a stored session continue from its saved history
+    
+    Returns:
+        list: Pipeline results (or the raised exception) in request order;
+        each result also carries "seconds" (session wall time) and "attempts"
+    """
+    requests = list(requests)
+    session_ids = list(session_ids) if session_ids is not None else [None] * len(requests)
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def run_one(index: int, request: str):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                result = await _pipeline_with_retries(request, retries, session_ids[index])
+                result["seconds"] = time.perf_counter() - start
+            except Exception as exc:  # One failed session must not take down the others
+                result = exc
+        if on_result:
+            on_result(index, request, result)
+        return result
+    
+    return await asyncio.gather(*(run_one(i, r) for i, r in enumerate(requests)))
+
+
+def serve(concurrency: int) -> None:
+    """
+    Server mode: read one story request per line from stdin and write one
+    JSON result per line to stdout as each session completes.
+    
+    A line is either plain request text (a one-turn session) or a JSON
+    object {"request": ..., "session_id": ...}: the turn continues that
+    session from the session store, so follow-up turns can go to any worker.
+    """
+    requests, session_ids = [], []
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        item = json.loads(line) if line.startswith("{") else {"request": line}
+        requests.append(item["request"])
+        session_ids.append(item.get("session_id"))
+    
+    def emit(index, request, result):
+        if isinstance(result, Exception):
+            record = {"index": index, "request": request, "error": str(result)}
+        else:
+            record = {
+                "index": index,
+                "request": request,
+                "story": result["evaluation"].fixed_story or result["story"],
+                "word_count": result["word_count"],
+                "overall_score": result["evaluation"].overall_score,
+                "approved": result["evaluation"].approved
+            }
+        if session_ids[index] is not None:
+            record["session_id"] = session_ids[index]
+            if not isinstance(result, Exception):
+                record["session_version"] = result["session_version"]
+        print(json.dumps(record), flush=True)
+    
+    asyncio.run(run_sessions(requests, concurrency, on_result=emit, session_ids=session_ids))
+
+
+def _percentile(values: list, q: float) -> float:
+    """Nearest-rank percentile (q in 0-100) of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+def _read_batch_requests(path: str) -> list:
+    """
+    Read (id, request) pairs from JSONL: {"id": ..., "request": ...} objects or
+    bare JSON strings. Lines without an id are numbered by position.
+    """
+    f = sys.stdin if path in (None, "-") else open(path, encoding="utf-8")
+    try:
+        items = []
+        for position, line in enumerate(line for line in f if line.strip()):
+            record = json.loads(line)
+            if isinstance(record, str):
+                record = {"request": record}
+            items.append((str(record.get("id", position)), record["request"]))
+        return items
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def _completed_ids(output_path: str) -> set:
+    """Checkpoint: ids already written successfully to the output file."""
+    if output_path in (None, "-") or not os.path.exists(output_path):
+        return set()
+    done = set()
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:  # Torn last line from an interrupted run
+                continue
+            if "error" not in record:
+                done.add(record["id"])
+    return done
+
+
+def batch_command(input_path: str = None, output_path: str = None, concurrency: int = 10, retries: int = 5) -> None:
+    """
+    Run the pipeline over a JSONL file of requests with bounded parallelism.
+    
+    Results are appended to the output JSONL as each session completes, so an
+    interrupted batch resumes where it stopped: ids already in the output are
+    skipped (failed ones are retried). The throughput / latency summary goes
+    to stderr so stdout can carry the JSONL.
+    
+    Args:
+        input_path: Requests JSONL ("-" or None for stdin)
+        output_path: Results JSONL, also the checkpoint ("-" or None for stdout, no resume)
+        concurrency: Maximum sessions in flight
+        retries: Extra attempts per request after a rate-limit error
+    """
+    from agents.coalescing import coalescing_stats
+    from agents.evaluator import fix_loop_stats
+    from agents.scheduler import Priority, priority
+    
+    items = _read_batch_requests(input_path)
+    done = _completed_ids(output_path)
+    pending = [(request_id, request) for request_id, request in items if request_id not in done]
+    out = sys.stdout if output_path in (None, "-") else open(output_path, "a+", encoding="utf-8")
+    if out is not sys.stdout and out.tell():
+        # Terminate a torn last line from an interrupted run before appending
+        out.seek(out.tell() - 1)
+        if out.read(1) != "\n":
+            out.write("\n")
+    latencies, failed = [], 0
+    
+    def emit(index, request, result):
+        nonlocal failed
+        request_id = pending[index][0]
+        if isinstance(result, Exception):
+            failed += 1
+            record = {"id": request_id, "request": request, "error": f"{type(result).__name__}: {result}"}
+        else:
+            evaluation = result["evaluation"]
+            latencies.append(result["seconds"])
+            record = {
+                "id": request_id,
+                "request": request,
+                "story": evaluation.fixed_story or result["story"],
+                "word_count": result["word_count"],
+                "scores": evaluation.scores.model_dump(),
+                "overall_score": evaluation.overall_score,
+                "approved": evaluation.approved,
+                "fixed": evaluation.fixed_story is not None,
+                "fix": evaluation.fix.model_dump(exclude={"scores"}) if evaluation.fix else None,
+                "feedback": evaluation.feedback,
+                "tool_name": result["tool_name"],
+                "seconds": round(result["seconds"], 3),
+                "attempts": result["attempts"],
+                "timings": result["timings"]
+            }
+        out.write(json.dumps(record) + "\n")
+        out.flush()
+    
+    start = time.perf_counter()
+    try:
+        # Interactive sessions sharing the scheduler are admitted first
+        with priority(Priority.BATCH):
+            asyncio.run(run_sessions([request for _, request in pending], concurrency, on_result=emit, retries=retries))
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    elapsed = time.perf_counter() - start
+    
+    summary = {
+        "requests": len(items),
+        "skipped": len(items) - len(pending),
+        "completed": len(latencies),
+        "failed": failed,
+        "seconds": round(elapsed, 2),
+        "throughput_per_second": round(len(latencies) / elapsed, 3) if elapsed else 0.0
+    }
+    if latencies:
+        summary["p50_seconds"] = round(_percentile(latencies, 50), 3)
+        summary["p95_seconds"] = round(_percentile(latencies, 95), 3)
+    # Where the seconds and dollars went, per pipeline stage
+    stages = stage_summary()
+    summary["stage_mean_seconds"] = {name: round(entry["seconds"]["mean"], 3) for name, entry in stages.items()}
+    summary["cost_usd"] = round(sum(entry["cost_usd"] for entry in stages.values()), 4)
+    coalesced = coalescing_stats()
+    if any(entry["coalesced"] for entry in coalesced.values()):
+        summary["coalescing"] = coalesced
+    fix_loop = fix_loop_stats()
+    if fix_loop["loops"]:
+        summary["fix_loop"] = {key: round(value, 3) if isinstance(value, float) else value
+                               for key, value in fix_loop.items() if key != "seconds"}
+    print(json.dumps(summary), file=sys.stderr)
+
+
+def cache_command(action: str, requests_file: str = None, concurrency: int = 50) -> None:
+    """
+    Manage the persistent response cache.
+    
+    warm:    run the pipeline for every request in `requests_file` (one per line),
+             once per creative variant, so later identical requests are cache hits
+    inspect: print hit/miss statistics and the most recently used entries
+    clear:   delete every cached response and the statistics
+    """
+    cache = get_cache()
+    if cache is None:
+        print("Response cache is disabled (STORY_CACHE_ENABLED=false)")
+        return
+    
+    if action == "warm":
+        if not requests_file:
+            print("cache warm needs a requests file (one request per line)")
+            return
+        from agents.scheduler import Priority, priority
+        with open(requests_file, encoding="utf-8") as f:
+            requests = [line.strip() for line in f if line.strip()]
+        with priority(Priority.BATCH):
+            results = asyncio.run(run_sessions(requests * CACHE_VARIANTS, concurrency))
+        failed = sum(isinstance(r, Exception) for r in results)
+        print(f"Warmed {len(requests)} requests x {CACHE_VARIANTS} variant(s), {failed} failed")
+    elif action == "inspect":
+        print(json.dumps(cache.stats(), indent=2))
+        for entry in cache.entries():
+            print(f"  [{entry['namespace']}] {entry['key']} v{entry['variant']}: {entry['preview']!r}")
+    elif action == "clear":
+        cache.clear()
+        print(f"Cleared {cache.path}")
+
+
+def stories_command(action: str, output: str = "-", last: int = 10000, since_id: int = 0) -> None:
+    """
+    Query the persistent story store.
+    
+    stats:   stories recorded per writer tool
+    weakest: mean rubric scores per genre over the last `last` stories and
+             the lowest-scoring dimension of each
+    export:  stream every story after `since_id` with its evaluation and
+             timings as JSON lines (to `output`, default stdout)
+    """
+    store = get_store()
+    if store is None:
+        print("Story store is disabled (STORY_STORE_ENABLED=false)")
+        return
+    
+    if action == "stats":
+        print(json.dumps(store.stats(), indent=2))
+    elif action == "weakest":
+        genres = store.weakest_dimensions(last)
+        if not genres:
+            print("No stories recorded yet")
+        for tool_name, summary in sorted(genres.items(), key=lambda item: item[1]["weakest_score"]):
+            print(f"{tool_name}: weakest {summary['weakest']} ({summary['weakest_score']:.2f}), "
+                  f"overall {summary['overall']:.2f}, approved {summary['approval_rate']:.0%} "
+                  f"over {summary['stories']} stories")
+    elif action == "export":
+        out = sys.stdout if output == "-" else open(output, "w", encoding="utf-8")
+        try:
+            count = store.export(out, since_id)
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        print(f"Exported {count} stories", file=sys.stderr)
+
+
+def warm_up() -> None:
+    """Import the agents and build the static prompt assets (writer prompts, router)."""
+    from agents.orchestrator import get_router
+    from agents.writers.registry import get_registry
+    import agents.evaluator  # noqa: F401 - imported for its LangChain / pydantic setup
+    get_registry().preload()
+    get_router()
+
+
+def _warm_up_in_background() -> threading.Thread:
+    """Run `warm_up` while the user is still typing; join before the first generation."""
+    thread = threading.Thread(target=warm_up, name="warm-up", daemon=True)
+    thread.start()
+    return thread
 
 
 def main():
+    from agents.writers.registry import get_registry
+    
+    warming = _warm_up_in_background()
     print("=" * 70)
     print("🌟 AmoghxHippocraticAI Storyteller 🌟")
     print("=" * 70)
-    print("\nThe StoryTeller agent has access to three specialized writers:")
-    print("  👑 Princess Writer - Royal tales with magic and enchantment")
-    print("  🎄 Christmas Writer - Holiday stories about giving and joy")
-    print("  🦁 Animal Writer - Wise animals and nature lessons")
+    genres = get_registry().specs()
+    print(f"\nThe StoryTeller agent has access to {len(genres)} specialized writers:")
+    for genre in genres:
+        print(f"  {genre.emoji} {genre.label} - {genre.tagline}")
     print("\nStories are 400-500 words, evaluated and improved automatically!")
     print("💬 Multi-turn support: Request changes after your story is generated!")
     print("=" * 70)
     
-    # Initialize conversation state (empty list to maintain message history)
-    conversation_history = []
-    
     # Initial story request
     user_input = input("\n📖 What kind of story do you want to hear?\n> ")
+    change_request = None
+    
+    # Usually done by now; importing from two threads at once could deadlock on import locks
+    warming.join()
+    from agents.history import ConversationHistory, MODIFY_PREFIX
+    
+    # Initialize conversation state (compact: original request, change log, latest story)
+    history = ConversationHistory()
     
     # Multi-turn conversation loop
     while True:
@@ -99,27 +752,45 @@ def main():
         print("🔮 Generating your personalized story...")
         print("=" * 70)
         
-        # Generate story with conversation context
-        result = generate_story_pipeline(user_input, conversation_history)
+        # Stream the story as it is written, evaluation follows on the full text
+        print("\n" + "=" * 70)
+        print("📚 YOUR STORY")
+        print("=" * 70 + "\n")
+        result = None
+        if change_request and history.can_revise:
+            # Edit only the affected paragraphs of the previous story
+            result = revise_story_pipeline(change_request, history)
+            print(f"\n{result['story']}\n")
+        else:
+            for event in stream_story_pipeline(user_input, history.messages()):
+                if event["type"] == "token":
+                    print(event["text"], end="", flush=True)
+                else:
+                    result = event
         
         if result:
-            # Update conversation history with full agent messages (user + assistant + tool calls)
-            conversation_history = result['conversation_history']
-            
             # Use fixed story if available, otherwise original
             final_story = result['evaluation'].fixed_story if result['evaluation'].fixed_story else result['story']
             final_word_count = len(final_story.split())
             
-            # Display the story
-            print("\n" + "=" * 70)
-            print("📚 YOUR STORY")
-            print("=" * 70)
-            print(f"\n{final_story}\n")
+            # Keep only the story the user saw plus the change log, not the raw agent transcript
+            history.record_turn(user_input, final_story, result['tool_name'], result['evaluation'])
+            
+            # The streamed draft is already on screen; only show the evaluator's rewrite
+            if result['evaluation'].fixed_story:
+                print("\n" + "=" * 70)
+                print("📚 YOUR IMPROVED STORY")
+                print("=" * 70)
+                print(f"\n{final_story}\n")
             print("=" * 70)
             print(f"\n✨ Story Complete! ({final_word_count} words)")
             print(f"Quality Score: {result['evaluation'].overall_score:.1f}/10")
             if result['evaluation'].fixed_story:
-                print("🔧 Story was improved by evaluator to meet all quality standards")
+                fix = result['evaluation'].fix
+                if fix is None or fix.verified:
+                    print("🔧 Story was improved by evaluator to meet all quality standards")
+                else:
+                    print(_fix_summary(fix))
             print("=" * 70)
             
             # Ask user for next action
@@ -136,9 +807,58 @@ def main():
                 break
             else:
                 # User wants to make changes - set up for next iteration
-                user_input = f"Modify the story: {next_action}"
+                change_request = next_action
+                user_input = f"{MODIFY_PREFIX}{next_action}"
                 print(f"\n🔄 Applying your changes: '{next_action}'")
 
 
+def cli(argv: list = None) -> None:
+    parser = argparse.ArgumentParser(description="AmoghxHippocraticAI Storyteller")
+    parser.add_argument("--metrics-out", help="On exit, write per-stage metrics to this file (.json, otherwise Prometheus text)")
+    subparsers = parser.add_subparsers(dest="command")
+    
+    serve_parser = subparsers.add_parser("serve", help="Run one session per stdin line concurrently, JSON lines out")
+    serve_parser.add_argument("--concurrency", type=int, default=50, help="Maximum sessions in flight (default: 50)")
+    
+    batch_parser = subparsers.add_parser("batch", help="Run requests from a JSONL file (or stdin), results to JSONL, resumable")
+    batch_parser.add_argument("input", nargs="?", default="-", help="Requests JSONL, one {\"id\", \"request\"} per line (default: stdin)")
+    batch_parser.add_argument("-o", "--output", default="-", help="Results JSONL; existing ids are skipped on resume (default: stdout)")
+    batch_parser.add_argument("--concurrency", type=int, default=10, help="Maximum sessions in flight (default: 10)")
+    batch_parser.add_argument("--retries", type=int, default=5, help="Retries per request on rate-limit errors (default: 5)")
+    
+    cache_parser = subparsers.add_parser("cache", help="Warm, inspect or clear the response cache")
+    cache_parser.add_argument("action", choices=["warm", "inspect", "clear"])
+    cache_parser.add_argument("requests_file", nargs="?", help="Requests to warm, one per line")
+    cache_parser.add_argument("--concurrency", type=int, default=50, help="Maximum sessions in flight when warming")
+    
+    stories_parser = subparsers.add_parser("stories", help="Query or export the persistent story / evaluation store")
+    stories_parser.add_argument("action", choices=["stats", "weakest", "export"])
+    stories_parser.add_argument("-o", "--output", default="-", help="Export JSONL file (default: stdout)")
+    stories_parser.add_argument("--last", type=int, default=10000, help="Window of latest stories for weakest (default: 10000)")
+    stories_parser.add_argument("--since-id", type=int, default=0, help="Export only stories after this id (incremental export)")
+    
+    args = parser.parse_args(argv)
+    
+    # Build the writers and render their static prompts once, before the first request
+    # (the interactive session does this in the background while the user types)
+    if args.command in ("serve", "batch") or (args.command == "cache" and args.action == "warm"):
+        warm_up()
+    
+    try:
+        if args.command == "serve":
+            serve(args.concurrency)
+        elif args.command == "batch":
+            batch_command(args.input, args.output, args.concurrency, args.retries)
+        elif args.command == "cache":
+            cache_command(args.action, args.requests_file, args.concurrency)
+        elif args.command == "stories":
+            stories_command(args.action, args.output, args.last, args.since_id)
+        else:
+            main()
+    finally:
+        if args.metrics_out:
+            metrics.export(args.metrics_out)
+
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    cli()
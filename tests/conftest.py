@@ -0,0 +1,28 @@
+"""
+Shared fixtures - every test runs offline against the counting FakeChatModel
+(benchmarks/fake_llm.py), with the response cache, story store and story
+index off unless a test turns them on.
+"""
+from unittest import mock
+
+import pytest
+from agents import cache, coalescing, metrics
+from benchmarks.fake_llm import CALLS, use_fake_llm
+
+
+@pytest.fixture
+def fake_llm():
+    """Route every chat client to FakeChatModel (no latency); yields its per-kind call counter."""
+    CALLS.clear()
+    metrics.reset()
+    coalescing._flights.clear()
+    with use_fake_llm(latency=0.0):
+        yield CALLS
+
+
+@pytest.fixture
+def response_cache(fake_llm, tmp_path):
+    """Turn the persistent response cache back on, in a fresh database."""
+    with mock.patch.object(cache, "CACHE_ENABLED", True), \
+            mock.patch.object(cache, "_cache", cache.ResponseCache(str(tmp_path / "responses.sqlite3"))):
+        yield cache.get_cache()
@@ -0,0 +1,73 @@
+"""Request coalescing: concurrent identical requests cost one generation, and every caller gets the story."""
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import pytest
+
+import main
+from agents import coalescing, metrics, orchestrator
+from agents.writers.registry import get_registry
+from benchmarks.fake_llm import CALLS, use_fake_llm
+
+REQUEST = "A Christmas story about Santa's reindeer"
+CALLERS = 20
+
+
+@pytest.fixture
+def slow_llm():
+    """Counting fake model whose stories take ~0.6 s to write (tool calls and scores are quick)."""
+    CALLS.clear()
+    metrics.reset()
+    coalescing._flights.clear()
+    with use_fake_llm(latency=0.0, seconds_per_token=0.001):
+        yield CALLS
+    coalescing._flights.clear()
+
+
+def test_identical_writer_calls_share_one_completion(slow_llm):
+    tool = get_registry().tool("generate_christmas_story")
+    start = threading.Barrier(CALLERS)
+    
+    def call(_):
+        start.wait()
+        return tool.invoke({"user_request": REQUEST})
+    
+    with ThreadPoolExecutor(max_workers=CALLERS) as pool:
+        stories = list(pool.map(call, range(CALLERS)))
+    
+    assert slow_llm["writer"] == 1
+    assert len(set(stories)) == 1
+    assert coalescing.coalescing_stats()["writer"]["coalesced"] == CALLERS - 1
+
+
+def test_identical_requests_share_one_pipeline(slow_llm):
+    spellings = [REQUEST, REQUEST.lower(), f"  {REQUEST}!"]
+    
+    async def burst():
+        return await asyncio.gather(*(main.agenerate_story_pipeline(spellings[i % len(spellings)], verbose=False)
+                                      for i in range(CALLERS)))
+    
+    results = asyncio.run(burst())
+    
+    assert dict(slow_llm) == {"writer": 1, "evaluator": 1}
+    assert len({result["story"] for result in results}) == 1
+    assert sum(result["coalesced"] for result in results) == CALLERS - 1
+
+
+def test_coalesced_follower_streams_the_story(slow_llm):
+    # The leader calls the writer tool with the argument the agent will pass it
+    leader_request = orchestrator._first_turn_content(REQUEST)
+    tool = get_registry().tool("generate_christmas_story")
+    with ThreadPoolExecutor(max_workers=1) as pool, mock.patch.object(orchestrator, "ROUTER_ENABLED", False):
+        leader = pool.submit(tool.invoke, {"user_request": leader_request})
+        time.sleep(0.1)  # The leader's story is being written
+        events = list(main.stream_story_pipeline(REQUEST))
+        story = leader.result()
+    
+    assert slow_llm["writer"] == 1
+    assert coalescing.coalescing_stats()["writer"]["coalesced"] == 1
+    assert events[-1]["story"] == story
+    assert "".join(event["text"] for event in events if event["type"] == "token") == story
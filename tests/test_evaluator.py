@@ -0,0 +1,99 @@
+"""Evaluator caching and statistics."""
+import agents.llm
+from langchain_core.messages import AIMessage
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from agents import evaluator, metrics
+from agents.writers.base import split_paragraphs
+from benchmarks.fake_llm import FakeChatModel, _call_ids, _fake_story, offline_backend
+from benchmarks.fix_loop import ScriptedJudge
+
+
+def _revised(story_text: str) -> tuple:
+    paragraphs = split_paragraphs(story_text)
+    paragraphs[1] = _fake_story("a braver princess", 90, 1)
+    return "\n\n".join(paragraphs), [paragraphs[1]]
+
+
+def test_revision_verdict_is_not_served_as_a_full_evaluation(fake_llm, response_cache):
+    story = _fake_story("a princess who befriends a dragon")
+    previous = evaluator.evaluate_story(story)
+    assert previous.approved
+    revised, changed = _revised(story)
+    
+    revision = evaluator.evaluate_revision(revised, changed, previous)
+    assert evaluator.evaluate_revision(revised, changed, previous) == revision
+    fake_llm.clear()
+    
+    evaluator.evaluate_story(revised)
+    
+    assert fake_llm["evaluator"] == 1  # A full judge call, not the cached span-only verdict
+
+
+def test_fix_rate_counts_fixed_stories_not_rewrites():
+    # The judge never passes a rewrite, so every failing story uses all its rewrites
+    metrics.reset()
+    with offline_backend(lambda **kwargs: ScriptedJudge(latency=0.0, pass_rate=0.0, **kwargs)):
+        evaluations = [evaluator.evaluate_story(_fake_story(f"dull story {i}", 450)) for i in range(2)]
+        evaluator.evaluate_story(_fake_story("a fine story", 450))
+    
+    stats = evaluator.evaluator_stats()
+    assert all(evaluation.fix.iterations == evaluator.FIX_MAX_ITERATIONS > 1 for evaluation in evaluations)
+    assert stats["fixes"] == 2 and stats["fix_rate"] == 2 / 3
+    assert stats["rewrites"] == 2 * evaluator.FIX_MAX_ITERATIONS
+
+
+class _MonsterJudge(FakeChatModel):
+    """FakeChatModel whose passage judge fails any passage with a monster in it."""
+
+    def _reply(self, messages):
+        if len(self.bound_tools) == 1 and self.tool_choice:
+            name = convert_to_openai_tool(self.bound_tools[0])["function"]["name"]
+            if name == "JudgeResponse" and "monster" in str(messages[-1].content):
+                args = {"scores": {"age_appropriate": 2.0, "grounded": 8.0, "engagement": 8.0, "structure": 8.0},
+                        "feedback": "The monster eating the children is too frightening."}
+                message = AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": f"call_{next(_call_ids)}"}])
+                return self._count("evaluator", message)
+        return super()._reply(messages)
+
+
+def _stream(story: str, judge: bool = True) -> tuple:
+    """Feed `story` paragraph by paragraph, waiting for each passage verdict like a slow writer would."""
+    stream = evaluator.StreamEvaluator(judge=judge)
+    streamed = []
+    for paragraph in split_paragraphs(story):
+        streamed.append(paragraph)
+        stream.feed(paragraph + "\n\n")
+        for _, job in stream._pending:
+            job.exception()
+        if stream.should_stop():
+            break
+    return stream, "\n\n".join(streamed)
+
+
+def test_aborted_stream_verdict_fails_on_the_passage_age_score(response_cache):
+    paragraphs = split_paragraphs(_fake_story("a princess who befriends a dragon", 450))
+    paragraphs[0] = "A monster ate the children. " + paragraphs[0]
+    story = "\n\n".join(paragraphs)
+    with agents.llm.use_backend(lambda **kwargs: _MonsterJudge(latency=0.0, **kwargs)):
+        stream, partial = _stream(story)
+        evaluation = stream.finish(partial)
+    
+    assert stream.aborted and len(partial) < len(story)
+    assert evaluation.scores.age_appropriate == 2.0 and not evaluation.approved
+    assert "too frightening" in evaluation.feedback
+    assert evaluator._cached_evaluation(evaluator._stream_cache_key(partial, True)) is None
+
+
+def test_stream_verdicts_and_full_evaluations_are_cached_apart(fake_llm, response_cache):
+    story = _fake_story("a princess who befriends a dragon", 450)
+    stream, _ = _stream(story)
+    streamed = stream.finish(story)
+    fake_llm.clear()
+    
+    evaluator.evaluate_story(story)
+    assert fake_llm["evaluator"] == 1  # Not served the passage verdicts
+    
+    verdicts = metrics.get_counter("evaluator.stream_verdicts")
+    assert _stream(story)[0].finish(story) == streamed
+    assert metrics.get_counter("evaluator.stream_verdicts") == verdicts  # Served from the cache
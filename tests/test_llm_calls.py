@@ -0,0 +1,54 @@
+"""LLM calls per request: the writer's story is returned directly, never echoed by the agent."""
+import asyncio
+from unittest import mock
+
+import main
+from agents import orchestrator
+
+REQUEST = "a princess who befriends a dragon"
+
+AGENT_ROUTE = {"orchestrator": 1, "writer": 1, "evaluator": 1}
+ROUTER_ROUTE = {"writer": 1, "evaluator": 1}
+
+
+def _stage_calls(result: dict) -> dict:
+    return {name: entry["calls"] for name, entry in result["timings"]["stages"].items() if entry["calls"]}
+
+
+def test_agent_route(fake_llm):
+    with mock.patch.object(orchestrator, "ROUTER_ENABLED", False):
+        result = main.generate_story_pipeline(REQUEST)
+    
+    assert dict(fake_llm) == AGENT_ROUTE
+    assert _stage_calls(result) == AGENT_ROUTE
+    assert result["story"] and result["tool_name"] == "generate_princess_story"
+
+
+def test_router_route(fake_llm):
+    result = main.generate_story_pipeline(REQUEST)
+    
+    assert dict(fake_llm) == ROUTER_ROUTE
+    assert _stage_calls(result) == ROUTER_ROUTE
+
+
+def test_modification_turn_goes_through_the_agent(fake_llm):
+    history = main.generate_story_pipeline(REQUEST)["conversation_history"]
+    fake_llm.clear()
+    
+    main.generate_story_pipeline("Modify the story: add a dragon", history)
+    
+    assert dict(fake_llm) == AGENT_ROUTE
+
+
+def test_async_agent_route(fake_llm):
+    with mock.patch.object(orchestrator, "ROUTER_ENABLED", False):
+        result = asyncio.run(main.agenerate_story_pipeline(REQUEST, verbose=False))
+    
+    assert dict(fake_llm) == AGENT_ROUTE
+    assert _stage_calls(result) == AGENT_ROUTE
+
+
+def test_async_router_route(fake_llm):
+    asyncio.run(main.agenerate_story_pipeline(REQUEST, verbose=False))
+    
+    assert dict(fake_llm) == ROUTER_ROUTE
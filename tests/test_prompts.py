@@ -0,0 +1,19 @@
+"""Genre prompts: few-shot savings are recorded per render."""
+from concurrent.futures import ThreadPoolExecutor
+
+from agents import metrics
+from agents.prompts import GenrePrompt
+from agents.writers.registry import get_registry
+
+
+def test_every_render_records_the_tokens_saved(fake_llm):
+    spec = get_registry().specs()[0]
+    prompt = GenrePrompt(spec.genre, spec.template())
+    request = "a princess who befriends a dragon"
+    saved = prompt.select(request)[1].tokens_saved
+    
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(prompt.render, [request] * 200))
+    
+    summary = metrics.get_summary("prompt.tokens_saved")
+    assert summary["count"] == 200 and summary["sum"] == 200 * saved
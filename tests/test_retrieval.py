@@ -0,0 +1,52 @@
+"""Story index: stories are indexed off the request path and become searchable."""
+import threading
+from unittest import mock
+
+import pytest
+
+from agents import retrieval
+from benchmarks.fake_llm import _fake_story
+
+
+class Approved:
+    approved = True
+    overall_score = 8.5
+    fix = None
+
+
+@pytest.fixture
+def story_index(tmp_path):
+    writer = retrieval.IndexWriter(flush_seconds=0.01)
+    with mock.patch.object(retrieval, "STORY_INDEX_ENABLED", True), \
+            mock.patch.object(retrieval, "STORY_INDEX_PATH", str(tmp_path)), \
+            mock.patch.object(retrieval, "_indexes", {}), \
+            mock.patch.object(retrieval, "_index_writer", writer):
+        yield writer
+        writer.close()
+
+
+def test_stories_are_indexed_by_the_background_writer(story_index):
+    threads = []
+    add_many = retrieval.StoryIndex.add_many
+    
+    def recording_add_many(self, items):
+        threads.append(threading.current_thread().name)
+        return add_many(self, items)
+    
+    with mock.patch.object(retrieval.StoryIndex, "add_many", recording_add_many):
+        for topic in ("a dragon who shares his treasure", "a sleepy owl who guards the forest"):
+            assert retrieval.index_story("generate_animal_story", topic, _fake_story(topic), Approved())
+        story_index.flush()
+    
+    assert threads and set(threads) == {"story-index-writer"}
+    index = retrieval.get_index("animals")
+    assert index.count == 2
+    row, _ = index.search("a dragon sharing treasure", k=1)[0]
+    assert index.record(row)["request"] == "a dragon who shares his treasure"
+
+
+def test_rejected_stories_are_not_queued(story_index):
+    class Rejected(Approved):
+        approved = False
+    
+    assert not retrieval.index_story("generate_animal_story", "a fox", _fake_story("a fox"), Rejected())
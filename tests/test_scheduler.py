@@ -0,0 +1,146 @@
+"""Request scheduler: rate-limit retries at the transport, token-bucket admission and refunds."""
+import time
+import asyncio
+from unittest import mock
+
+import httpx
+import pytest
+
+from agents import metrics, scheduler
+from agents.scheduler import AsyncRetryTransport, RequestScheduler, RetryTransport
+
+URL = "https://api.openai.test/v1/chat/completions"
+
+
+@pytest.fixture(autouse=True)
+def no_backoff():
+    """Retry after exactly the server's Retry-After (no random backoff), with fresh metrics."""
+    metrics.reset()
+    with mock.patch.object(scheduler, "RETRY_BASE_DELAY", 0.0):
+        yield
+
+
+class RateLimitedServer:
+    """Fake API transport: answers the first `failures` requests with a 429."""
+    
+    def __init__(self, failures: int, retry_after_ms: int = 10, body: bytes = b'{"error": "rate_limit_exceeded"}'):
+        self.failures = failures
+        self.headers = {"retry-after-ms": str(retry_after_ms)}
+        self.body = body
+        self.requests = 0
+    
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        if self.requests <= self.failures:
+            return httpx.Response(429, headers=self.headers, content=self.body)
+        return httpx.Response(200, json={"ok": True})
+
+
+def _scheduler(**kwargs) -> RequestScheduler:
+    options = {"rpm_limit": 60000, "tpm_limit": 6_000_000, "estimated_tokens": 100}
+    return RequestScheduler(**{**options, **kwargs})
+
+
+def test_rate_limited_request_is_retried():
+    server, requests = RateLimitedServer(failures=2), _scheduler()
+    client = httpx.Client(transport=RetryTransport(requests, httpx.MockTransport(server)))
+    
+    response = client.post(URL)
+    
+    assert response.status_code == 200
+    assert server.requests == 3
+    stats = requests.stats()
+    assert stats["retries"] == 2 and stats["rate_limited"] == 2
+    assert stats["admitted"] == 2  # Every retry is re-admitted through the buckets
+
+
+def test_rate_limited_request_is_retried_async():
+    server, requests = RateLimitedServer(failures=2), _scheduler()
+    
+    async def post():
+        async with httpx.AsyncClient(transport=AsyncRetryTransport(requests, httpx.MockTransport(server))) as client:
+            return await client.post(URL)
+    
+    assert asyncio.run(post()).status_code == 200
+    assert server.requests == 3
+    assert requests.stats()["retries"] == 2
+
+
+def test_retries_stop_at_max_retries():
+    server = RateLimitedServer(failures=100)
+    client = httpx.Client(transport=RetryTransport(_scheduler(), httpx.MockTransport(server), max_retries=2))
+    
+    assert client.post(URL).status_code == 429
+    assert server.requests == 3
+
+
+def test_exhausted_quota_is_not_retried():
+    server = RateLimitedServer(failures=100, body=b'{"error": {"code": "insufficient_quota"}}')
+    client = httpx.Client(transport=RetryTransport(_scheduler(), httpx.MockTransport(server)))
+    
+    assert client.post(URL).status_code == 429
+    assert server.requests == 1
+
+
+def test_rate_limit_pauses_admissions_for_retry_after():
+    requests = _scheduler()
+    assert requests.on_retry(0, 429, retry_after=0.2) == 0.2
+    
+    start = time.perf_counter()
+    requests.acquire()
+    
+    assert time.perf_counter() - start >= 0.15
+
+
+def test_failed_call_refunds_its_reservation():
+    # 6000 TPM with a 10 s burst: 1000 tokens of capacity, refilled at 100 per second
+    requests = _scheduler(tpm_limit=6000, estimated_tokens=500, burst_seconds=10)
+    
+    requests.acquire()
+    assert requests.tokens.available() == pytest.approx(500, abs=20)
+    requests.refund()
+    
+    assert requests.tokens.available() == pytest.approx(1000, abs=20)
+
+
+def test_usage_reconciles_the_reservation():
+    requests = _scheduler(tpm_limit=6000, estimated_tokens=500, burst_seconds=10)
+    
+    requests.acquire()
+    requests.reconcile(800)
+    
+    assert requests.tokens.available() == pytest.approx(200, abs=20)
+    assert requests.estimate == pytest.approx(500 + scheduler.ESTIMATE_SMOOTHING * 300)
+
+
+def test_admission_waits_for_the_token_bucket():
+    # 60000 TPM with a 0.1 s burst: room for one 100-token call, refilled in 0.1 s
+    requests = _scheduler(tpm_limit=60000, estimated_tokens=100, burst_seconds=0.1)
+    requests.acquire()
+    assert requests.acquire(blocking=False) is False
+    
+    start = time.perf_counter()
+    requests.acquire()
+    
+    assert time.perf_counter() - start >= 0.05
+    assert requests.stats()["wait_seconds"]["max"] >= 0.05
+
+
+def test_interactive_calls_are_admitted_before_batch_calls():
+    requests = _scheduler(rpm_limit=60, estimated_tokens=1, burst_seconds=1)  # One request per second
+    requests.acquire()
+    admitted = []
+    
+    async def call(level: scheduler.Priority, name: str, delay: float):
+        await asyncio.sleep(delay)
+        with scheduler.priority(level):
+            await requests.aacquire()
+        admitted.append(name)
+    
+    async def burst():
+        await asyncio.gather(call(scheduler.Priority.BATCH, "batch", 0.0),
+                             call(scheduler.Priority.INTERACTIVE, "interactive", 0.05))
+    
+    asyncio.run(burst())
+    
+    assert admitted == ["interactive", "batch"]
@@ -0,0 +1,44 @@
+"""Session stores: optimistic saves on every backend, and the backend contract."""
+import pytest
+
+from agents.sessions import (FileSessionStore, MemorySessionStore, SessionConflict, SessionStore,
+                             SQLiteSessionStore)
+
+
+@pytest.fixture(params=["memory", "sqlite", "file"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemorySessionStore()
+    if request.param == "sqlite":
+        return SQLiteSessionStore(str(tmp_path / "sessions.sqlite3"))
+    return FileSessionStore(str(tmp_path / "sessions"))
+
+
+def test_saved_turn_round_trips(store):
+    session = store.get("alice")
+    session.history.record_turn("a princess story", "Once upon a time...", "generate_princess_story")
+    store.save(session)
+    
+    loaded = store.load("alice")
+    
+    assert loaded.version == 1
+    assert loaded.history.messages() == session.history.messages()
+
+
+def test_stale_save_conflicts(store):
+    first, second = store.get("bob"), store.get("bob")
+    first.history.record_turn("a dragon story", "Once upon a time...")
+    store.save(first)
+    
+    second.history.record_turn("a castle story", "Long ago...")
+    with pytest.raises(SessionConflict):
+        store.save(second)
+
+
+def test_incomplete_backend_fails_on_construction():
+    class ReadOnlyStore(SessionStore):
+        def _read(self, session_id):
+            return None
+    
+    with pytest.raises(TypeError):
+        ReadOnlyStore()
@@ -0,0 +1,37 @@
+"""Speculative writers on ambiguous first-turn requests (async pipelines only)."""
+import asyncio
+from unittest import mock
+
+import pytest
+
+import main
+from agents import speculation
+from agents.orchestrator import get_router
+from agents.router import router_stats
+
+AMBIGUOUS = "a reindeer who wants to be a princess at Christmas"
+
+
+@pytest.fixture
+def speculating(fake_llm):
+    with mock.patch.object(speculation, "SPECULATION_ENABLED", True):
+        assert not get_router().route(AMBIGUOUS).confident
+        yield fake_llm
+
+
+async def _stream(request: str) -> list:
+    return [event async for event in main.astream_story_pipeline(request)]
+
+
+def test_speculative_request_counts_as_a_router_fallback(speculating):
+    result = asyncio.run(main.agenerate_story_pipeline(AMBIGUOUS, verbose=False))
+    
+    assert result["story"]
+    assert router_stats()["fallbacks"] == 1
+
+
+def test_speculative_stream_counts_as_a_router_fallback(speculating):
+    events = asyncio.run(_stream(AMBIGUOUS))
+    
+    assert "".join(e["text"] for e in events if e["type"] == "token") == events[-1]["story"]
+    assert router_stats()["fallbacks"] == 1
@@ -0,0 +1,41 @@
+"""Streaming pipelines: every story reaches the consumer as token events."""
+import asyncio
+from unittest import mock
+
+import pytest
+
+import main
+from agents import orchestrator
+
+REQUEST = "a princess who befriends a dragon"
+
+
+def _streamed(events: list) -> str:
+    return "".join(event["text"] for event in events if event["type"] == "token")
+
+
+async def _acollect(request: str) -> list:
+    return [event async for event in main.astream_story_pipeline(request)]
+
+
+@pytest.mark.parametrize("router", [False, True], ids=["agent", "router"])
+def test_cached_story_is_streamed(fake_llm, response_cache, router):
+    with mock.patch.object(orchestrator, "ROUTER_ENABLED", router):
+        first = list(main.stream_story_pipeline(REQUEST))
+        second = list(main.stream_story_pipeline(REQUEST))
+    
+    assert fake_llm["writer"] == 1  # The second story came from the cache
+    assert second[-1]["story"] == first[-1]["story"]
+    for events in (first, second):
+        assert _streamed(events) == events[-1]["story"]
+
+
+@pytest.mark.parametrize("router", [False, True], ids=["agent", "router"])
+def test_cached_story_is_streamed_async(fake_llm, response_cache, router):
+    with mock.patch.object(orchestrator, "ROUTER_ENABLED", router):
+        first = asyncio.run(_acollect(REQUEST))
+        second = asyncio.run(_acollect(REQUEST))
+    
+    assert fake_llm["writer"] == 1
+    for events in (first, second):
+        assert _streamed(events) == events[-1]["story"]